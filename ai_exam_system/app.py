@@ -1,14 +1,15 @@
+import time
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
-from config import config
+from .config import config
+from .models import db
 
 # Initialize extensions
-db = SQLAlchemy()
 jwt = JWTManager()
 
 def create_app(config_name='default'):
     """Create and configure the Flask application."""
+    start = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
@@ -16,17 +17,50 @@ def create_app(config_name='default'):
     db.init_app(app)
     jwt.init_app(app)
     
+    # Instrumentation hooks go first so they time every request
+    from .utils import metrics
+    metrics.init_app(app)
+    
     # Register Blueprints
-    from controllers.auth_routes import auth_bp
-    from controllers.exam_routes import exam_bp
-    from controllers.admin_routes import admin_bp
+    from .controllers.auth_routes import auth_bp
+    from .controllers.exam_routes import exam_bp
+    from .controllers.admin_routes import admin_bp
+    from .controllers.proctoring_routes import proctoring_bp
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(exam_bp, url_prefix='/exam')
     app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(proctoring_bp, url_prefix='/proctoring')
+    
+    # Start background services
+    if app.config['BACKGROUND_SERVICES']:
+        from .utils import autosave, grading_queue, proctoring, question_pool, session_reaper
+        autosave.init_app(app)
+        proctoring.init_app(app)
+        grading_queue.init_app(app)
+        question_pool.init_app(app)
+        session_reaper.init_app(app)
+    
+    # Maintenance commands for the `flask` CLI
+    from .cli import register_commands
+    register_commands(app)
+    
+    app.logger.info(f"Application created in {time.perf_counter() - start:.2f}s")
+    
+    # Inference workers load the models up front instead of on the first request
+    if app.config['PRELOAD_MODELS']:
+        from .utils.ai_models import warm_up_models
+        warm_up_models(app)
     
     return app
 
+def stop_background_services(app, timeout=None):
+    """Stop the background services create_app started, for processes that serve no requests."""
+    for name in ('grading_pool', 'question_pool_filler', 'session_reaper', 'autosave_buffer', 'proctoring_buffer'):
+        service = app.extensions.pop(name, None)
+        if service is not None:
+            service.stop(timeout)
+
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True)
@@ -0,0 +1,97 @@
+"""
+Measure essay grading throughput under concurrent callers, with and without
+the inference scheduler.
+
+"independent" runs every caller's essays as batch-size-1 forward passes on
+its own thread, as concurrent grading threads did before; "scheduler" sends
+them through an InferenceScheduler that gathers concurrent items into shared
+batches.
+
+Usage (from the repository root):
+    python -m ai_exam_system.benchmarks.batching --threads 16 --essays 512
+    python -m ai_exam_system.benchmarks.batching --max-batch-size 64 --max-wait-ms 5 --output batching.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+# No background grading workers in a benchmark process
+os.environ.setdefault('GRADING_WORKERS', '0')
+
+from ..app import create_app
+from .compare_backends import synthetic_pairs
+from ..utils.ai_models import EssayGrader
+from ..utils.inference_scheduler import InferenceScheduler
+
+def run_threads(threads, pairs, grade):
+    """Grade `pairs` one essay per call from `threads` threads; returns essays/sec."""
+    next_index = iter(range(len(pairs)))
+    lock = threading.Lock()
+    
+    def worker():
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                return
+            grade(pairs[i])
+    
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return len(pairs) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help='concurrent callers')
+    parser.add_argument('--essays', type=int, default=512)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--torch-threads', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+    
+    pairs = synthetic_pairs(args.essays)
+    app = create_app()
+    
+    with app.app_context():
+        grader = EssayGrader()
+        grader.warm_up()
+    
+    independent = run_threads(args.threads, pairs, lambda pair: grader.predict_logits([pair], batch_size=1))
+    
+    scheduler = InferenceScheduler(
+        lambda batch: grader.predict_logits(batch, batch_size=args.max_batch_size),
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        torch_threads=args.torch_threads,
+        name='benchmark'
+    )
+    scheduler.start()
+    batched = run_threads(args.threads, pairs, lambda pair: scheduler.submit(pair).result())
+    scheduler.stop()
+    
+    print(f"{'mode':<12} {'essays/s':>10}")
+    print(f"{'independent':<12} {independent:>10.1f}")
+    print(f"{'scheduler':<12} {batched:>10.1f}")
+    print(f"Speedup {batched / independent:.2f}x with {args.threads} threads")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'essays': len(pairs),
+                'threads': args.threads,
+                'max_batch_size': args.max_batch_size,
+                'max_wait_ms': args.max_wait_ms,
+                'independent_essays_per_sec': independent,
+                'scheduler_essays_per_sec': batched,
+                'speedup': batched / independent
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
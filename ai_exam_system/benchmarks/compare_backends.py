@@ -0,0 +1,97 @@
+"""
+Compare the essay grading backends on the same inputs.
+
+Reports, for every backend, the score agreement and maximum logit difference
+against the first backend listed (eager PyTorch by default), and the
+throughput in essays/sec.
+
+Usage (from the repository root):
+    python -m ai_exam_system.benchmarks.compare_backends --backends torch torch-int8 onnx
+    python -m ai_exam_system.benchmarks.compare_backends --input essays.json --output backends.json
+
+The optional input file is a JSON list of {"essay": ..., "reference": ...} objects.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+# No background grading workers in a benchmark process
+os.environ.setdefault('GRADING_WORKERS', '0')
+
+from ..app import create_app
+from ..utils.ai_models import EssayGrader
+from ..utils.inference_backends import BACKENDS
+
+SAMPLE_WORDS = (
+    'photosynthesis converts light energy into chemical energy stored in glucose '
+    'the chloroplast contains chlorophyll which absorbs red and blue light while '
+    'water is split releasing oxygen and carbon dioxide is fixed by the calvin cycle'
+).split()
+
+def synthetic_pairs(count, seed=0):
+    """Generate essays of varied length against a fixed reference answer."""
+    rng = random.Random(seed)
+    reference = ' '.join(SAMPLE_WORDS)
+    return [
+        (' '.join(rng.choice(SAMPLE_WORDS) for _ in range(rng.randint(5, 300))), reference)
+        for _ in range(count)
+    ]
+
+def load_pairs(path):
+    with open(path) as f:
+        return [(item['essay'], item['reference']) for item in json.load(f)]
+
+def run_backend(name, pairs, batch_size, repeats):
+    """Return (logits, essays_per_second) for one backend."""
+    grader = EssayGrader(backend=name)
+    grader.warm_up()
+    
+    start = time.perf_counter()
+    for _ in range(repeats):
+        logits = grader.predict_logits(pairs, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return logits, len(pairs) * repeats / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--input', help='JSON file of essay/reference pairs')
+    parser.add_argument('--count', type=int, default=64, help='number of synthetic essays')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='max allowed logit difference')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+    
+    pairs = load_pairs(args.input) if args.input else synthetic_pairs(args.count)
+    app = create_app()
+    
+    results = {}
+    with app.app_context():
+        baseline = None
+        for name in args.backends:
+            logits, rate = run_backend(name, pairs, args.batch_size, args.repeats)
+            if baseline is None:
+                baseline = logits
+            scores = logits.argmax(axis=1)
+            results[name] = {
+                'essays_per_sec': rate,
+                'score_agreement': float((scores == baseline.argmax(axis=1)).mean()),
+                'max_logit_diff': float(abs(logits - baseline).max()),
+            }
+            results[name]['within_tolerance'] = results[name]['max_logit_diff'] <= args.tolerance
+    
+    reference_rate = results[args.backends[0]]['essays_per_sec']
+    print(f"{'backend':<12} {'essays/s':>10} {'speedup':>8} {'agreement':>10} {'max diff':>9}")
+    for name, row in results.items():
+        print(f"{name:<12} {row['essays_per_sec']:>10.1f} {row['essays_per_sec'] / reference_rate:>7.2f}x "
+              f"{row['score_agreement']:>10.1%} {row['max_logit_diff']:>9.4f}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'essays': len(pairs), 'batch_size': args.batch_size, 'backends': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Database selection shared by the benchmarks that drop and re-seed their tables.
+
+They run against a fresh temporary SQLite file unless another database is
+named explicitly with --database-url and --drop-tables confirms that its
+tables may be dropped. DATABASE_URL from the environment is never used, so
+a shell configured for the application cannot point a benchmark at it.
+"""
+import os
+import tempfile
+
+def add_database_arguments(parser):
+    """Add --database-url and --drop-tables to an argparse parser."""
+    parser.add_argument('--database-url', help='benchmark this database instead of a temporary SQLite file')
+    parser.add_argument(
+        '--drop-tables', action='store_true',
+        help='confirm that every table of --database-url may be dropped and recreated'
+    )
+
+def configure_database(parser, args, name):
+    """
+    Point DATABASE_URL at the database to benchmark. Must run before the
+    application is imported, since its configuration is read from the
+    environment at import time.
+    """
+    if args.database_url is None:
+        if args.drop_tables:
+            parser.error('--drop-tables only applies to --database-url')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), f'{name}.db')
+    elif not args.drop_tables:
+        parser.error('--database-url drops and recreates all tables of that database; add --drop-tables to confirm')
+    else:
+        os.environ['DATABASE_URL'] = args.database_url
+    return os.environ['DATABASE_URL']
@@ -0,0 +1,386 @@
+"""
+Load test of the web application.
+
+Seeds a database, serves create_app on a local threaded server and drives it
+with concurrent clients. Students log in, list exams, start an exam and
+submit it; admins log in and page through exam results. Latency percentiles
+(p50/p95/p99) and requests/sec are reported per endpoint and written as JSON
+so runs can be diffed between releases.
+
+Submitted exams are graded by a pool of --grading-workers threads in the same
+process, competing with the web requests as they would in a web worker that
+runs GRADING_WORKERS. The report includes the jobs graded while the load ran,
+the backlog left when it stopped and how long the pool took to drain it.
+
+Usage (from the repository root):
+    python -m ai_exam_system.benchmarks.load_test --clients 50 --duration 30 --output load.json
+    python -m ai_exam_system.benchmarks.load_test --models real
+    python -m ai_exam_system.benchmarks.load_test --database-url postgresql://localhost/bench --drop-tables
+
+A temporary SQLite database is used unless --database-url names another one;
+all its tables are dropped, so --drop-tables must confirm that. By default the
+models are stubs with a fixed latency (--grading-latency/--generation-latency),
+so no model is downloaded.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+from .database import add_database_arguments, configure_database
+
+PASSWORD = 'LoadTest1!'
+
+ESSAY_WORDS = (
+    'the experiment shows that energy is conserved because the system is closed and '
+    'the measurements agree with the model within the expected error of the instruments'
+).split()
+
+def seed(db, models, args):
+    """Insert users, exams and questions. Returns (student emails, admin emails, exam question ids)."""
+    User, Exam, Question, QuestionOption = models
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)  # hashed once, shared by all users
+    
+    users = [{
+        'id': i + 1,
+        'username': f'user{i + 1}',
+        'email': f'user{i + 1}@example.com',
+        'password_hash': password_hash,
+        'role': 'admin' if i < args.admins else 'student',
+        'token_version': 1,
+        'created_at': now
+    } for i in range(args.admins + args.students)]
+    db.session.execute(User.__table__.insert(), users)
+    
+    db.session.execute(Exam.__table__.insert(), [{
+        'id': exam_id,
+        'title': f'Exam {exam_id}',
+        'description': 'Load test exam',
+        'duration_minutes': 60,
+        'created_at': now
+    } for exam_id in range(1, args.exams + 1)])
+    
+    questions, options, exam_questions = [], [], {}
+    for exam_id in range(1, args.exams + 1):
+        for k in range(args.questions_per_exam):
+            question_id = len(questions) + 1
+            question_type = 'essay' if k % 2 else 'multiple_choice'
+            questions.append({
+                'id': question_id,
+                'exam_id': exam_id,
+                'question_text': f'Question {question_id}',
+                'question_type': question_type,
+                'correct_answer': 'Option 0' if question_type == 'multiple_choice' else ' '.join(ESSAY_WORDS),
+                'points': 1
+            })
+            if question_type == 'multiple_choice':
+                options.extend({
+                    'question_id': question_id,
+                    'option_text': f'Option {n}',
+                    'is_correct': n == 0
+                } for n in range(4))
+            exam_questions.setdefault(exam_id, []).append((question_id, question_type))
+    db.session.execute(Question.__table__.insert(), questions)
+    db.session.execute(QuestionOption.__table__.insert(), options)
+    db.session.commit()
+    
+    students = [u['email'] for u in users if u['role'] == 'student']
+    admins = [u['email'] for u in users if u['role'] == 'admin']
+    return students, admins, exam_questions
+
+class Recorder:
+    """Thread-safe collection of (endpoint, latency, ok) samples."""
+    
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        self.recording = False
+    
+    def add(self, endpoint, seconds, ok):
+        if not self.recording:
+            return
+        with self.lock:
+            self.samples[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+class Client:
+    """One virtual user with a keep-alive connection."""
+    
+    def __init__(self, port, recorder):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.recorder = recorder
+        self.token = None
+        self.exams_etag = None
+    
+    def request(self, endpoint, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.recorder.add(endpoint, time.perf_counter() - start, False)
+            return None, None, {}
+        self.recorder.add(endpoint, time.perf_counter() - start, status < 400)
+        
+        payload = json.loads(data) if data and response.getheader('Content-Type', '').startswith('application/json') else None
+        return status, payload, response
+    
+    def login(self, email):
+        status, payload, _ = self.request('login', 'POST', '/auth/login', {'email': email, 'password': PASSWORD})
+        self.token = payload['token'] if status == 200 else None
+        return self.token is not None
+
+def student_flow(client, email, exam_questions, rng):
+    """Log in, list exams, start one and submit answers to all its questions."""
+    if not client.login(email):
+        return
+    
+    headers = {'If-None-Match': client.exams_etag} if client.exams_etag else None
+    status, _, response = client.request('get_exams', 'GET', '/exam/', headers=headers)
+    if status == 200:
+        client.exams_etag = response.getheader('ETag')
+    
+    exam_id = rng.choice(list(exam_questions))
+    status, payload, _ = client.request('start_exam', 'POST', f'/exam/{exam_id}/start')
+    if status != 201:
+        return
+    
+    answers = []
+    for question_id, question_type in exam_questions[exam_id]:
+        if question_type == 'essay':
+            text = ' '.join(rng.choice(ESSAY_WORDS) for _ in range(rng.randint(20, 200)))
+        else:
+            text = f'Option {rng.randint(0, 3)}'
+        answers.append({'question_id': question_id, 'answer_text': text})
+    client.request('submit_exam', 'POST', f"/exam/{payload['session_id']}/submit", {'answers': answers})
+
+def admin_flow(client, email, exam_questions, rng, pages):
+    """Log in and page through the results of one exam."""
+    if not client.login(email):
+        return
+    
+    exam_id = rng.choice(list(exam_questions))
+    after = 0
+    for _ in range(pages):
+        status, payload, _ = client.request(
+            'admin_results', 'GET', f'/admin/exams/{exam_id}/results?limit=50&after_session_id={after}'
+        )
+        if status != 200 or not payload['has_more']:
+            break
+        after = payload['next_after_session_id']
+
+def run_client(port, recorder, stop, args, students, admins, exam_questions, seed_value):
+    rng = random.Random(seed_value)
+    client = Client(port, recorder)
+    while not stop.is_set():
+        client.token = None
+        if admins and rng.random() < args.admin_ratio:
+            admin_flow(client, rng.choice(admins), exam_questions, rng, args.admin_pages)
+        else:
+            student_flow(client, rng.choice(students), exam_questions, rng)
+        if args.think_time:
+            time.sleep(rng.uniform(0, 2 * args.think_time))
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        samples = sorted(samples)
+        endpoints[endpoint] = {
+            'requests': len(samples),
+            'errors': recorder.errors[endpoint],
+            'requests_per_sec': len(samples) / elapsed,
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p95_ms': percentile(samples, 0.95) * 1000,
+            'p99_ms': percentile(samples, 0.99) * 1000,
+            'max_ms': samples[-1] * 1000
+        }
+    return endpoints
+
+def grading_backlog(db, GradingJob):
+    """Number of grading jobs still pending or running."""
+    return db.session.query(db.func.count(GradingJob.id)) \
+        .filter(GradingJob.status.in_(['pending', 'running'])).scalar()
+
+def wait_for_grading(app, db, GradingJob, timeout):
+    """Wait until the grading queue is empty. Returns the seconds waited, or None on timeout."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        with app.app_context():
+            backlog = grading_backlog(db, GradingJob)
+            db.session.remove()
+        if not backlog:
+            return time.perf_counter() - start
+        time.sleep(0.1)
+    return None
+
+def grading_summary(db, GradingJob, window_start, window_end):
+    """Job counts by status and the jobs finished within the measured window."""
+    by_status = dict(db.session.query(GradingJob.status, db.func.count(GradingJob.id))
+                     .group_by(GradingJob.status).all())
+    finished_in_window = db.session.query(db.func.count(GradingJob.id)).filter(
+        GradingJob.status == 'completed',
+        GradingJob.finished_at >= window_start,
+        GradingJob.finished_at < window_end
+    ).scalar()
+    return by_status, finished_in_window
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=50, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before measuring')
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--exams', type=int, default=5)
+    parser.add_argument('--questions-per-exam', type=int, default=10)
+    parser.add_argument('--admin-ratio', type=float, default=0.1, help='share of flows run as an admin')
+    parser.add_argument('--admin-pages', type=int, default=3, help='results pages per admin flow')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean seconds between flows')
+    parser.add_argument('--models', choices=['stub', 'real'], default='stub')
+    parser.add_argument('--grading-latency', type=float, default=0.05, help='stub seconds per grading batch')
+    parser.add_argument('--generation-latency', type=float, default=0.2, help='stub seconds per generation batch')
+    parser.add_argument('--grading-workers', type=int, default=2, help='grading worker threads in this process')
+    parser.add_argument('--drain-timeout', type=float, default=300, help='seconds to wait for the grading queue to drain')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON')
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    configure_database(parser, args, 'load_test')
+    # The grading pool is started below, once the tables exist
+    os.environ['GRADING_WORKERS'] = '0'
+    
+    if args.models == 'stub':
+        # Stub scores only make sense for the cross-encoder mode
+        os.environ['GRADING_MODE'] = 'model'
+        from .stub_models import install_stub_models
+        install_stub_models(args.grading_latency, args.generation_latency)
+    else:
+        try:
+            import torch  # noqa: F401
+            import transformers  # noqa: F401
+        except ImportError as e:
+            sys.exit(f'Real models are not available: {e}')
+        os.environ.setdefault('PRELOAD_MODELS', 'true')
+    
+    from ..app import create_app
+    from ..models import User, Exam, Question, QuestionOption, GradingJob, db
+    
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        students, admins, exam_questions = seed(db, (User, Exam, Question, QuestionOption), args)
+        database = db.engine.dialect.name
+    
+    # Grading runs in this process, so its cost shows up in the request latencies
+    if args.grading_workers:
+        from ..utils.grading_queue import GradingWorkerPool
+        pool = GradingWorkerPool(app, args.grading_workers, app.config['GRADING_POLL_INTERVAL'])
+        pool.start()
+        app.extensions['grading_pool'] = pool
+    
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    
+    recorder = Recorder()
+    stop = threading.Event()
+    clients = [
+        threading.Thread(
+            target=run_client,
+            args=(server.server_port, recorder, stop, args, students, admins, exam_questions, args.seed + i),
+            daemon=True
+        )
+        for i in range(args.clients)
+    ]
+    for thread in clients:
+        thread.start()
+    
+    time.sleep(args.warmup)
+    recorder.recording = True
+    window_start = datetime.utcnow()
+    start = time.perf_counter()
+    time.sleep(args.duration)
+    recorder.recording = False
+    elapsed = time.perf_counter() - start
+    window_end = datetime.utcnow()
+    
+    stop.set()
+    for thread in clients:
+        thread.join(timeout=30)
+    server.shutdown()
+    
+    with app.app_context():
+        backlog = grading_backlog(db, GradingJob)
+        db.session.remove()
+    drain_seconds = wait_for_grading(app, db, GradingJob, args.drain_timeout) if args.grading_workers else None
+    with app.app_context():
+        jobs_by_status, graded_in_window = grading_summary(db, GradingJob, window_start, window_end)
+        db.session.remove()
+    grading = {
+        'workers': args.grading_workers,
+        'jobs': sum(jobs_by_status.values()),
+        'jobs_by_status': jobs_by_status,
+        'jobs_graded_per_sec': graded_in_window / elapsed,
+        'backlog_at_stop': backlog,
+        'drain_seconds': drain_seconds
+    }
+    
+    endpoints = summarize(recorder, elapsed)
+    total = sum(row['requests'] for row in endpoints.values())
+    report = {
+        'database': database,
+        'models': args.models,
+        'clients': args.clients,
+        'duration_seconds': elapsed,
+        'requests': total,
+        'errors': sum(row['errors'] for row in endpoints.values()),
+        'requests_per_sec': total / elapsed,
+        'endpoints': endpoints,
+        'grading': grading,
+        'options': vars(args)
+    }
+    
+    print(f"{'endpoint':<16} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, row in endpoints.items():
+        print(f"{endpoint:<16} {row['requests']:>9} {row['errors']:>7} {row['requests_per_sec']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+    print(f"Total {total} requests, {report['requests_per_sec']:.1f} req/s with {args.clients} clients on {database}")
+    drained = 'not drained' if drain_seconds is None else f'drained in {drain_seconds:.1f}s'
+    print(f"Grading: {grading['jobs']} jobs {jobs_by_status}, {grading['jobs_graded_per_sec']:.1f} jobs/s "
+          f"with {args.grading_workers} workers, backlog {backlog} at stop, {drained}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Query-plan regression benchmark for the hot query paths.
+
+Seeds a large synthetic dataset, then checks with EXPLAIN that every hot
+query is answered through an index and times it. It also checks that a page
+of /admin/exams/<id>/results costs the same number of SQL queries whatever
+the page size.
+
+Usage (from the repository root):
+    python -m ai_exam_system.benchmarks.query_plans --sessions 20000 --answers-per-session 20
+    python -m ai_exam_system.benchmarks.query_plans --database-url postgresql://localhost/bench --drop-tables
+
+A temporary SQLite database is used unless --database-url names another one;
+all its tables are dropped, so --drop-tables must confirm that. Exits with
+status 1 if any check fails.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+# No background workers in a benchmark process: their queries would be counted
+# and the reaper would finalize the seeded in-progress sessions
+os.environ.setdefault('GRADING_WORKERS', '0')
+os.environ.setdefault('SESSION_REAPER', 'false')
+
+from sqlalchemy import event, text
+from .database import add_database_arguments, configure_database
+from ..models import (
+    User, Exam, Question, QuestionOption, ExamSession, Answer,
+    ProctoringLog, GradingJob, db
+)
+
+CHUNK_SIZE = 5000
+
+def bulk_insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(model.__table__.insert(), rows[start:start + CHUNK_SIZE])
+
+def seed(args):
+    """Insert a synthetic dataset with bulk inserts. Returns the admin user id."""
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    
+    students = max(1, args.sessions // 4)
+    bulk_insert(User, [{
+        'id': i + 1,
+        'username': f'user{i + 1}',
+        'email': f'user{i + 1}@example.com',
+        'password_hash': 'x',
+        'role': 'admin' if i == 0 else 'student',
+        'token_version': 1,
+        'created_at': now
+    } for i in range(students + 1)])
+    
+    bulk_insert(Exam, [{
+        'id': i + 1,
+        'title': f'Exam {i + 1}',
+        'description': '',
+        'duration_minutes': 60,
+        'created_at': now
+    } for i in range(args.exams)])
+    
+    questions, options = [], []
+    for exam_id in range(1, args.exams + 1):
+        for _ in range(args.questions_per_exam):
+            question_id = len(questions) + 1
+            question_type = 'essay' if question_id % 2 else 'multiple_choice'
+            questions.append({
+                'id': question_id,
+                'exam_id': exam_id,
+                'question_text': f'Question {question_id}',
+                'question_type': question_type,
+                'correct_answer': 'reference answer',
+                'points': 1
+            })
+            if question_type == 'multiple_choice':
+                options.extend({
+                    'question_id': question_id,
+                    'option_text': f'Option {k}',
+                    'is_correct': k == 0
+                } for k in range(4))
+    bulk_insert(Question, questions)
+    bulk_insert(QuestionOption, options)
+    
+    sessions, answers, logs, jobs = [], [], [], []
+    for session_id in range(1, args.sessions + 1):
+        exam_id = rng.randint(1, args.exams)
+        start_time = now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+        status = rng.choice(['completed', 'completed', 'in_progress', 'terminated'])
+        sessions.append({
+            'id': session_id,
+            'student_id': rng.randint(2, students + 1),
+            'exam_id': exam_id,
+            'start_time': start_time,
+            'end_time': start_time + timedelta(minutes=60) if status != 'in_progress' else None,
+            'status': status
+        })
+        
+        first_question = (exam_id - 1) * args.questions_per_exam + 1
+        for offset in range(min(args.answers_per_session, args.questions_per_exam)):
+            answers.append({
+                'session_id': session_id,
+                'question_id': first_question + offset,
+                'answer_text': 'synthetic answer',
+                'submitted_at': start_time
+            })
+        
+        for k in range(args.logs_per_session):
+            logs.append({
+                'session_id': session_id,
+                'event_type': rng.choice(['face_detected', 'no_face', 'multiple_faces']),
+                'timestamp': start_time + timedelta(seconds=k * 5),
+                'severity': rng.choice(['info', 'warning', 'critical'])
+            })
+        
+        if status == 'completed':
+            jobs.append({
+                'session_id': session_id,
+                'status': rng.choice(['completed', 'completed', 'completed', 'pending']),
+                'attempts': 0,
+                'created_at': start_time
+            })
+        
+        # Keep memory bounded on large runs; sessions go first for the foreign keys
+        if len(answers) >= CHUNK_SIZE * 4:
+            bulk_insert(ExamSession, sessions)
+            bulk_insert(Answer, answers)
+            bulk_insert(ProctoringLog, logs)
+            bulk_insert(GradingJob, jobs)
+            sessions, answers, logs, jobs = [], [], [], []
+    
+    bulk_insert(ExamSession, sessions)
+    bulk_insert(Answer, answers)
+    bulk_insert(ProctoringLog, logs)
+    bulk_insert(GradingJob, jobs)
+    db.session.commit()
+    
+    # Refresh planner statistics for the new data
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    
+    # The first user is the admin
+    return 1
+
+def hot_queries():
+    """(name, table, query) for every hot query path."""
+    exam_id = 1
+    session = ExamSession.query.filter_by(exam_id=exam_id).first()
+    session_ids = [s.id for s in ExamSession.query.filter_by(exam_id=exam_id).limit(100)]
+    question_ids = [q.id for q in Question.query.filter_by(exam_id=exam_id)]
+    
+    return [
+        ('results page', 'exam_sessions',
+         ExamSession.query.filter(ExamSession.exam_id == exam_id, ExamSession.id > 0)
+         .order_by(ExamSession.id).limit(100)),
+        ('results page by status', 'exam_sessions',
+         ExamSession.query.filter(ExamSession.exam_id == exam_id, ExamSession.status == 'completed',
+                                  ExamSession.id > 0).order_by(ExamSession.id).limit(100)),
+        ('sessions of a student', 'exam_sessions',
+         ExamSession.query.filter(ExamSession.student_id == session.student_id)),
+        ('answers of a results page', 'answers',
+         Answer.query.filter(Answer.session_id.in_(session_ids))),
+        ('answers to a question', 'answers',
+         Answer.query.filter(Answer.question_id == question_ids[0])),
+        ('questions of an exam', 'questions',
+         Question.query.filter(Question.exam_id == exam_id)),
+        ('options of exam questions', 'question_options',
+         QuestionOption.query.filter(QuestionOption.question_id.in_(question_ids))),
+        ('proctoring timeline', 'proctoring_logs',
+         ProctoringLog.query.filter(ProctoringLog.session_id == session.id)
+         .order_by(ProctoringLog.timestamp)),
+        ('claimable grading jobs', 'grading_jobs',
+         GradingJob.query.filter(GradingJob.status == 'pending').order_by(GradingJob.id).limit(10)),
+    ]
+
+def explain(query):
+    """Return the plan lines of a query."""
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'sqlite':
+        return [row[-1] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+    return [row[0] for row in db.session.execute(text('EXPLAIN ' + sql))]
+
+def uses_index(plan, table):
+    """True if the plan reads `table` through an index rather than a full scan."""
+    if db.engine.dialect.name == 'sqlite':
+        for line in plan:
+            if line.startswith(f'SCAN {table}') and 'INDEX' not in line:
+                return False
+        return any(line.startswith(f'SEARCH {table}') for line in plan)
+    
+    text_plan = '\n'.join(plan)
+    return f'Seq Scan on {table}' not in text_plan and 'Index' in text_plan
+
+def time_query(query, repeats):
+    """Median wall time of a query in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        query.all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def results_page_query_counts(app, admin_id, page_sizes):
+    """SQL statements issued by one results page request for each page size."""
+    from ..utils.auth import generate_token
+    
+    token = generate_token(db.session.get(User, admin_id))
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+    
+    counter = {'count': 0}
+    request_thread = threading.get_ident()
+    
+    def count_query(*args):
+        # The test client serves the request on this thread
+        if threading.get_ident() == request_thread:
+            counter['count'] += 1
+    
+    # The first request fills the principal cache
+    client.get('/admin/exams/1/results?limit=1', headers=headers)
+    
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        counts = {}
+        for limit in page_sizes:
+            counter['count'] = 0
+            response = client.get(f'/admin/exams/1/results?limit={limit}', headers=headers)
+            if response.status_code != 200:
+                raise RuntimeError(f'results page returned {response.status_code}')
+            counts[limit] = counter['count']
+        return counts
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exams', type=int, default=50)
+    parser.add_argument('--questions-per-exam', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--answers-per-session', type=int, default=20)
+    parser.add_argument('--logs-per-session', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='write the results as JSON')
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    configure_database(parser, args, 'query_plans')
+    
+    from ..app import create_app
+    app = create_app()
+    failures = []
+    report = {'queries': {}}
+    
+    with app.app_context():
+        report['database'] = db.engine.dialect.name
+        db.drop_all()
+        db.create_all()
+        
+        start = time.perf_counter()
+        admin_id = seed(args)
+        print(f"Seeded {args.sessions} sessions in {time.perf_counter() - start:.1f}s")
+        
+        print(f"{'query':<28} {'index':>6} {'median ms':>10}")
+        for name, table, query in hot_queries():
+            plan = explain(query)
+            indexed = uses_index(plan, table)
+            elapsed = time_query(query, args.repeats)
+            report['queries'][name] = {'uses_index': indexed, 'median_ms': elapsed, 'plan': plan}
+            print(f"{name:<28} {'yes' if indexed else 'NO':>6} {elapsed:>10.2f}")
+            if not indexed:
+                failures.append(f"{name}: full scan of {table}\n    " + '\n    '.join(plan))
+        
+        counts = results_page_query_counts(app, admin_id, [10, 100])
+        report['results_page_queries'] = counts
+        print(f"Results page queries by page size: {counts}")
+        if len(set(counts.values())) != 1:
+            failures.append(f"results page query count grows with page size: {counts}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
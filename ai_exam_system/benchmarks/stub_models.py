@@ -0,0 +1,75 @@
+"""
+Stand-ins for EssayGrader and QuestionGenerator with a fixed latency.
+
+They download nothing and load no ML libraries, so load tests measure the
+web application rather than the models. Scores are deterministic so runs
+can be compared.
+"""
+import math
+import time
+from ..utils import ai_models
+from ..utils.ai_models import FeedbackGenerator
+
+class StubEssayGrader(FeedbackGenerator):
+    """Grades with a fixed latency per forward pass of `batch_size` essays."""
+    
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.model_id = 'stub'
+        self.cache = None
+    
+    def warm_up(self):
+        pass
+    
+    def grade_essay(self, essay_text, reference_answer):
+        return self.grade_essays([(essay_text, reference_answer)])[0]
+    
+    def grade_essays(self, pairs, batch_size=8, profiles=None):
+        time.sleep(self.latency * math.ceil(len(pairs) / batch_size))
+        results = []
+        for i, (essay_text, reference_answer) in enumerate(pairs):
+            score = 1 + len(essay_text.split()) % 5
+            profile = profiles[i] if profiles else None
+            results.append((score, self.generate_feedback(score, essay_text, reference_answer, profile)))
+        return results
+
+class StubQuestionGenerator:
+    """Generates numbered placeholder questions with a fixed latency per batch."""
+    
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.counter = 0
+    
+    def warm_up(self):
+        pass
+    
+    def generate_question(self, topic, question_type='multiple_choice'):
+        return self.generate_questions([topic], 1, question_type)[0]
+    
+    def generate_questions(self, topics, count, question_type='multiple_choice', batch_size=16):
+        time.sleep(self.latency * math.ceil(count / batch_size))
+        questions = []
+        for i in range(count):
+            self.counter += 1
+            topic = topics[i % len(topics)]
+            text = f'Question {self.counter} about {topic}?'
+            if question_type == 'multiple_choice':
+                options = [f'{topic} option {k}' for k in range(4)]
+                questions.append({
+                    'question_text': text,
+                    'question_type': 'multiple_choice',
+                    'options': options,
+                    'correct_answer': options[0]
+                })
+            else:
+                questions.append({
+                    'question_text': text,
+                    'question_type': 'essay',
+                    'reference_answer': f'A model answer about {topic} and its key ideas.'
+                })
+        return questions
+
+def install_stub_models(grading_latency=0.05, generation_latency=0.2):
+    """Make get_essay_grader/get_question_generator return the stubs."""
+    ai_models.essay_grader = StubEssayGrader(grading_latency)
+    ai_models.question_generator = StubQuestionGenerator(generation_latency)
@@ -0,0 +1,133 @@
+"""
+Compare essay tokenization before and after pair encoding.
+
+"before" is the previous EssayGrader path: the pure-Python BertTokenizer
+re-tokenizes "Reference: ... Essay: ..." for every essay. "after" is the
+PairEncoder path: the Rust-backed BertTokenizerFast tokenizes each essay on
+its own and reuses the cached token ids of the reference. Only the tokenizers
+are loaded, no model weights. From transformers 5 on, BertTokenizer is the
+Rust-backed tokenizer as well, so "before" then differs from "after" only in
+the pair encoding and the reference cache.
+
+Usage (from the repository root):
+    python -m ai_exam_system.benchmarks.tokenization --count 1000 --questions 5
+    python -m ai_exam_system.benchmarks.tokenization --input essays.json --output tokenization.json
+
+The optional input file is a JSON list of {"essay": ..., "reference": ...} objects.
+"""
+import argparse
+import json
+import random
+import time
+
+from ..config import Config
+from ..utils.ai_models import PairEncoder
+
+SAMPLE_WORDS = (
+    'photosynthesis converts light energy into chemical energy stored in glucose '
+    'the chloroplast contains chlorophyll which absorbs red and blue light while '
+    'water is split releasing oxygen and carbon dioxide is fixed by the calvin cycle'
+).split()
+
+def synthetic_pairs(count, questions, seed=0):
+    """Essays of varied length spread over `questions` reference answers."""
+    rng = random.Random(seed)
+    references = [
+        ' '.join(rng.choice(SAMPLE_WORDS) for _ in range(rng.randint(40, 200)))
+        for _ in range(questions)
+    ]
+    return [
+        (' '.join(rng.choice(SAMPLE_WORDS) for _ in range(rng.randint(5, 600))), references[i % questions])
+        for i in range(count)
+    ]
+
+def load_pairs(path):
+    with open(path) as f:
+        return [(item['essay'], item['reference']) for item in json.load(f)]
+
+def tokenize_before(tokenizer, pairs):
+    return tokenizer(
+        [f"Reference: {reference_answer} Essay: {essay_text}" for essay_text, reference_answer in pairs],
+        add_special_tokens=True,
+        max_length=512,
+        truncation=True,
+        return_attention_mask=True
+    )
+
+def time_runs(function, repeats):
+    """Best wall time of `repeats` calls."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', help='JSON file of essay/reference pairs')
+    parser.add_argument('--count', type=int, default=1000, help='number of synthetic essays')
+    parser.add_argument('--questions', type=int, default=5, help='distinct reference answers of synthetic essays')
+    parser.add_argument('--batch-size', type=int, default=8, help='essays tokenized per call, as in grading')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--model', default=Config.BERT_MODEL_PATH)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+    
+    from transformers import BertTokenizer, BertTokenizerFast
+    
+    pairs = load_pairs(args.input) if args.input else synthetic_pairs(args.count, args.questions)
+    batches = [pairs[i:i + args.batch_size] for i in range(0, len(pairs), args.batch_size)]
+    slow = BertTokenizer.from_pretrained(args.model)
+    fast = BertTokenizerFast.from_pretrained(args.model)
+    
+    def before():
+        for batch in batches:
+            tokenize_before(slow, batch)
+    
+    def after():
+        # A fresh encoder per run, so reference tokenization is part of the measurement
+        encoder = PairEncoder(fast, max_length=512, min_reference_tokens=Config.GRADING_MIN_REFERENCE_TOKENS)
+        for batch in batches:
+            encoder.encode(batch)
+    
+    results = {}
+    for name, function in (('before', before), ('after', after)):
+        seconds = time_runs(function, args.repeats)
+        results[name] = {
+            'seconds': seconds,
+            'us_per_essay': seconds / len(pairs) * 1e6,
+            'essays_per_sec': len(pairs) / seconds
+        }
+    
+    # How often the old path cut into the essay text
+    encoder = PairEncoder(fast, max_length=512, min_reference_tokens=Config.GRADING_MIN_REFERENCE_TOKENS)
+    truncated = sum(
+        len(ids) >= 512 for ids in tokenize_before(fast, pairs)['input_ids']
+    )
+    essay_tokens = fast([essay_text for essay_text, _ in pairs], add_special_tokens=False)['input_ids']
+    kept = encoder.encode(pairs)['token_type_ids']
+    essay_kept = sum(sum(types) - 1 for types in kept) / max(1, sum(len(ids) for ids in essay_tokens))
+    
+    speedup = results['before']['us_per_essay'] / results['after']['us_per_essay']
+    print(f"{'path':<8} {'us/essay':>10} {'essays/s':>10}")
+    for name, row in results.items():
+        print(f"{name:<8} {row['us_per_essay']:>10.1f} {row['essays_per_sec']:>10.1f}")
+    print(f"Speedup {speedup:.2f}x over {len(pairs)} essays and {len({r for _, r in pairs})} references; "
+          f"{truncated} essays truncated before, {essay_kept:.1%} of essay tokens kept after")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'essays': len(pairs),
+                'references': len({r for _, r in pairs}),
+                'batch_size': args.batch_size,
+                'paths': results,
+                'speedup': speedup,
+                'truncated_before': truncated,
+                'essay_tokens_kept_after': essay_kept
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
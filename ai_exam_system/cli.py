@@ -0,0 +1,195 @@
+import json
+import click
+from flask.cli import with_appcontext
+
+def register_commands(app):
+    """Register the maintenance commands on the application's `flask` CLI."""
+    app.cli.add_command(analyze_videos_command)
+    app.cli.add_command(rebuild_proctoring_rollups_command)
+    app.cli.add_command(grading_worker_command)
+    app.cli.add_command(session_reaper_command)
+    app.cli.add_command(regrade_command)
+    app.cli.add_command(serve_models_command)
+
+@click.command('analyze-videos')
+@click.option('--session-id', type=int, help='Only analyse recordings of this exam session.')
+@click.option('--video-id', type=int, help='Only analyse this recording.')
+@click.option('--workers', type=int, help='Worker processes (default VIDEO_ANALYSIS_WORKERS).')
+@click.option('--sample-fps', type=float, help='Frames sampled per video-second (default VIDEO_ANALYSIS_SAMPLE_FPS).')
+@click.option('--segment-seconds', type=float, help='Video-seconds per worker task (default VIDEO_ANALYSIS_SEGMENT_SECONDS).')
+@click.option('--json', 'as_json', is_flag=True, help='Print the summary as JSON.')
+@with_appcontext
+def analyze_videos_command(session_id, video_id, workers, sample_fps, segment_seconds, as_json):
+    """Run face detection over uploaded proctoring recordings."""
+    from .utils.video_analysis import analyze_videos, pending_videos
+    
+    videos = pending_videos(session_id=session_id, video_id=video_id)
+    if not videos:
+        click.echo('No recordings waiting for analysis.')
+        return
+    
+    summary = analyze_videos(videos, workers=workers, sample_fps=sample_fps, segment_seconds=segment_seconds)
+    
+    if as_json:
+        click.echo(json.dumps(summary, indent=2))
+    else:
+        click.echo(
+            f"Analysed {summary['videos']} videos ({summary['failed']} failed), "
+            f"{summary['segments']} segments, {summary['events']} events"
+        )
+        click.echo(
+            f"{summary['video_seconds']:.0f} video-seconds in {summary['wall_seconds']:.1f}s: "
+            f"{summary['video_seconds_per_second']:.1f} video-seconds/s with {summary['workers']} workers"
+        )
+    
+    if summary['failed']:
+        raise SystemExit(1)
+
+@click.command('rebuild-proctoring-rollups')
+@with_appcontext
+def rebuild_proctoring_rollups_command():
+    """Recompute the proctoring rollup tables from the raw proctoring logs."""
+    from .utils.proctoring import rebuild_rollups
+    
+    total = rebuild_rollups()
+    click.echo(f'Rebuilt proctoring rollups from {total} logs.')
+
+@click.command('grading-worker')
+@click.option('--workers', type=int, help='Worker threads (default GRADING_WORKERS, or 2 if that is 0).')
+@with_appcontext
+def grading_worker_command(workers):
+    """Grade submitted exams from the job queue until interrupted."""
+    import time
+    from flask import current_app
+    from .utils.grading_queue import GradingWorkerPool
+    
+    app = current_app._get_current_object()
+    # Replace a pool create_app may have started, so --workers is honoured
+    started = app.extensions.pop('grading_pool', None)
+    if started is not None:
+        started.stop()
+    
+    pool = GradingWorkerPool(app, workers or app.config['GRADING_WORKERS'] or 2, app.config['GRADING_POLL_INTERVAL'])
+    pool.start()
+    app.extensions['grading_pool'] = pool
+    click.echo(f'Grading with {pool.num_workers} workers')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+@click.command('session-reaper')
+@with_appcontext
+def session_reaper_command():
+    """Finalize exam sessions whose time is up until interrupted; run one per deployment."""
+    import time
+    from flask import current_app
+    from .utils.session_reaper import SessionReaper
+    
+    app = current_app._get_current_object()
+    # This process is the deployment's reaper; stop one create_app may have started
+    started = app.extensions.pop('session_reaper', None)
+    if started is not None:
+        started.stop()
+    
+    reaper = SessionReaper(
+        app,
+        app.config['SESSION_EXPIRY_GRACE'],
+        app.config['SESSION_REAPER_POLL_INTERVAL'],
+        app.config['SESSION_REAPER_BATCH_SIZE'],
+        app.config['SESSION_REAPER_RESCAN_SECONDS']
+    )
+    reaper.start()
+    app.extensions['session_reaper'] = reaper
+    click.echo('Finalizing timed-out exam sessions')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reaper.stop()
+
+@click.command('regrade')
+@click.option('--exam-id', type=int, help='Only re-grade answers of this exam.')
+@click.option('--since', type=click.DateTime(), help='Only sessions started at or after this date.')
+@click.option('--until', type=click.DateTime(), help='Only sessions started before this date.')
+@click.option('--workers', type=int, help='Worker processes (default REGRADE_WORKERS).')
+@click.option('--batch-size', type=int, help='Essays per forward pass (default GRADING_BATCH_SIZE).')
+@click.option('--chunk-size', type=int, help='Answers per task and checkpoint (default REGRADE_CHUNK_SIZE).')
+@click.option('--restart', is_flag=True, help='Start over instead of resuming an interrupted run.')
+@with_appcontext
+def regrade_command(exam_id, since, until, workers, batch_size, chunk_size, restart):
+    """Re-grade essay answers with the current BERT_MODEL_PATH, resuming interrupted runs."""
+    from .utils.regrade import regrade, start_run
+    
+    if exam_id is None and since is None and until is None:
+        raise click.UsageError('Select answers with --exam-id and/or --since/--until.')
+    
+    run = start_run(exam_id=exam_id, since=since, until=until, restart=restart)
+    if run.last_answer_id:
+        click.echo(f'Resuming run {run.id} after answer {run.last_answer_id} ({run.processed}/{run.total} done)')
+    else:
+        click.echo(f'Started run {run.id}: {run.total} essay answers')
+    
+    def report(progress):
+        eta = progress['eta_seconds']
+        click.echo(
+            f"{progress['processed']}/{progress['total']} answers, "
+            f"{progress['essays_per_second']:.1f} essays/s, "
+            f"ETA {'-' if eta is None else f'{eta:.0f}s'}"
+        )
+    
+    summary = regrade(run, workers=workers, batch_size=batch_size, chunk_size=chunk_size, report=report)
+    click.echo(
+        f"Re-graded {summary['graded']} answers in {summary['wall_seconds']:.1f}s: "
+        f"{summary['essays_per_second']:.1f} essays/s with {summary['workers']} workers"
+    )
+
+@click.command('serve-models')
+@click.option('--socket', 'socket_path', help='Unix socket to listen on (default MODEL_SERVER_SOCKET).')
+@click.option('--metrics-address', help='host:port to serve /metrics on (default MODEL_SERVER_METRICS_ADDRESS).')
+@with_appcontext
+def serve_models_command(socket_path, metrics_address):
+    """
+    Load the models once and serve them to the web workers of this node.
+    Run with BACKGROUND_SERVICES=false; services the app started anyway are stopped.
+    """
+    from flask import current_app
+    from .app import stop_background_services
+    from .utils.ai_models import warm_up_models
+    from .utils.model_server import ModelServer, start_metrics_server
+    
+    app = current_app._get_current_object()
+    socket_path = socket_path or app.config['MODEL_SERVER_SOCKET']
+    if not socket_path:
+        raise click.UsageError('Set MODEL_SERVER_SOCKET or pass --socket.')
+    metrics_address = metrics_address or app.config['MODEL_SERVER_METRICS_ADDRESS']
+    
+    # The flask CLI builds the app before running the command; grading, pool
+    # filling and session expiry belong to the web processes
+    if app.config['BACKGROUND_SERVICES']:
+        app.logger.warning('Stopping background services; set BACKGROUND_SERVICES=false for serve-models')
+        stop_background_services(app)
+    
+    # This process owns the weights, so its own model calls must stay local
+    app.config['MODEL_SERVER_SOCKET'] = None
+    warm_up_models(app)
+    
+    metrics_server = start_metrics_server(metrics_address) if metrics_address else None
+    server = ModelServer(app, socket_path)
+    click.echo(f'Serving models on {socket_path}')
+    if metrics_server is not None:
+        click.echo(f'Serving metrics on http://{metrics_address}/metrics')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
@@ -8,14 +8,116 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 30))  # seconds a role change may take to reach other workers
     
     # AI Model configurations
     BERT_MODEL_PATH = os.environ.get('BERT_MODEL_PATH', 'bert-base-uncased')
     GPT2_MODEL_PATH = os.environ.get('GPT2_MODEL_PATH', 'gpt2')
+    GENERATION_BATCH_SIZE = int(os.environ.get('GENERATION_BATCH_SIZE', 16))  # sequences per generate call
+    MAX_GENERATED_QUESTIONS = int(os.environ.get('MAX_GENERATED_QUESTIONS', 100))  # per bulk request
+    
+    # Pool of pre-generated questions (enable the filler on one inference worker)
+    QUESTION_POOL_FILLER = os.environ.get('QUESTION_POOL_FILLER', 'false').lower() == 'true'
+    QUESTION_POOL_TOPICS = [t.strip() for t in os.environ.get('QUESTION_POOL_TOPICS', '').split(',') if t.strip()]
+    QUESTION_POOL_TARGET_DEPTH = int(os.environ.get('QUESTION_POOL_TARGET_DEPTH', 20))
+    QUESTION_POOL_LOW_WATERMARK = int(os.environ.get('QUESTION_POOL_LOW_WATERMARK', 5))
+    QUESTION_POOL_REFILL_INTERVAL = float(os.environ.get('QUESTION_POOL_REFILL_INTERVAL', 30))  # seconds
+    QUESTION_POOL_TOPIC_TTL = float(os.environ.get('QUESTION_POOL_TOPIC_TTL', 7 * 24 * 3600))  # seconds an unrequested topic stays pooled, 0 = forever
+    GRADING_BATCH_SIZE = int(os.environ.get('GRADING_BATCH_SIZE', 8))
+    GRADING_MIN_REFERENCE_TOKENS = int(os.environ.get('GRADING_MIN_REFERENCE_TOKENS', 128))  # reference tokens kept when truncating a long pair
+    GRADING_BACKEND = os.environ.get('GRADING_BACKEND', 'torch')  # 'torch', 'torch-int8' or 'onnx'
+    ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR', os.path.join(os.path.dirname(__file__), 'instance', 'onnx'))
+    
+    # Essay grading mode: 'model' (cross-encoder), 'similarity' (embeddings) or 'triage' (both)
+    GRADING_MODE = os.environ.get('GRADING_MODE', 'model')
+    SIMILARITY_MODEL_PATH = os.environ.get('SIMILARITY_MODEL_PATH', 'sentence-transformers/all-MiniLM-L6-v2')
+    SIMILARITY_THRESHOLDS = [float(t) for t in os.environ.get('SIMILARITY_THRESHOLDS', '0.35,0.5,0.65,0.8').split(',')]  # cut-offs for scores 2-5
+    SIMILARITY_TRIAGE_MARGIN = float(os.environ.get('SIMILARITY_TRIAGE_MARGIN', 0.05))  # re-grade essays this close to a cut-off
+    SIMILARITY_REFERENCE_CACHE_SIZE = int(os.environ.get('SIMILARITY_REFERENCE_CACHE_SIZE', 1000))  # cached reference embeddings
+    
+    # Micro-batching of concurrent grading calls into shared forward passes
+    INFERENCE_BATCHING = os.environ.get('INFERENCE_BATCHING', 'true').lower() == 'true'
+    INFERENCE_MAX_BATCH_SIZE = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 32))
+    INFERENCE_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 10))  # wait for more items after the first
+    INFERENCE_TORCH_THREADS = int(os.environ.get('INFERENCE_TORCH_THREADS', 0))  # intra-op threads of the inference thread, 0 = torch default
+    INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 300))  # seconds a caller waits for its batch's results
+    
+    # Unix socket of the node's model server (flask serve-models); when set, web
+    # workers send grade/generate calls there instead of loading the models
+    MODEL_SERVER_SOCKET = os.environ.get('MODEL_SERVER_SOCKET') or None
+    MODEL_SERVER_TIMEOUT = float(os.environ.get('MODEL_SERVER_TIMEOUT', 300))  # seconds per call
+    # host:port on which the model server serves its own /metrics (inference runs there, not in web workers)
+    MODEL_SERVER_METRICS_ADDRESS = os.environ.get('MODEL_SERVER_METRICS_ADDRESS') or None
+    
+    # Grading workers, question pool filler, autosave/proctoring flushers and
+    # session reaper; off in processes that serve no requests (flask serve-models)
+    BACKGROUND_SERVICES = os.environ.get('BACKGROUND_SERVICES', 'true').lower() == 'true'
+    
+    # Load and warm up both models in create_app (enable on inference workers only)
+    PRELOAD_MODELS = os.environ.get('PRELOAD_MODELS', 'false').lower() == 'true'
+    
+    # Request, SQL and model instrumentation served on /metrics, only to
+    # scrapers connecting from METRICS_ALLOWED_NETWORKS (comma-separated CIDRs)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_ALLOWED_NETWORKS = [n.strip() for n in os.environ.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128').split(',') if n.strip()]
+    SLOW_REQUEST_LOG = os.environ.get('SLOW_REQUEST_LOG', 'false').lower() == 'true'
+    SLOW_REQUEST_THRESHOLD = float(os.environ.get('SLOW_REQUEST_THRESHOLD', 1.0))  # seconds
+    
+    # Background grading queue; web processes only enqueue jobs by default, grading
+    # runs in `flask grading-worker` processes or where GRADING_WORKERS is set
+    GRADING_WORKERS = int(os.environ.get('GRADING_WORKERS', 0))
+    GRADING_POLL_INTERVAL = float(os.environ.get('GRADING_POLL_INTERVAL', 1.0))  # seconds
+    GRADING_JOB_TIMEOUT = int(os.environ.get('GRADING_JOB_TIMEOUT', 300))  # seconds before a running job is retried
+    GRADING_MAX_ATTEMPTS = int(os.environ.get('GRADING_MAX_ATTEMPTS', 3))
+    GRADING_START_DELAY = float(os.environ.get('GRADING_START_DELAY', 1.0))  # seconds, lets other workers flush autosaves
+    
+    # Server-side exam time limit: sessions still in progress at start_time +
+    # duration (plus the grace period) are finalized and queued for grading.
+    # One reaper per deployment is enough: run `flask session-reaper` or set
+    # SESSION_REAPER in exactly one process (e.g. a single-process dev server)
+    SESSION_REAPER = os.environ.get('SESSION_REAPER', 'false').lower() == 'true'
+    SESSION_EXPIRY_GRACE = int(os.environ.get('SESSION_EXPIRY_GRACE', 30))  # seconds for in-flight submits
+    SESSION_REAPER_POLL_INTERVAL = float(os.environ.get('SESSION_REAPER_POLL_INTERVAL', 5.0))  # seconds, picks up sessions started by other processes
+    SESSION_REAPER_BATCH_SIZE = int(os.environ.get('SESSION_REAPER_BATCH_SIZE', 500))  # sessions finalized per transaction
+    SESSION_REAPER_RESCAN_SECONDS = int(os.environ.get('SESSION_REAPER_RESCAN_SECONDS', 300))  # sessions started this recently are re-read, ids may commit out of order
+    
+    # Bulk re-grading (flask regrade)
+    REGRADE_WORKERS = int(os.environ.get('REGRADE_WORKERS', 2))  # processes, each loads the model once
+    REGRADE_CHUNK_SIZE = int(os.environ.get('REGRADE_CHUNK_SIZE', 256))  # answers per task and checkpoint
+    
+    # Content-addressed cache of grading results
+    GRADING_CACHE_ENABLED = os.environ.get('GRADING_CACHE_ENABLED', 'true').lower() == 'true'
+    GRADING_CACHE_SIZE = int(os.environ.get('GRADING_CACHE_SIZE', 10000))  # in-memory LRU entries
+    
+    # Answer autosave: repeated saves are coalesced in memory and flushed in bulk
+    AUTOSAVE_FLUSH_INTERVAL = float(os.environ.get('AUTOSAVE_FLUSH_INTERVAL', 0.3))  # seconds
+    AUTOSAVE_MAX_PENDING = int(os.environ.get('AUTOSAVE_MAX_PENDING', 10000))  # flush early above this
+    
+    # Seconds a cached exam payload is served before it is rebuilt
+    EXAM_CACHE_TTL = int(os.environ.get('EXAM_CACHE_TTL', 60))
+    
+    # Admin results reporting
+    RESULTS_PAGE_SIZE = int(os.environ.get('RESULTS_PAGE_SIZE', 100))
+    RESULTS_MAX_PAGE_SIZE = int(os.environ.get('RESULTS_MAX_PAGE_SIZE', 500))
     
     # Proctoring configurations
     MAX_VIDEO_SIZE = 100 * 1024 * 1024  # 100MB
     ALLOWED_EXTENSIONS = {'mp4', 'webm'}
+    VIDEO_CHUNK_MAX_SIZE = int(os.environ.get('VIDEO_CHUNK_MAX_SIZE', 5 * 1024 * 1024))  # 5MB
+    VIDEO_UPLOAD_FOLDER = os.environ.get('VIDEO_UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), 'instance', 'videos'))
+    
+    # Proctoring event ingestion
+    PROCTORING_MAX_BATCH_EVENTS = int(os.environ.get('PROCTORING_MAX_BATCH_EVENTS', 1000))  # per request
+    PROCTORING_MAX_BODY_SIZE = int(os.environ.get('PROCTORING_MAX_BODY_SIZE', 2 * 1024 * 1024))  # bytes per request, enforced while reading
+    PROCTORING_BUFFER_MAX_EVENTS = int(os.environ.get('PROCTORING_BUFFER_MAX_EVENTS', 50000))  # 429 above this
+    PROCTORING_FLUSH_SIZE = int(os.environ.get('PROCTORING_FLUSH_SIZE', 2000))
+    PROCTORING_FLUSH_INTERVAL = float(os.environ.get('PROCTORING_FLUSH_INTERVAL', 1.0))  # seconds
+    PROCTORING_RISK_WEIGHTS = {'info': 0, 'warning': 1, 'critical': 5}  # risk score per event
+    
+    # Offline face detection over uploaded recordings (flask analyze-videos)
+    VIDEO_ANALYSIS_WORKERS = int(os.environ.get('VIDEO_ANALYSIS_WORKERS', os.cpu_count() or 1))
+    VIDEO_ANALYSIS_SAMPLE_FPS = float(os.environ.get('VIDEO_ANALYSIS_SAMPLE_FPS', 1.0))  # frames per video-second
+    VIDEO_ANALYSIS_SEGMENT_SECONDS = float(os.environ.get('VIDEO_ANALYSIS_SEGMENT_SECONDS', 60))  # per worker task
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -1,14 +1,21 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import User, Exam, Question, QuestionOption, ExamSession, db
-from ..utils.auth import admin_required
+from flask import Blueprint, request, jsonify, current_app, abort
+from sqlalchemy.orm import joinedload, selectinload
+from ..models import User, Exam, Question, QuestionOption, ExamSession, GradingCacheEntry, db
+from ..utils.auth import admin_required, invalidate_principal
 from ..utils.ai_models import get_question_generator
+from ..utils.grading_cache import get_grading_cache
+from ..utils.question_pool import take_question, pool_stats
+from ..utils.proctoring import rank_sessions_by_risk, session_rollup
+from ..utils.reference_profile import compile_exam_references
+from ..utils.similarity_grader import validate_thresholds
+from ..utils.exam_cache import get_exam_details as get_cached_exam_details
+from ..utils.exam_cache import invalidate_exam, invalidate_exam_list, cached_json_response
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/exams', methods=['POST'])
 @admin_required
-def create_exam():
+def create_exam(current_user):
     """Create a new exam."""
     try:
         data = request.get_json()
@@ -21,6 +28,7 @@ def create_exam():
         
         db.session.add(new_exam)
         db.session.commit()
+        invalidate_exam_list()
         
         return jsonify({
             'message': 'Exam created successfully',
@@ -35,7 +43,7 @@ def create_exam():
 
 @admin_bp.route('/exams/<int:exam_id>/questions', methods=['POST'])
 @admin_required
-def add_question(exam_id):
+def add_question(current_user, exam_id):
     """Add a question to an exam."""
     try:
         data = request.get_json()
@@ -43,11 +51,21 @@ def add_question(exam_id):
         
         # If AI-generated question is requested
         if data.get('generate', False):
-            question_generator = get_question_generator()
-            generated = question_generator.generate_question(
-                topic=data['topic'],
-                question_type=data.get('question_type', 'multiple_choice')
+            question_type = data.get('question_type', 'multiple_choice')
+            
+            # Serve a pre-generated question; fall back to live generation on a pool miss
+            generated = take_question(
+                data['topic'],
+                question_type,
+                filler=current_app.extensions.get('question_pool_filler')
             )
+            if generated is None:
+                # The miss is already committed; generation runs without holding a write lock
+                question_generator = get_question_generator()
+                generated = question_generator.generate_question(
+                    topic=data['topic'],
+                    question_type=question_type
+                )
             
             question = Question(
                 exam_id=exam_id,
@@ -82,6 +100,8 @@ def add_question(exam_id):
                 correct_answer=data.get('correct_answer'),
                 points=data.get('points', 1)
             )
+            if data.get('similarity_thresholds') is not None:
+                question.similarity_thresholds = validate_thresholds(data['similarity_thresholds'])
             db.session.add(question)
             db.session.flush()
             
@@ -94,45 +114,135 @@ def add_question(exam_id):
                     )
                     db.session.add(opt)
         
+        if question.question_type == 'essay':
+            db.session.flush()
+            compile_exam_references(exam_id)
+        
         db.session.commit()
+        invalidate_exam(exam_id)
         return jsonify({'message': 'Question added successfully'}), 201
         
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': f'Invalid request: {str(e)}'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error adding question: {str(e)}'}), 500
 
+@admin_bp.route('/exams/<int:exam_id>/questions/generate', methods=['POST'])
+@admin_required
+def generate_questions(current_user, exam_id):
+    """Generate several AI questions for an exam in one request."""
+    try:
+        data = request.get_json()
+        exam = Exam.query.get_or_404(exam_id)
+        
+        topics = data['topics']
+        count = int(data['count'])
+        question_type = data.get('question_type', 'multiple_choice')
+        
+        if not isinstance(topics, list) or not topics:
+            return jsonify({'message': 'Topics must be a non-empty list'}), 400
+        
+        if question_type not in ['multiple_choice', 'essay']:
+            return jsonify({'message': 'Invalid question type'}), 400
+        
+        max_count = current_app.config['MAX_GENERATED_QUESTIONS']
+        if count < 1 or count > max_count:
+            return jsonify({'message': f'Count must be between 1 and {max_count}'}), 400
+        
+        question_generator = get_question_generator()
+        generated = question_generator.generate_questions(
+            topics=topics,
+            count=count,
+            question_type=question_type,
+            batch_size=current_app.config['GENERATION_BATCH_SIZE']
+        )
+        
+        questions = []
+        for item in generated:
+            question = Question(
+                exam_id=exam.id,
+                question_text=item['question_text'],
+                question_type=item['question_type'],
+                points=data.get('points', 1)
+            )
+            
+            if item['question_type'] == 'multiple_choice':
+                question.correct_answer = item['correct_answer']
+                question.options = [
+                    QuestionOption(
+                        option_text=option_text,
+                        is_correct=(option_text == item['correct_answer'])
+                    )
+                    for option_text in item['options']
+                ]
+            else:
+                question.correct_answer = item['reference_answer']
+            
+            questions.append(question)
+        
+        # Questions and their options are flushed together as batched inserts
+        db.session.add_all(questions)
+        if question_type == 'essay':
+            db.session.flush()
+            compile_exam_references(exam.id)
+        db.session.commit()
+        invalidate_exam(exam.id)
+        
+        return jsonify({
+            'message': f'{len(questions)} questions generated successfully',
+            'question_ids': [q.id for q in questions]
+        }), 201
+        
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'message': f'Invalid request: {str(e)}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error generating questions: {str(e)}'}), 500
+
 @admin_bp.route('/exams/<int:exam_id>', methods=['GET'])
 @admin_required
-def get_exam_details(exam_id):
+def get_exam_details(current_user, exam_id):
     """Get detailed information about an exam."""
-    exam = Exam.query.get_or_404(exam_id)
+    body, etag = get_cached_exam_details(exam_id)
+    if body is None:
+        abort(404)
     
-    questions = [{
-        'id': q.id,
-        'text': q.question_text,
-        'type': q.question_type,
-        'points': q.points,
-        'options': [{'id': opt.id, 'text': opt.option_text} 
-                   for opt in q.options] if q.question_type == 'multiple_choice' else None
-    } for q in exam.questions]
-    
-    return jsonify({
-        'id': exam.id,
-        'title': exam.title,
-        'description': exam.description,
-        'duration_minutes': exam.duration_minutes,
-        'questions': questions
-    }), 200
+    return cached_json_response(body, etag)
 
 @admin_bp.route('/exams/<int:exam_id>/results', methods=['GET'])
 @admin_required
-def get_exam_results(exam_id):
-    """Get results for all students who took the exam."""
-    sessions = ExamSession.query.filter_by(exam_id=exam_id).all()
+def get_exam_results(current_user, exam_id):
+    """
+    Get a page of results for students who took the exam.
+    Pages are keyed by session id: pass the returned `next_after_session_id`
+    as `after_session_id` to get the next page. Optional `status` filter.
+    """
+    after_session_id = request.args.get('after_session_id', 0, type=int)
+    limit = request.args.get('limit', current_app.config['RESULTS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['RESULTS_MAX_PAGE_SIZE']))
+    status = request.args.get('status')
+    
+    # Students are joined into the session query and answers are loaded with
+    # one IN query for the whole page, so a page always costs two queries
+    query = ExamSession.query.options(
+        joinedload(ExamSession.student),
+        selectinload(ExamSession.answers)
+    ).filter(
+        ExamSession.exam_id == exam_id,
+        ExamSession.id > after_session_id
+    )
+    if status:
+        query = query.filter(ExamSession.status == status)
+    
+    sessions = query.order_by(ExamSession.id).limit(limit + 1).all()
+    has_more = len(sessions) > limit
+    sessions = sessions[:limit]
     
     results = []
     for session in sessions:
-        student = User.query.get(session.student_id)
+        student = session.student
         answers = [{
             'question_id': answer.question_id,
             'answer_text': answer.answer_text,
@@ -154,11 +264,36 @@ def get_exam_results(exam_id):
             'answers': answers
         })
     
-    return jsonify(results), 200
+    return jsonify({
+        'results': results,
+        'has_more': has_more,
+        'next_after_session_id': sessions[-1].id if has_more else None
+    }), 200
+
+@admin_bp.route('/exams/<int:exam_id>/proctoring/risk', methods=['GET'])
+@admin_required
+def get_proctoring_risk(current_user, exam_id):
+    """Rank the sessions of an exam by proctoring risk score, highest first."""
+    Exam.query.get_or_404(exam_id)
+    limit = request.args.get('limit', current_app.config['RESULTS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['RESULTS_MAX_PAGE_SIZE']))
+    
+    return jsonify({
+        'exam_id': exam_id,
+        'weights': current_app.config['PROCTORING_RISK_WEIGHTS'],
+        'sessions': rank_sessions_by_risk(exam_id, limit)
+    }), 200
+
+@admin_bp.route('/sessions/<int:session_id>/proctoring/summary', methods=['GET'])
+@admin_required
+def get_proctoring_summary(current_user, session_id):
+    """Proctoring event counts of a session and their per-minute timeline."""
+    ExamSession.query.get_or_404(session_id)
+    return jsonify(session_rollup(session_id)), 200
 
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
-def get_users():
+def get_users(current_user):
     """Get list of all users."""
     users = User.query.all()
     return jsonify([{
@@ -171,7 +306,7 @@ def get_users():
 
 @admin_bp.route('/users/<int:user_id>/role', methods=['PUT'])
 @admin_required
-def update_user_role(user_id):
+def update_user_role(current_user, user_id):
     """Update a user's role."""
     try:
         data = request.get_json()
@@ -184,10 +319,28 @@ def update_user_role(user_id):
             return jsonify({'message': 'Invalid role'}), 400
         
         user.role = data['role']
+        
+        # Revoke tokens carrying the old role
+        user.token_version = (user.token_version or 1) + 1
         db.session.commit()
+        invalidate_principal(user.id)
         
         return jsonify({'message': 'User role updated successfully'}), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error updating user role: {str(e)}'}), 500
+
+@admin_bp.route('/grading-cache/stats', methods=['GET'])
+@admin_required
+def get_grading_cache_stats(current_user):
+    """Get hit/miss counters of the grading result cache."""
+    stats = get_grading_cache().stats()
+    stats['persisted_entries'] = GradingCacheEntry.query.count()
+    return jsonify(stats), 200
+
+@admin_bp.route('/question-pool/stats', methods=['GET'])
+@admin_required
+def get_question_pool_stats(current_user):
+    """Get depth and refill statistics of the pre-generated question pool."""
+    return jsonify(pool_stats()), 200
@@ -1,5 +1,4 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import check_password_hash
 from ..models import User, db
 from ..utils.auth import (
     generate_token, token_required, create_user,
@@ -63,8 +62,8 @@ def login():
         
         # Find user by email
         user = User.query.filter_by(email=data['email']).first()
-        if user and check_password_hash(user.password, data['password']):
-            access_token = generate_token(user.id)
+        if user and user.check_password(data['password']):
+            access_token = generate_token(user)
             return jsonify({
                 'success': True,
                 'token': access_token
@@ -1,7 +1,11 @@
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import Exam, ExamSession, Answer, db
-from ..utils.ai_models import get_essay_grader, get_question_generator
+from ..models import Exam, ExamSession, Answer, Question, GradingJob, db
+from ..utils.grading_queue import enqueue_grading, notify_workers
+from ..utils.exam_cache import get_exam_list, cached_json_response
+from ..utils.autosave import get_autosave_buffer, save_answers
+from ..utils.session_reaper import expire_sessions, schedule_session, time_is_up
 
 exam_bp = Blueprint('exam', __name__)
 
@@ -9,20 +13,15 @@ exam_bp = Blueprint('exam', __name__)
 @jwt_required()
 def get_exams():
     """Retrieve available exams for the logged-in user."""
-    user_id = get_jwt_identity()
-    exams = Exam.query.all()
-    return jsonify([{
-        'id': exam.id,
-        'title': exam.title,
-        'description': exam.description,
-        'duration_minutes': exam.duration_minutes
-    } for exam in exams]), 200
+    user_id = int(get_jwt_identity())
+    body, etag = get_exam_list()
+    return cached_json_response(body, etag)
 
 @exam_bp.route('/<int:exam_id>/start', methods=['POST'])
 @jwt_required()
 def start_exam(exam_id):
     """Start an exam session for the logged-in user."""
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     exam = Exam.query.get_or_404(exam_id)
     
     # Create a new exam session
@@ -30,37 +29,125 @@ def start_exam(exam_id):
     db.session.add(session)
     db.session.commit()
     
+    # The server finalizes the session when its time is up, even if the client never submits
+    schedule_session(session, exam.duration_minutes)
+    
     return jsonify({'session_id': session.id, 'message': 'Exam started successfully'}), 201
 
+@exam_bp.route('/<int:session_id>/answers/<int:question_id>', methods=['PUT'])
+@jwt_required()
+def autosave_answer(session_id, question_id):
+    """Autosave the current answer to one question of an exam session."""
+    user_id = int(get_jwt_identity())
+    session = ExamSession.query.get_or_404(session_id)
+    
+    if session.student_id != user_id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+    
+    if session.status != 'in_progress':
+        return jsonify({'message': 'Exam has already been submitted'}), 409
+    
+    data = request.get_json()
+    if not data or 'answer_text' not in data:
+        return jsonify({'message': 'Missing required field: answer_text'}), 400
+    
+    if time_is_up(session):
+        return jsonify({'message': 'Exam time is over'}), 409
+    
+    if not db.session.query(Question.id).filter_by(id=question_id, exam_id=session.exam_id).first():
+        return jsonify({'message': 'Question does not belong to this exam'}), 404
+    
+    # Rapid repeat saves are coalesced and written in bulk by the flusher
+    get_autosave_buffer().save(session.id, question_id, data['answer_text'])
+    
+    return jsonify({'message': 'Answer saved'}), 202
+
 @exam_bp.route('/<int:session_id>/submit', methods=['POST'])
 @jwt_required()
 def submit_exam(session_id):
     """Submit answers for the exam session."""
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     session = ExamSession.query.get_or_404(session_id)
     
     if session.student_id != user_id:
         return jsonify({'message': 'Unauthorized access'}), 403
     
-    data = request.get_json()
+    if session.status != 'in_progress':
+        return jsonify({'message': 'Exam has already been submitted'}), 409
+    
+    deadline = time_is_up(session)
+    if deadline is not None:
+        # Answers sent after the deadline are not accepted; what was saved in time is graded
+        expire_sessions({session.id: deadline})
+        return jsonify({'message': 'Exam time is over; saved answers were submitted'}), 409
+    
+    data = request.get_json() or {}
     answers = data.get('answers', [])
     
-    for answer_data in answers:
-        answer = Answer(
-            session_id=session.id,
-            question_id=answer_data['question_id'],
-            answer_text=answer_data['answer_text']
-        )
-        db.session.add(answer)
-    
-    # Grade essay answers using BERT
-    essay_grader = get_essay_grader()
-    for answer in answers:
-        if answer['question_type'] == 'essay':
-            score, feedback = essay_grader.grade_essay(answer['answer_text'], answer['reference_answer'])
-            answer.score = score
-            answer.feedback = feedback
+    question_ids = {question_id for (question_id,) in
+                    db.session.query(Question.id).filter_by(exam_id=session.exam_id)}
+    if any(answer_data.get('question_id') not in question_ids for answer_data in answers):
+        return jsonify({'message': 'Answers must reference questions of this exam'}), 400
+    
+    # Answers are normally autosaved already; write what is still buffered here
+    get_autosave_buffer().flush(session_id=session.id)
+    
+    # Answers sent with the submission replace their autosaved versions
+    now = datetime.utcnow()
+    save_answers([{
+        'session_id': session.id,
+        'question_id': answer_data['question_id'],
+        'answer_text': answer_data['answer_text'],
+        'submitted_at': now
+    } for answer_data in answers])
     
+    # Conditional update: the session reaper may have finalized it since it was read
+    submitted = ExamSession.query.filter(
+        ExamSession.id == session.id,
+        ExamSession.status == 'in_progress'
+    ).update({'status': 'completed', 'end_time': now}, synchronize_session=False)
+    if not submitted:
+        db.session.rollback()
+        return jsonify({'message': 'Exam has already been submitted'}), 409
+    
+    # Essay answers are graded by the background workers
+    job = enqueue_grading(session.id)
     db.session.commit()
+    notify_workers()
+    
+    return jsonify({
+        'message': 'Exam submitted successfully',
+        'job_id': job.id
+    }), 202
+
+@exam_bp.route('/<int:session_id>/grading-status', methods=['GET'])
+@jwt_required()
+def get_grading_status(session_id):
+    """Report the grading progress of a submitted exam session."""
+    user_id = int(get_jwt_identity())
+    session = ExamSession.query.get_or_404(session_id)
+    
+    if session.student_id != user_id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+    
+    job = GradingJob.query.filter_by(session_id=session.id) \
+        .order_by(GradingJob.id.desc()).first()
+    if not job:
+        return jsonify({'message': 'Exam has not been submitted'}), 404
+    
+    graded, pending = db.session.query(
+        db.func.count(Answer.score),
+        db.func.count(Answer.id) - db.func.count(Answer.score)
+    ).join(Question, Answer.question_id == Question.id) \
+        .filter(Answer.session_id == session.id, Question.question_type == 'essay') \
+        .one()
     
-    return jsonify({'message': 'Exam submitted successfully'}), 200
+    return jsonify({
+        'session_id': session.id,
+        'job_id': job.id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'graded_essays': graded,
+        'pending_essays': pending,
+        'error': job.error if job.status == 'failed' else None
+    }), 200
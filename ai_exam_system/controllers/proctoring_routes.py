@@ -0,0 +1,157 @@
+import math
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.exceptions import RequestEntityTooLarge
+from ..models import ExamSession, ProctoringVideo, db
+from ..utils.proctoring import parse_event, parse_event_batch, get_proctoring_buffer
+from ..utils.video_upload import create_upload, write_chunk, VideoUploadError
+
+proctoring_bp = Blueprint('proctoring', __name__)
+
+@proctoring_bp.route('/sessions/<int:session_id>/events', methods=['POST'])
+@jwt_required()
+def ingest_events(session_id):
+    """
+    Ingest a batch of proctoring events for an exam session.
+    Accepts a JSON array (or {"events": [...]}) or NDJSON (application/x-ndjson).
+    """
+    user_id = int(get_jwt_identity())
+    session = db.session.query(ExamSession.student_id, ExamSession.status) \
+        .filter(ExamSession.id == session_id).first()
+    
+    if not session:
+        return jsonify({'message': 'Session not found'}), 404
+    
+    if session.student_id != user_id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+    
+    if session.status != 'in_progress':
+        return jsonify({'message': 'Exam session is not in progress'}), 409
+    
+    # The event-count limit only applies after parsing, so bound the body itself.
+    # werkzeug refuses a larger Content-Length up front, but truncates a body sent
+    # without one at max_content_length, so one byte more is read to detect it
+    max_body_size = current_app.config['PROCTORING_MAX_BODY_SIZE']
+    request.max_content_length = max_body_size + 1
+    
+    try:
+        body = request.get_data(cache=False)
+        if len(body) > max_body_size:
+            raise RequestEntityTooLarge()
+        events = parse_event_batch(body, request.content_type)
+        
+        max_events = current_app.config['PROCTORING_MAX_BATCH_EVENTS']
+        if len(events) > max_events:
+            return jsonify({'message': f'At most {max_events} events per request'}), 413
+        
+        rows = [parse_event(session_id, event) for event in events]
+    
+    except RequestEntityTooLarge:
+        return jsonify({'message': f'Request body exceeds {max_body_size} bytes'}), 413
+    except ValueError as e:
+        return jsonify({'message': f'Invalid events: {str(e)}'}), 400
+    
+    # Refuse the batch instead of buffering without bound
+    if not get_proctoring_buffer().offer(rows):
+        response = jsonify({'message': 'Proctoring ingestion is busy, retry later'})
+        response.headers['Retry-After'] = str(max(1, math.ceil(current_app.config['PROCTORING_FLUSH_INTERVAL'])))
+        return response, 429
+    
+    return jsonify({'message': 'Events accepted', 'accepted': len(rows)}), 202
+
+def video_status(video):
+    """Upload state returned to clients so they know where to resume."""
+    return {
+        'video_id': video.id,
+        'session_id': video.session_id,
+        'filename': video.filename,
+        'total_size': video.total_size,
+        'offset': video.received_bytes,
+        'status': video.status,
+        'max_chunk_size': current_app.config['VIDEO_CHUNK_MAX_SIZE']
+    }
+
+def get_owned_video(video_id, user_id):
+    """Return (video, error_response) for a video of the current student."""
+    video = ProctoringVideo.query.get(video_id)
+    if not video:
+        return None, (jsonify({'message': 'Upload not found'}), 404)
+    
+    if video.session.student_id != user_id:
+        return None, (jsonify({'message': 'Unauthorized access'}), 403)
+    
+    return video, None
+
+@proctoring_bp.route('/sessions/<int:session_id>/videos', methods=['POST'])
+@jwt_required()
+def start_video_upload(session_id):
+    """Start a resumable chunked upload of a proctoring recording."""
+    user_id = int(get_jwt_identity())
+    session = ExamSession.query.get_or_404(session_id)
+    
+    if session.student_id != user_id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+    
+    try:
+        data = request.get_json()
+        video = create_upload(session, data['filename'], data['total_size'])
+        db.session.commit()
+        
+        return jsonify(video_status(video)), 201
+        
+    except KeyError as e:
+        return jsonify({'message': f'Missing required field: {str(e)}'}), 400
+    except VideoUploadError as e:
+        db.session.rollback()
+        return jsonify({'message': e.message}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error starting upload: {str(e)}'}), 500
+
+@proctoring_bp.route('/videos/<int:video_id>', methods=['GET'])
+@jwt_required()
+def get_video_upload(video_id):
+    """Get the state of an upload, including the offset to resume from."""
+    video, error_response = get_owned_video(video_id, int(get_jwt_identity()))
+    if error_response:
+        return error_response
+    
+    return jsonify(video_status(video)), 200
+
+@proctoring_bp.route('/videos/<int:video_id>/chunks', methods=['PUT'])
+@jwt_required()
+def upload_video_chunk(video_id):
+    """
+    Append one chunk to an upload. The raw request body is the chunk and the
+    `offset` query parameter must equal the upload's current offset. An optional
+    X-Chunk-SHA256 header is verified against the received bytes.
+    """
+    video, error_response = get_owned_video(video_id, int(get_jwt_identity()))
+    if error_response:
+        return error_response
+    
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'message': 'Missing required parameter: offset'}), 400
+    
+    try:
+        # request.stream is read incrementally; the chunk is never held in memory
+        write_chunk(
+            video,
+            offset,
+            request.stream,
+            content_length=request.content_length,
+            expected_sha256=request.headers.get('X-Chunk-SHA256')
+        )
+        
+        video = ProctoringVideo.query.get(video_id)
+        return jsonify(video_status(video)), 200
+        
+    except VideoUploadError as e:
+        db.session.rollback()
+        body = {'message': e.message}
+        body.update(e.extra)
+        return jsonify(body), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error uploading chunk: {str(e)}'}), 500
@@ -13,6 +13,7 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='student')  # 'student' or 'admin'
+    token_version = db.Column(db.Integer, nullable=False, default=1)  # Bumped to revoke issued tokens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -45,10 +46,12 @@ class Question(db.Model):
     __tablename__ = 'questions'
     
     id = db.Column(db.Integer, primary_key=True)
-    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False, index=True)
     question_text = db.Column(db.Text, nullable=False)
     question_type = db.Column(db.String(20), nullable=False)  # 'multiple_choice' or 'essay'
     correct_answer = db.Column(db.Text)  # For multiple choice questions
+    reference_profile = db.Column(db.JSON)  # Compiled key terms of an essay reference answer
+    similarity_thresholds = db.Column(db.JSON)  # Similarity cut-offs for scores 2-5, overrides SIMILARITY_THRESHOLDS
     points = db.Column(db.Integer, nullable=False, default=1)
     
     # For multiple choice questions
@@ -59,7 +62,7 @@ class QuestionOption(db.Model):
     __tablename__ = 'question_options'
     
     id = db.Column(db.Integer, primary_key=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False, index=True)
     option_text = db.Column(db.Text, nullable=False)
     is_correct = db.Column(db.Boolean, default=False)
 
@@ -68,7 +71,7 @@ class ExamSession(db.Model):
     __tablename__ = 'exam_sessions'
     
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
     start_time = db.Column(db.DateTime, default=datetime.utcnow)
     end_time = db.Column(db.DateTime)
@@ -78,6 +81,16 @@ class ExamSession(db.Model):
     # Relationships
     answers = db.relationship('Answer', backref='session', lazy=True)
     proctoring_logs = db.relationship('ProctoringLog', backref='session', lazy=True)
+    grading_jobs = db.relationship('GradingJob', backref='session', lazy=True)
+    videos = db.relationship('ProctoringVideo', backref='session', lazy=True)
+    
+    __table_args__ = (
+        # Results pages: WHERE exam_id = ? [AND status = ?] AND id > ? ORDER BY id
+        db.Index('ix_exam_sessions_exam_id_id', 'exam_id', 'id'),
+        db.Index('ix_exam_sessions_exam_id_status_id', 'exam_id', 'status', 'id'),
+        # Session reaper: WHERE status = 'in_progress' AND start_time >= ?
+        db.Index('ix_exam_sessions_status_start_time', 'status', 'start_time'),
+    )
 
 class Answer(db.Model):
     """Model for storing student answers."""
@@ -85,11 +98,16 @@ class Answer(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False)
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False, index=True)
     answer_text = db.Column(db.Text, nullable=False)
     score = db.Column(db.Float)  # AI-graded score for essays
     feedback = db.Column(db.Text)  # AI-generated feedback
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Also serves lookups of a session's answers by session_id
+        db.UniqueConstraint('session_id', 'question_id', name='uq_answers_session_question'),
+    )
 
 class ProctoringLog(db.Model):
     """Model for storing proctoring session logs."""
@@ -101,3 +119,150 @@ class ProctoringLog(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     details = db.Column(db.JSON)  # Store additional event details as JSON
     severity = db.Column(db.String(20), default='info')  # 'info', 'warning', 'critical'
+    
+    __table_args__ = (
+        db.Index('ix_proctoring_logs_session_id_timestamp', 'session_id', 'timestamp'),
+    )
+
+class ProctoringEventCount(db.Model):
+    """Rollup: number of proctoring events of a session by event type and severity."""
+    __tablename__ = 'proctoring_event_counts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    severity = db.Column(db.String(20), nullable=False)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    first_at = db.Column(db.DateTime)
+    last_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'event_type', 'severity', name='uq_proctoring_event_counts_session_type_severity'),
+    )
+
+class ProctoringMinuteBucket(db.Model):
+    """Rollup: proctoring events of a session per minute, by severity."""
+    __tablename__ = 'proctoring_minute_buckets'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False)
+    minute = db.Column(db.DateTime, nullable=False)  # event time truncated to the minute
+    info_count = db.Column(db.Integer, nullable=False, default=0)
+    warning_count = db.Column(db.Integer, nullable=False, default=0)
+    critical_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'minute', name='uq_proctoring_minute_buckets_session_minute'),
+    )
+
+class ProctoringVideo(db.Model):
+    """Proctoring recording of an exam session, uploaded in resumable chunks."""
+    __tablename__ = 'proctoring_videos'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    extension = db.Column(db.String(10), nullable=False)
+    storage_path = db.Column(db.String(500))
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='uploading')  # 'uploading', 'completed'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    analyzed_at = db.Column(db.DateTime)  # set once face detection events have been recorded
+    duration_seconds = db.Column(db.Float)
+    
+    chunks = db.relationship('VideoChunk', backref='video', lazy=True)
+
+class VideoChunk(db.Model):
+    """Metadata of one received chunk of a proctoring video."""
+    __tablename__ = 'video_chunks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, db.ForeignKey('proctoring_videos.id'), nullable=False)
+    offset = db.Column(db.BigInteger, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_video_chunks_video_id_offset', 'video_id', 'offset'),
+    )
+
+class GradingJob(db.Model):
+    """Queued background grading of the essay answers of an exam session."""
+    __tablename__ = 'grading_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'completed', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_grading_jobs_status_id', 'status', 'id'),
+    )
+
+class RegradeRun(db.Model):
+    """Checkpoint of a bulk re-grade of essay answers (flask regrade)."""
+    __tablename__ = 'regrade_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.String(200), nullable=False)  # BERT_MODEL_PATH the answers are graded with
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'))
+    since = db.Column(db.DateTime)  # session start_time range
+    until = db.Column(db.DateTime)
+    status = db.Column(db.String(20), nullable=False, default='running')  # 'running', 'completed', 'abandoned'
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    last_answer_id = db.Column(db.Integer, nullable=False, default=0)  # every answer up to this id is done
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class GradingCacheEntry(db.Model):
+    """Persisted grading result keyed by a hash of the graded inputs."""
+    __tablename__ = 'grading_cache'
+    
+    key = db.Column(db.String(64), primary_key=True)  # SHA-256 of model, reference and essay
+    score = db.Column(db.Integer, nullable=False)
+    feedback = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PooledQuestion(db.Model):
+    """Pre-generated question waiting in the question pool."""
+    __tablename__ = 'question_pool'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(200), nullable=False)
+    question_type = db.Column(db.String(20), nullable=False)  # 'multiple_choice' or 'essay'
+    payload = db.Column(db.JSON, nullable=False)  # Output of QuestionGenerator.generate_questions
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_question_pool_topic_type', 'topic', 'question_type', 'id'),
+    )
+
+class QuestionPoolTopic(db.Model):
+    """Topic the question pool keeps stocked, with its usage and refill statistics."""
+    __tablename__ = 'question_pool_topics'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(200), nullable=False)
+    question_type = db.Column(db.String(20), nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    misses = db.Column(db.Integer, nullable=False, default=0)
+    generated_total = db.Column(db.Integer, nullable=False, default=0)
+    last_refill_count = db.Column(db.Integer, nullable=False, default=0)
+    last_refill_seconds = db.Column(db.Float)
+    last_refill_at = db.Column(db.DateTime)
+    last_requested_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('topic', 'question_type', name='uq_question_pool_topics_topic_type'),
+    )
@@ -1,41 +1,214 @@
-import torch
-from transformers import BertTokenizer, BertForSequenceClassification
-from transformers import GPT2Tokenizer, GPT2LMHeadModel
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
 from flask import current_app
-import numpy as np
+from . import model_protocol as protocol
+from .grading_cache import get_grading_cache
+from .metrics import timed
+from .reference_profile import get_reference_profile, tokenize
 
-class EssayGrader:
+# torch and transformers are imported inside the model classes so that
+# processes which never grade or generate (auth/admin workers) do not pay
+# for loading the ML stack.
+
+class FeedbackGenerator:
+    """Template and key-term feedback shared by the essay graders; needs `self.cache`."""
+    
+    # Part of every cached feedback's key; bump whenever the feedback text changes
+    FEEDBACK_VERSION = 2
+    
+    def feedback_variant(self, profile):
+        """Cache key component naming the feedback version and the exact reference profile used."""
+        digest = hashlib.sha256(json.dumps(profile, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return f"{self.FEEDBACK_VERSION}:{digest}"
+    
+    def generate_feedback(self, score, essay_text, reference_answer, profile=None):
+        """
+        Generate detailed feedback based on the essay score and content.
+        `profile` is the question's compiled reference profile; the reference is
+        compiled (and cached) here only when the question has none stored.
+        """
+        return self.generate_feedbacks([(score, essay_text, reference_answer, profile)])[0]
+    
+    def generate_feedbacks(self, items):
+        """
+        Feedback for a batch of (score, essay_text, reference_answer, profile)
+        items, looking up and storing cached feedback in one query each.
+        """
+        try:
+            profiles = [get_reference_profile(reference_answer, profile)
+                        for _, _, reference_answer, profile in items]
+            keys = [(reference_answer, essay_text, score, self.feedback_variant(profile))
+                    for (score, essay_text, reference_answer, _), profile in zip(items, profiles)]
+            
+            results = self.cache.get_feedbacks(keys) if self.cache else [None] * len(items)
+            new_entries = []
+            for i, (score, essay_text, _, _) in enumerate(items):
+                if results[i] is None:
+                    results[i] = self._compose_feedback(score, essay_text, profiles[i])
+                    new_entries.append(keys[i] + (results[i],))
+            
+            if self.cache:
+                self.cache.set_feedbacks(new_entries)
+            
+            return results
+            
+        except Exception as e:
+            raise Exception(f"Error generating feedback: {str(e)}")
+    
+    def _compose_feedback(self, score, essay_text, profile):
+        feedback_templates = {
+            5: "Excellent work! Your essay demonstrates comprehensive understanding and excellent articulation.",
+            4: "Good work! Your essay shows strong understanding with some room for improvement.",
+            3: "Satisfactory work. Your essay demonstrates basic understanding but needs more detail.",
+            2: "Below average. Your essay needs significant improvement in content and structure.",
+            1: "Needs improvement. Please review the topic and try again."
+        }
+        
+        base_feedback = feedback_templates.get(score, "Invalid score")
+        
+        # Add specific feedback points
+        specific_points = []
+        
+        # Length comparison
+        if len(essay_text.split()) < profile['word_count'] * 0.5:
+            specific_points.append("Consider expanding your response with more details.")
+        
+        # Most important reference terms the essay does not use
+        essay_words = set(tokenize(essay_text))
+        missing_key_terms = [term for term, _ in profile['key_terms'] if term not in essay_words]
+        if missing_key_terms:
+            specific_points.append("Consider incorporating these key concepts: " + 
+                                ", ".join(missing_key_terms[:3]))
+        
+        # Combine feedback
+        detailed_feedback = base_feedback
+        if specific_points:
+            detailed_feedback += "\n\nSpecific suggestions:\n- " + "\n- ".join(specific_points)
+        
+        return detailed_feedback
+
+class PairEncoder:
+    """
+    Encodes (essay, reference) pairs as BERT sentence pairs:
+    [CLS] reference [SEP] essay [SEP], with token type 0 for the reference
+    and 1 for the essay.
+    Token ids of each reference are cached, so a reference shared by every
+    student answering a question is tokenized once. When a pair is longer
+    than `max_length`, the reference is truncated first (down to
+    `min_reference_tokens`) so that the essay keeps as much text as possible.
+    """
+    
+    def __init__(self, tokenizer, max_length=512, min_reference_tokens=128, cache_size=1000):
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.min_reference_tokens = min_reference_tokens
+        self.cache_size = cache_size
+        self._references = OrderedDict()
+        self._lock = threading.Lock()
+        # Built here rather than with build_inputs_with_special_tokens, which
+        # newer transformers releases no longer provide on fast tokenizers
+        self.cls_token_id = tokenizer.cls_token_id
+        self.sep_token_id = tokenizer.sep_token_id
+        self.special_tokens = 3  # [CLS] and two [SEP]
+    
+    def reference_ids(self, reference_answers):
+        """Token ids (without special tokens) of each reference, tokenizing only uncached ones."""
+        with self._lock:
+            known = {r: self._references[r] for r in set(reference_answers) if r in self._references}
+            for reference_answer in known:
+                self._references.move_to_end(reference_answer)
+        
+        missing = [r for r in dict.fromkeys(reference_answers) if r not in known]
+        if missing:
+            encoded = self.tokenizer(missing, add_special_tokens=False)['input_ids']
+            known.update(zip(missing, encoded))
+            with self._lock:
+                for reference_answer in missing:
+                    self._references[reference_answer] = known[reference_answer]
+                while len(self._references) > self.cache_size:
+                    self._references.popitem(last=False)
+        
+        return [known[r] for r in reference_answers]
+    
+    def truncate(self, reference_ids, essay_ids):
+        """Lengths to keep of the reference and essay so the pair fits in max_length."""
+        budget = self.max_length - self.special_tokens
+        if len(reference_ids) + len(essay_ids) <= budget:
+            return len(reference_ids), len(essay_ids)
+        
+        reference_length = min(len(reference_ids), max(self.min_reference_tokens, budget - len(essay_ids)))
+        return reference_length, min(len(essay_ids), budget - reference_length)
+    
+    def encode(self, pairs):
+        """Encode (essay_text, reference_answer) pairs into unpadded lists of input_ids, token_type_ids and attention_mask."""
+        references = self.reference_ids([reference_answer for _, reference_answer in pairs])
+        essays = self.tokenizer([essay_text for essay_text, _ in pairs], add_special_tokens=False)['input_ids']
+        
+        encoded = {'input_ids': [], 'token_type_ids': [], 'attention_mask': []}
+        for reference_ids, essay_ids in zip(references, essays):
+            reference_length, essay_length = self.truncate(reference_ids, essay_ids)
+            first, second = reference_ids[:reference_length], essay_ids[:essay_length]
+            
+            input_ids = [self.cls_token_id] + first + [self.sep_token_id] + second + [self.sep_token_id]
+            encoded['input_ids'].append(input_ids)
+            encoded['token_type_ids'].append([0] * (len(first) + 2) + [1] * (len(second) + 1))
+            encoded['attention_mask'].append([1] * len(input_ids))
+        return encoded
+
+class EssayGrader(FeedbackGenerator):
     """BERT-based model for grading essays."""
     
-    def __init__(self):
-        """Initialize the BERT model and tokenizer."""
+    def __init__(self, backend=None):
+        """
+        Initialize the BERT model and tokenizer.
+        `backend` overrides Config.GRADING_BACKEND ('torch', 'torch-int8' or 'onnx').
+        """
         try:
+            import torch
+            from transformers import BertTokenizerFast, BertForSequenceClassification
+            from .inference_backends import create_backend
+            
             self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            self.tokenizer = BertTokenizer.from_pretrained(current_app.config['BERT_MODEL_PATH'])
-            self.model = BertForSequenceClassification.from_pretrained(
+            self.tokenizer = BertTokenizerFast.from_pretrained(current_app.config['BERT_MODEL_PATH'])
+            self.encoder = PairEncoder(
+                self.tokenizer,
+                max_length=512,
+                min_reference_tokens=current_app.config['GRADING_MIN_REFERENCE_TOKENS']
+            )
+            model = BertForSequenceClassification.from_pretrained(
                 current_app.config['BERT_MODEL_PATH'],
                 num_labels=5  # 5-point grading scale
             ).to(self.device)
-            self.model.eval()
+            model.eval()
+            
+            # Only the backend keeps a reference, so the int8 and ONNX backends
+            # leave no fp32 copy of the weights resident
+            self.backend = create_backend(
+                backend or current_app.config['GRADING_BACKEND'],
+                model,
+                self.tokenizer,
+                self.device
+            )
+            
+            # Model identity (and input encoding) is part of every cache key so a new model never reuses old grades
+            self.model_id = f"{current_app.config['BERT_MODEL_PATH']}:{self.backend.name}:pair"
+            self.cache = get_grading_cache() if current_app.config['GRADING_CACHE_ENABLED'] else None
+            # Set by get_essay_grader when concurrent calls share batched forward passes
+            self.scheduler = None
         except Exception as e:
             raise Exception(f"Error initializing BERT model: {str(e)}")
 
-    def preprocess_text(self, text):
-        """Preprocess essay text for BERT model."""
+    def warm_up(self):
+        """Run one dummy forward pass so the first real request skips lazy initialization."""
         try:
-            # Tokenize and encode the text
-            encoded = self.tokenizer.encode_plus(
-                text,
-                add_special_tokens=True,
-                max_length=512,
-                padding='max_length',
-                truncation=True,
-                return_attention_mask=True,
-                return_tensors='pt'
-            )
-            return encoded
+            self.predict_logits([("warm-up", "warm-up")])
         except Exception as e:
-            raise Exception(f"Error preprocessing text: {str(e)}")
+            raise Exception(f"Error warming up BERT model: {str(e)}")
 
     def grade_essay(self, essay_text, reference_answer):
         """
@@ -43,82 +216,137 @@ class EssayGrader:
         Returns tuple of (score, feedback)
         """
         try:
-            # Combine essay and reference for comparison
-            combined_text = f"Reference: {reference_answer} Essay: {essay_text}"
+            return self.grade_essays([(essay_text, reference_answer)])[0]
             
-            # Preprocess
-            encoded = self.preprocess_text(combined_text)
+        except Exception as e:
+            raise Exception(f"Error grading essay: {str(e)}")
+
+    def grade_essays(self, pairs, batch_size=8, profiles=None):
+        """
+        Grade several essays with batched BERT inference.
+        `pairs` is a list of (essay_text, reference_answer) tuples and `profiles`
+        optionally the stored reference profiles of their questions.
+        Returns a list of (score, feedback) tuples in the same order as `pairs`.
+        """
+        try:
+            results = [None] * len(pairs)
             
-            # Move to device
-            input_ids = encoded['input_ids'].to(self.device)
-            attention_mask = encoded['attention_mask'].to(self.device)
+            # Serve repeated (reference, essay) pairs from the grading cache. The
+            # feedback variant is part of the key because grades store feedback too
+            if self.cache:
+                keys = [
+                    (reference_answer, essay_text,
+                     self.feedback_variant(get_reference_profile(reference_answer, profiles[i] if profiles else None)))
+                    for i, (essay_text, reference_answer) in enumerate(pairs)
+                ]
+                results = self.cache.get_grades(self.model_id, keys)
+            uncached = [i for i, result in enumerate(results) if result is None]
             
-            # Get prediction
-            with torch.no_grad():
-                outputs = self.model(input_ids, attention_mask=attention_mask)
-                predicted_score = torch.argmax(outputs.logits, dim=1).item() + 1  # Scale from 0-4 to 1-5
+            logits = self.infer_logits([pairs[i] for i in uncached], batch_size=batch_size)
+            scores = (logits.argmax(axis=1) + 1).tolist()  # Scale from 0-4 to 1-5
             
             # Generate feedback based on score
-            feedback = self.generate_feedback(predicted_score, essay_text, reference_answer)
+            with timed('essay_grader', 'feedback'):
+                feedbacks = self.generate_feedbacks([
+                    (score, pairs[i][0], pairs[i][1], profiles[i] if profiles else None)
+                    for i, score in zip(uncached, scores)
+                ])
+            for i, score, feedback in zip(uncached, scores, feedbacks):
+                results[i] = (score, feedback)
             
-            return predicted_score, feedback
+            if self.cache:
+                self.cache.set_grades(self.model_id, [
+                    keys[i] + results[i] for i in uncached
+                ])
+            
+            return results
             
         except Exception as e:
-            raise Exception(f"Error grading essay: {str(e)}")
+            raise Exception(f"Error grading essays: {str(e)}")
+
+    def infer_logits(self, pairs, batch_size=8):
+        """
+        predict_logits through the inference scheduler when there is one, so
+        pairs from concurrent callers are graded in shared batches.
+        """
+        if self.scheduler is None or not pairs:
+            return self.predict_logits(pairs, batch_size=batch_size)
+        
+        import numpy as np
+        return np.stack(self.scheduler.map(pairs))
 
-    def generate_feedback(self, score, essay_text, reference_answer):
-        """Generate detailed feedback based on the essay score and content."""
+    def predict_logits(self, pairs, batch_size=8):
+        """
+        Run the grading model over (essay_text, reference_answer) pairs.
+        Returns a NumPy array of shape (len(pairs), 5) in the order of `pairs`.
+        """
         try:
-            feedback_templates = {
-                5: "Excellent work! Your essay demonstrates comprehensive understanding and excellent articulation.",
-                4: "Good work! Your essay shows strong understanding with some room for improvement.",
-                3: "Satisfactory work. Your essay demonstrates basic understanding but needs more detail.",
-                2: "Below average. Your essay needs significant improvement in content and structure.",
-                1: "Needs improvement. Please review the topic and try again."
-            }
-            
-            base_feedback = feedback_templates.get(score, "Invalid score")
+            import numpy as np
             
-            # Add specific feedback points
-            specific_points = []
+            if not pairs:
+                return np.zeros((0, 5), dtype=np.float32)
             
-            # Length comparison
-            if len(essay_text.split()) < len(reference_answer.split()) * 0.5:
-                specific_points.append("Consider expanding your response with more details.")
+            # Encode reference/essay sentence pairs once without padding;
+            # each batch is padded to its longest item
+            with timed('essay_grader', 'preprocess'):
+                encoded = self.encoder.encode(pairs)
             
-            # Key terms check (simplified)
-            ref_words = set(reference_answer.lower().split())
-            essay_words = set(essay_text.lower().split())
-            missing_key_terms = ref_words - essay_words
-            if missing_key_terms:
-                specific_points.append("Consider incorporating these key concepts: " + 
-                                    ", ".join(list(missing_key_terms)[:3]))
+            # Sort by length so similar-sized inputs share a batch
+            order = sorted(range(len(pairs)), key=lambda i: len(encoded['input_ids'][i]))
             
-            # Combine feedback
-            detailed_feedback = base_feedback
-            if specific_points:
-                detailed_feedback += "\n\nSpecific suggestions:\n- " + "\n- ".join(specific_points)
+            logits = np.zeros((len(pairs), 5), dtype=np.float32)
+            for start in range(0, len(order), batch_size):
+                batch_indices = order[start:start + batch_size]
+                with timed('essay_grader', 'preprocess'):
+                    batch = self.tokenizer.pad(
+                        {key: [values[i] for i in batch_indices] for key, values in encoded.items()},
+                        padding='longest',
+                        return_tensors='pt'
+                    )
+                with timed('essay_grader', 'forward'):
+                    logits[batch_indices] = self.backend.logits(dict(batch))
             
-            return detailed_feedback
+            return logits
             
         except Exception as e:
-            raise Exception(f"Error generating feedback: {str(e)}")
+            raise Exception(f"Error running grading model: {str(e)}")
 
 class QuestionGenerator:
     """GPT-2 based model for generating exam questions."""
     
+    # Batched tries at generating options for a question that came without them
+    OPTION_ATTEMPTS = 2
+    
     def __init__(self):
         """Initialize the GPT-2 model and tokenizer."""
         try:
+            import torch
+            from transformers import GPT2TokenizerFast, GPT2LMHeadModel
+            
             self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            self.tokenizer = GPT2Tokenizer.from_pretrained(current_app.config['GPT2_MODEL_PATH'])
+            self.tokenizer = GPT2TokenizerFast.from_pretrained(current_app.config['GPT2_MODEL_PATH'])
             self.model = GPT2LMHeadModel.from_pretrained(
                 current_app.config['GPT2_MODEL_PATH']
             ).to(self.device)
             self.model.eval()
+            
+            # GPT-2 has no pad token; batched prompts are left-padded with EOS
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.padding_side = 'left'
         except Exception as e:
             raise Exception(f"Error initializing GPT-2 model: {str(e)}")
 
+    def warm_up(self):
+        """Run one dummy forward pass so the first real request skips lazy initialization."""
+        try:
+            import torch
+            
+            inputs = self.tokenizer.encode("Question:", return_tensors='pt').to(self.device)
+            with torch.no_grad():
+                self.model(inputs)
+        except Exception as e:
+            raise Exception(f"Error warming up GPT-2 model: {str(e)}")
+
     def generate_question(self, topic, question_type='multiple_choice'):
         """
         Generate a question based on the given topic.
@@ -158,6 +386,157 @@ class QuestionGenerator:
         except Exception as e:
             raise Exception(f"Error generating question: {str(e)}")
 
+    def generate_questions(self, topics, count, question_type='multiple_choice', batch_size=16):
+        """
+        Generate `count` questions spread round-robin over `topics`.
+        Each topic's share is split into requests of at most `batch_size`
+        sequences, and requests for the same number of sequences share
+        generate calls, so no call samples more than `batch_size` sequences.
+        Options or reference answers are then generated in batches as well.
+        Multiple choice questions left with fewer than two options are dropped,
+        so fewer than `count` questions may be returned.
+        Returns a list of dicts in the same format as generate_question.
+        """
+        try:
+            if not topics or count <= 0:
+                return []
+            
+            # Number of questions wanted for each topic
+            per_topic = {}
+            for i in range(count):
+                topic = topics[i % len(topics)]
+                per_topic[topic] = per_topic.get(topic, 0) + 1
+            
+            if question_type == 'multiple_choice':
+                prompt_template = (
+                    "Generate a multiple choice question about {topic} with four options:\nQuestion:"
+                )
+            else:
+                prompt_template = "Generate an essay question about {topic}:\nQuestion:"
+            
+            requests = []  # (prompt, number of sequences)
+            for topic, wanted in per_topic.items():
+                prompt = prompt_template.format(topic=topic)
+                for start in range(0, wanted, batch_size):
+                    requests.append((prompt, min(batch_size, wanted - start)))
+            
+            sequences = [None] * len(requests)
+            for num_sequences in sorted({n for _, n in requests}, reverse=True):
+                indices = [i for i, (_, n) in enumerate(requests) if n == num_sequences]
+                texts = self._generate_batch(
+                    [requests[i][0] for i in indices],
+                    max_new_tokens=120,
+                    num_return_sequences=num_sequences,
+                    batch_size=batch_size
+                )
+                for i, sequence_texts in zip(indices, texts):
+                    sequences[i] = sequence_texts
+            generated = [text for texts in sequences for text in texts]
+            
+            if question_type == 'multiple_choice':
+                return self._finish_multiple_choice_batch(generated, batch_size)
+            return self._finish_essay_batch(generated, batch_size)
+            
+        except Exception as e:
+            raise Exception(f"Error generating questions: {str(e)}")
+
+    def _generate_batch(self, prompts, max_new_tokens, num_return_sequences=1, batch_size=16):
+        """
+        Sample continuations for several prompts with left-padded batches.
+        Each call samples at most `batch_size` sequences, or
+        `num_return_sequences` if that is larger.
+        Returns one list of `num_return_sequences` decoded continuations per prompt.
+        """
+        import torch
+        
+        prompts_per_call = max(1, batch_size // num_return_sequences)
+        results = []
+        for start in range(0, len(prompts), prompts_per_call):
+            chunk = prompts[start:start + prompts_per_call]
+            with timed('question_generator', 'preprocess'):
+                encoded = self.tokenizer(chunk, return_tensors='pt', padding=True).to(self.device)
+            
+            with timed('question_generator', 'forward'), torch.no_grad():
+                outputs = self.model.generate(
+                    encoded['input_ids'],
+                    attention_mask=encoded['attention_mask'],
+                    max_new_tokens=max_new_tokens,
+                    num_return_sequences=num_return_sequences,
+                    do_sample=True,
+                    no_repeat_ngram_size=2,
+                    temperature=0.7,
+                    top_k=50,
+                    top_p=0.95,
+                    pad_token_id=self.tokenizer.eos_token_id
+                )
+            
+            # Drop the (padded) prompt and keep only the generated continuation
+            with timed('question_generator', 'decode'):
+                texts = self.tokenizer.batch_decode(
+                    outputs[:, encoded['input_ids'].shape[1]:],
+                    skip_special_tokens=True
+                )
+            for i in range(len(chunk)):
+                results.append(texts[i * num_return_sequences:(i + 1) * num_return_sequences])
+        
+        return results
+
+    def _finish_multiple_choice_batch(self, generated, batch_size):
+        """
+        Split generated questions from their options, generating options in
+        batches where missing. Questions without text, or still without two
+        options after OPTION_ATTEMPTS tries, are dropped.
+        """
+        questions = []
+        for text in generated:
+            lines = [line.strip() for line in text.split('\n') if line.strip()]
+            question = lines[0].replace('Question:', '').strip() if lines else ''
+            if question:
+                questions.append((question, self._parse_options(lines[1:])))
+        
+        for _ in range(self.OPTION_ATTEMPTS):
+            missing = [i for i, (_, options) in enumerate(questions) if len(options) < 2]
+            if not missing:
+                break
+            option_texts = self._generate_batch(
+                [f"Generate 4 options for the question: {questions[i][0]}\nOptions:" for i in missing],
+                max_new_tokens=80,
+                batch_size=batch_size
+            )
+            for i, texts in zip(missing, option_texts):
+                questions[i] = (questions[i][0], self._parse_options(texts[0].split('\n')))
+        
+        return [{
+            'question_text': question,
+            'question_type': 'multiple_choice',
+            'options': options,
+            'correct_answer': options[0]  # First option as correct answer
+        } for question, options in questions if len(options) >= 2]
+
+    def _finish_essay_batch(self, generated, batch_size):
+        """Generate the reference answers of a set of essay questions in one batch."""
+        questions = [text.split('\n\n')[0].replace('Question:', '').strip() for text in generated]
+        references = self._generate_batch(
+            [f"Write a model answer for the question: {question}\nAnswer:" for question in questions],
+            max_new_tokens=250,
+            batch_size=batch_size
+        )
+        return [{
+            'question_text': question,
+            'question_type': 'essay',
+            'reference_answer': texts[0].strip()
+        } for question, texts in zip(questions, references)]
+
+    @staticmethod
+    def _parse_options(lines):
+        """Strip list markers such as 'A)' or '1.' from generated option lines."""
+        options = []
+        for line in lines:
+            option = re.sub(r'^\s*(?:[A-Da-d]|[1-4])[\).:-]\s*', '', line).strip()
+            if option:
+                options.append(option)
+        return options[:4]
+
     def _process_multiple_choice(self, generated_text, topic):
         """Process generated text into a multiple choice question format."""
         try:
@@ -228,20 +607,189 @@ class QuestionGenerator:
         except Exception as e:
             raise Exception(f"Error processing essay question: {str(e)}")
 
+class ModelServerClient:
+    """
+    Connection to the node's model server (utils/model_server.py) over a Unix
+    domain socket. Each thread keeps its own connection so calls from
+    concurrent requests are served in parallel.
+    """
+    
+    def __init__(self, socket_path, timeout=300):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+    
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+    
+    def call(self, op, payload=b''):
+        """Send one request and return the response payload."""
+        # A kept-alive connection may have been closed by a server restart; retry once on a new one
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                protocol.send_frame(sock, op, payload)
+                frame = protocol.recv_frame(sock)
+                if frame is None:
+                    raise ConnectionError('Model server closed the connection')
+                break
+            except socket.timeout:
+                self._close()
+                raise
+            except (OSError, protocol.ProtocolError):
+                self._close()
+                if attempt:
+                    raise
+        
+        status, response = frame
+        if status == protocol.OP_ERROR:
+            raise Exception(f"Model server error: {response.decode('utf-8')}")
+        return response
+    
+    def warm_up(self):
+        """Check that the model server answers; the models are already loaded there."""
+        self.call(protocol.OP_PING)
+
+class RemoteEssayGrader(ModelServerClient):
+    """EssayGrader interface served by the model server."""
+    
+    def grade_essay(self, essay_text, reference_answer):
+        try:
+            return self.grade_essays([(essay_text, reference_answer)])[0]
+        except Exception as e:
+            raise Exception(f"Error grading essay: {str(e)}")
+    
+    def grade_essays(self, pairs, batch_size=8, profiles=None):
+        try:
+            if not pairs:
+                return []
+            response = self.call(protocol.OP_GRADE, protocol.encode_grade_request(pairs, batch_size, profiles))
+            return protocol.decode_grade_response(response)
+        except Exception as e:
+            raise Exception(f"Error grading essays: {str(e)}")
+
+class RemoteQuestionGenerator(ModelServerClient):
+    """QuestionGenerator interface served by the model server."""
+    
+    def generate_question(self, topic, question_type='multiple_choice'):
+        try:
+            generated = self.generate_questions([topic], 1, question_type)
+            if not generated:
+                raise ValueError('no usable question was generated')
+            return generated[0]
+        except Exception as e:
+            raise Exception(f"Error generating question: {str(e)}")
+    
+    def generate_questions(self, topics, count, question_type='multiple_choice', batch_size=16):
+        try:
+            if not topics or count <= 0:
+                return []
+            response = self.call(
+                protocol.OP_GENERATE,
+                protocol.encode_generate_request(topics, count, question_type, batch_size)
+            )
+            return protocol.decode_questions(response)
+        except Exception as e:
+            raise Exception(f"Error generating questions: {str(e)}")
+
 # Singleton instances
 essay_grader = None
 question_generator = None
+_models_lock = threading.Lock()
+
+def _create_essay_grader(config):
+    """Local EssayGrader, behind an InferenceScheduler when INFERENCE_BATCHING is set."""
+    grader = EssayGrader()
+    if config['INFERENCE_BATCHING']:
+        from .inference_scheduler import InferenceScheduler
+        
+        max_batch_size = config['INFERENCE_MAX_BATCH_SIZE']
+        grader.scheduler = InferenceScheduler(
+            lambda pairs: grader.predict_logits(pairs, batch_size=max_batch_size),
+            max_batch_size=max_batch_size,
+            max_wait=config['INFERENCE_MAX_WAIT_MS'] / 1000,
+            torch_threads=config['INFERENCE_TORCH_THREADS'],
+            timeout=config['INFERENCE_TIMEOUT'],
+            name='essay_grader'
+        )
+        grader.scheduler.start()
+    return grader
 
 def get_essay_grader():
-    """Get or create the EssayGrader instance."""
+    """
+    Get or create the EssayGrader instance.
+    With MODEL_SERVER_SOCKET set this is a client of the node's model server.
+    """
     global essay_grader
     if essay_grader is None:
-        essay_grader = EssayGrader()
+        with _models_lock:
+            # Another thread may have loaded the model while we waited
+            if essay_grader is None:
+                config = current_app.config
+                if config['MODEL_SERVER_SOCKET']:
+                    essay_grader = RemoteEssayGrader(config['MODEL_SERVER_SOCKET'], config['MODEL_SERVER_TIMEOUT'])
+                else:
+                    essay_grader = _create_essay_grader(config)
     return essay_grader
 
 def get_question_generator():
-    """Get or create the QuestionGenerator instance."""
+    """
+    Get or create the QuestionGenerator instance.
+    With MODEL_SERVER_SOCKET set this is a client of the node's model server.
+    """
     global question_generator
     if question_generator is None:
-        question_generator = QuestionGenerator()
+        with _models_lock:
+            if question_generator is None:
+                config = current_app.config
+                if config['MODEL_SERVER_SOCKET']:
+                    question_generator = RemoteQuestionGenerator(
+                        config['MODEL_SERVER_SOCKET'], config['MODEL_SERVER_TIMEOUT']
+                    )
+                else:
+                    question_generator = QuestionGenerator()
     return question_generator
+
+def warm_up_models(app):
+    """
+    Load and warm up both models inside an inference worker.
+    Called from create_app when PRELOAD_MODELS is enabled; logs timings of each step.
+    """
+    if app.config['MODEL_SERVER_SOCKET']:
+        app.logger.info(f"Models are served by {app.config['MODEL_SERVER_SOCKET']}, nothing to preload")
+        return
+    
+    with app.app_context():
+        start = time.perf_counter()
+        import torch
+        import transformers
+        app.logger.info(f"Imported torch/transformers in {time.perf_counter() - start:.2f}s")
+        
+        for name, factory in (('EssayGrader', get_essay_grader),
+                              ('QuestionGenerator', get_question_generator)):
+            step = time.perf_counter()
+            model = factory()
+            loaded = time.perf_counter()
+            model.warm_up()
+            app.logger.info(
+                f"{name} loaded in {loaded - step:.2f}s, "
+                f"warmed up in {time.perf_counter() - loaded:.2f}s"
+            )
+        
+        app.logger.info(f"Model preload finished in {time.perf_counter() - start:.2f}s")
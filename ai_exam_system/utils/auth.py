@@ -1,16 +1,81 @@
+import threading
+import time
 from functools import wraps
 from flask import request, jsonify, current_app
 import jwt
 from datetime import datetime, timedelta
 from ..models import User, db
+from .metrics import timed
 
-def generate_token(user_id):
-    """Generate JWT token for user authentication."""
+class Principal:
+    """Authenticated user as seen by the route decorators."""
+    
+    def __init__(self, id, role, token_version):
+        self.id = id
+        self.role = role
+        self.token_version = token_version
+
+class PrincipalCache:
+    """Small TTL cache of users' token versions so most requests authorize without a database query."""
+    
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, user_id):
+        """Return the cached token version, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            token_version, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return token_version
+    
+    def set(self, user_id, token_version):
+        """Cache a user's token version for the TTL."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, then the oldest ones
+                for expired_id in [k for k, (_, exp) in self._entries.items() if exp < now]:
+                    del self._entries[expired_id]
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[user_id] = (token_version, now + self.ttl)
+    
+    def invalidate(self, user_id):
+        """Forget a cached principal."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+# Singleton instance
+principal_cache = None
+
+def get_principal_cache():
+    """Get or create the PrincipalCache instance."""
+    global principal_cache
+    if principal_cache is None:
+        principal_cache = PrincipalCache(ttl=current_app.config['PRINCIPAL_CACHE_TTL'])
+    return principal_cache
+
+def invalidate_principal(user_id):
+    """Forget a cached principal after its role or token version changes."""
+    get_principal_cache().invalidate(user_id)
+
+def generate_token(user):
+    """Generate JWT token for user authentication, embedding the role and token version."""
     try:
         payload = {
             'exp': datetime.utcnow() + timedelta(hours=1),
             'iat': datetime.utcnow(),
-            'sub': user_id
+            'sub': str(user.id),  # registered claim, must be a string
+            'role': user.role,
+            'ver': user.token_version
         }
         return jwt.encode(
             payload,
@@ -20,48 +85,92 @@ def generate_token(user_id):
     except Exception as e:
         return str(e)
 
-def decode_token(token):
-    """Decode JWT token and return user_id."""
+def decode_token_claims(token):
+    """Decode JWT token and return its claims, or an error message string."""
     try:
-        payload = jwt.decode(
+        return jwt.decode(
             token,
             current_app.config.get('JWT_SECRET_KEY'),
             algorithms=['HS256']
         )
-        return payload['sub']
     except jwt.ExpiredSignatureError:
         return 'Token expired. Please log in again.'
     except jwt.InvalidTokenError:
         return 'Invalid token. Please log in again.'
 
+def decode_token(token):
+    """Decode JWT token and return user_id."""
+    claims = decode_token_claims(token)
+    if isinstance(claims, str):
+        return claims
+    return int(claims['sub'])
+
+def load_principal(claims):
+    """
+    Resolve the principal for decoded token claims.
+    The role comes from the token itself. It is trusted while the token's
+    version matches the user's current token_version, which every role
+    change bumps; the version is served from the principal cache when
+    possible and otherwise read from the database.
+    Returns (principal, error_message).
+    """
+    user_id = int(claims['sub'])
+    cache = get_principal_cache()
+    
+    token_version = cache.get(user_id)
+    if token_version is None:
+        token_version = db.session.query(User.token_version).filter(User.id == user_id).scalar()
+        if token_version is None:
+            return None, 'User not found'
+        cache.set(user_id, token_version)
+    
+    # Tokens issued before a role change carry an old version
+    if claims.get('ver') != token_version:
+        return None, 'Token has been revoked. Please log in again.'
+    
+    return Principal(user_id, claims.get('role'), token_version), None
+
+def authenticate_request():
+    """
+    Authenticate the bearer token of the current request.
+    Returns (principal, error_response).
+    """
+    token = None
+    
+    # Check if token is in headers
+    if 'Authorization' in request.headers:
+        auth_header = request.headers['Authorization']
+        try:
+            token = auth_header.split(" ")[1]
+        except IndexError:
+            return None, (jsonify({'message': 'Token is missing'}), 401)
+    
+    if not token:
+        return None, (jsonify({'message': 'Token is missing'}), 401)
+    
+    try:
+        with timed('auth', 'decode_token'):
+            claims = decode_token_claims(token)
+        if isinstance(claims, str):
+            return None, (jsonify({'message': claims}), 401)
+        
+        with timed('auth', 'load_principal'):
+            principal, error = load_principal(claims)
+        if error:
+            return None, (jsonify({'message': error}), 401)
+        
+    except Exception as e:
+        return None, (jsonify({'message': str(e)}), 401)
+    
+    return principal, None
+
 def token_required(f):
     """Decorator to protect routes that require authentication."""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # Check if token is in headers
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                return jsonify({'message': 'Token is missing'}), 401
-        
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        
-        try:
-            user_id = decode_token(token)
-            if isinstance(user_id, str):
-                return jsonify({'message': user_id}), 401
-            
-            current_user = User.query.get(user_id)
-            if not current_user:
-                return jsonify({'message': 'User not found'}), 401
-            
-        except Exception as e:
-            return jsonify({'message': str(e)}), 401
+        current_user, error_response = authenticate_request()
+        if error_response:
+            return error_response
         
         return f(current_user, *args, **kwargs)
     
@@ -71,32 +180,12 @@ def admin_required(f):
     """Decorator to protect routes that require admin access."""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                return jsonify({'message': 'Token is missing'}), 401
+        current_user, error_response = authenticate_request()
+        if error_response:
+            return error_response
         
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        
-        try:
-            user_id = decode_token(token)
-            if isinstance(user_id, str):
-                return jsonify({'message': user_id}), 401
-            
-            current_user = User.query.get(user_id)
-            if not current_user:
-                return jsonify({'message': 'User not found'}), 401
-            
-            if current_user.role != 'admin':
-                return jsonify({'message': 'Admin privileges required'}), 403
-            
-        except Exception as e:
-            return jsonify({'message': str(e)}), 401
+        if current_user.role != 'admin':
+            return jsonify({'message': 'Admin privileges required'}), 403
         
         return f(current_user, *args, **kwargs)
     
@@ -0,0 +1,238 @@
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import DataError, IntegrityError
+from ..models import Answer, ExamSession, Question, db
+from .db_utils import upsert
+from .grading_queue import enqueue_grading, notify_workers
+
+def save_answers(rows):
+    """
+    Upsert answer rows keyed by (session_id, question_id) in one statement.
+    An answer is only replaced by a save at least as recent as itself, so a
+    late autosave cannot overwrite the text sent with the submission.
+    """
+    upsert(
+        Answer.__table__,
+        rows,
+        index_elements=['session_id', 'question_id'],
+        update_columns=['answer_text', 'submitted_at'],
+        # A changed answer has to be graded again
+        update_values=lambda excluded: {'score': None, 'feedback': None},
+        update_where=lambda excluded: db.or_(
+            Answer.__table__.c.submitted_at.is_(None),
+            Answer.__table__.c.submitted_at <= excluded.submitted_at
+        )
+    )
+
+def writable_answers(saves):
+    """
+    The (session_id, question_id) keys of `saves` (key -> saved_at) that may
+    still be written, mapped to their session's status.
+    The question must belong to the session's exam, and the session must be
+    in progress or have ended no earlier than SESSION_EXPIRY_GRACE before the
+    save: another process may have accepted it just before the submit or
+    expiry and buffered it since.
+    """
+    if not saves:
+        return {}
+    
+    grace = timedelta(seconds=current_app.config['SESSION_EXPIRY_GRACE'])
+    rows = db.session.query(ExamSession.id, Question.id, ExamSession.status, ExamSession.end_time) \
+        .join(Question, Question.exam_id == ExamSession.exam_id) \
+        .filter(
+            ExamSession.id.in_({session_id for session_id, _ in saves}),
+            Question.id.in_({question_id for _, question_id in saves})
+        ).all()
+    
+    writable = {}
+    for session_id, question_id, status, end_time in rows:
+        saved_at = saves.get((session_id, question_id))
+        if saved_at is None:
+            continue
+        if status == 'in_progress' or (end_time is not None and saved_at <= end_time + grace):
+            writable[(session_id, question_id)] = status
+    return writable
+
+class AutosaveBuffer:
+    """
+    Coalesces per-question autosaves in memory.
+    Repeated saves of the same (session, question) overwrite each other and
+    a background thread writes what is left in one bulk upsert every
+    AUTOSAVE_FLUSH_INTERVAL seconds.
+    """
+    
+    def __init__(self, app, flush_interval, max_pending):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def save(self, session_id, question_id, answer_text):
+        """Buffer the latest text of an answer."""
+        with self._lock:
+            self._pending[(session_id, question_id)] = (answer_text, datetime.utcnow())
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wakeup.set()
+    
+    def flush(self, session_id=None, session_ids=None):
+        """
+        Write buffered answers (only those of `session_id` or of the set
+        `session_ids` if given) and commit.
+        Must run inside an application context. Returns the number of rows written.
+        """
+        if session_id is not None:
+            session_ids = {session_id}
+        
+        with self._lock:
+            if session_ids is None:
+                batch, self._pending = self._pending, {}
+            else:
+                keys = [key for key in self._pending if key[0] in session_ids]
+                batch = {key: self._pending.pop(key) for key in keys}
+        
+        if not batch:
+            return 0
+        
+        rows, late_sessions = [], set()
+        try:
+            # Saves made after their session ended or pointing at another exam's question are
+            # dropped; writing them would reset graded answers or fail the whole batch
+            writable = writable_answers({key: saved_at for key, (_, saved_at) in batch.items()})
+            rows = [{
+                'session_id': sid,
+                'question_id': qid,
+                'answer_text': answer_text,
+                'submitted_at': saved_at
+            } for (sid, qid), (answer_text, saved_at) in batch.items() if (sid, qid) in writable]
+            if len(rows) < len(batch):
+                current_app.logger.warning(
+                    f"Autosave dropped {len(batch) - len(rows)} answers saved after their session ended "
+                    f"or to foreign questions"
+                )
+            
+            save_answers(rows)
+            # Saves buffered here while another process submitted or expired the session
+            # may reset answers its grading job has already scored
+            late_sessions = {sid for (sid, _), status in writable.items() if status != 'in_progress'}
+            for sid in sorted(late_sessions):
+                enqueue_grading(sid)
+            db.session.commit()
+        except (IntegrityError, DataError):
+            db.session.rollback()
+            return self._write_individually(rows, late_sessions)
+        except Exception:
+            db.session.rollback()
+            self._requeue(batch)
+            raise
+        
+        if late_sessions:
+            notify_workers()
+        return len(rows)
+    
+    def _write_individually(self, rows, late_sessions):
+        """Write rows one by one after a failed batch, dropping those the database rejects."""
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                save_answers([row])
+                if row['session_id'] in late_sessions:
+                    enqueue_grading(row['session_id'])
+                db.session.commit()
+                written += 1
+            except (IntegrityError, DataError) as e:
+                db.session.rollback()
+                current_app.logger.error(
+                    f"Autosave dropped answer to question {row['question_id']} "
+                    f"of session {row['session_id']}: {str(e)}"
+                )
+            except Exception:
+                db.session.rollback()
+                self._requeue({
+                    (r['session_id'], r['question_id']): (r['answer_text'], r['submitted_at'])
+                    for r in rows[i:]
+                })
+                raise
+        return written
+    
+    def _requeue(self, batch):
+        # Put the batch back unless a newer save arrived in the meantime
+        with self._lock:
+            for key, value in batch.items():
+                self._pending.setdefault(key, value)
+    
+    def pending_count(self):
+        """Number of answers waiting to be written."""
+        with self._lock:
+            return len(self._pending)
+    
+    def start(self):
+        """Start the background flusher."""
+        self._thread = threading.Thread(target=self._run, name='autosave-flusher', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        """Stop the flusher after writing everything still buffered."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    self.app.logger.error(f"Autosave flush error: {str(e)}")
+                finally:
+                    db.session.remove()
+            if self._stop.is_set():
+                break
+
+class DirectAutosave:
+    """Autosave without a buffer: each save is written and committed in the request."""
+    
+    def save(self, session_id, question_id, answer_text):
+        """Write the answer now."""
+        save_answers([{
+            'session_id': session_id,
+            'question_id': question_id,
+            'answer_text': answer_text,
+            'submitted_at': datetime.utcnow()
+        }])
+        db.session.commit()
+    
+    def flush(self, session_id=None, session_ids=None):
+        """Nothing is buffered."""
+        return 0
+    
+    def pending_count(self):
+        """Nothing is buffered."""
+        return 0
+
+def get_autosave_buffer():
+    """
+    Return the autosave buffer of the current application, or a DirectAutosave
+    if it runs without background services.
+    """
+    buffer = current_app.extensions.get('autosave_buffer')
+    return buffer if buffer is not None else DirectAutosave()
+
+def init_app(app):
+    """Create the autosave buffer and start its flusher thread."""
+    buffer = AutosaveBuffer(
+        app,
+        app.config['AUTOSAVE_FLUSH_INTERVAL'],
+        app.config['AUTOSAVE_MAX_PENDING']
+    )
+    buffer.start()
+    app.extensions['autosave_buffer'] = buffer
+    return buffer
@@ -0,0 +1,34 @@
+from ..models import db
+
+def upsert(table, rows, index_elements, update_columns=None, update_values=None, update_where=None):
+    """
+    Bulk INSERT ... ON CONFLICT DO UPDATE for SQLite and PostgreSQL.
+    `update_columns` are overwritten with the incoming values; `update_values`
+    is an optional callable receiving the `excluded` row and returning extra
+    SET expressions (e.g. counters to increment). `update_where` is an
+    optional callable receiving the `excluded` row and returning the
+    condition under which an existing row is updated at all.
+    The statement runs in the current session; the caller commits.
+    """
+    if not rows:
+        return
+    
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert is not supported for the '{dialect}' dialect")
+    
+    stmt = insert(table)
+    set_ = {column: stmt.excluded[column] for column in (update_columns or [])}
+    if update_values is not None:
+        set_.update(update_values(stmt.excluded))
+    
+    if set_:
+        where = update_where(stmt.excluded) if update_where is not None else None
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_, where=where)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    db.session.execute(stmt, rows)
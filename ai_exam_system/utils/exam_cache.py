@@ -0,0 +1,122 @@
+import hashlib
+import json
+import threading
+import time
+from flask import current_app, request
+from sqlalchemy.orm import selectinload
+from ..models import Exam, Question
+
+class ExamPayloadCache:
+    """
+    In-process cache of serialized exam payloads with content ETags.
+    Entries are dropped by invalidate() when an exam's questions change and
+    expire after EXAM_CACHE_TTL seconds, which bounds how long other worker
+    processes can serve a payload that was invalidated elsewhere.
+    """
+    
+    def __init__(self):
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key, loader, ttl):
+        """Return (body, etag) for `key`, building it with `loader()` on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > now:
+                return entry[0], entry[1]
+            version = self._versions.get(key, 0)
+        
+        payload = loader()
+        if payload is None:
+            return None, None
+        
+        body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        
+        with self._lock:
+            # Do not store a payload that was invalidated while it was being built
+            if self._versions.get(key, 0) == version:
+                self._entries[key] = (body, etag, now + ttl)
+        return body, etag
+    
+    def invalidate(self, *keys):
+        """Drop cached payloads and bump their versions."""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._versions[key] = self._versions.get(key, 0) + 1
+    
+    def clear(self):
+        """Drop every cached payload."""
+        with self._lock:
+            for key in list(self._entries):
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.clear()
+
+exam_payload_cache = ExamPayloadCache()
+
+def _load_exam_list():
+    return [{
+        'id': exam.id,
+        'title': exam.title,
+        'description': exam.description,
+        'duration_minutes': exam.duration_minutes
+    } for exam in Exam.query.order_by(Exam.id).all()]
+
+def _load_exam_details(exam_id):
+    # Questions and their options are fetched with one IN query each
+    exam = Exam.query.options(
+        selectinload(Exam.questions).selectinload(Question.options)
+    ).filter_by(id=exam_id).first()
+    if exam is None:
+        return None
+    
+    questions = [{
+        'id': q.id,
+        'text': q.question_text,
+        'type': q.question_type,
+        'points': q.points,
+        'options': [{'id': opt.id, 'text': opt.option_text}
+                   for opt in sorted(q.options, key=lambda opt: opt.id)] if q.question_type == 'multiple_choice' else None
+    } for q in sorted(exam.questions, key=lambda q: q.id)]
+    
+    return {
+        'id': exam.id,
+        'title': exam.title,
+        'description': exam.description,
+        'duration_minutes': exam.duration_minutes,
+        'questions': questions
+    }
+
+def get_exam_list():
+    """Return (body, etag) of the exam list."""
+    return exam_payload_cache.get(
+        ('list',),
+        _load_exam_list,
+        current_app.config['EXAM_CACHE_TTL']
+    )
+
+def get_exam_details(exam_id):
+    """Return (body, etag) of an exam with its questions, or (None, None) if it does not exist."""
+    return exam_payload_cache.get(
+        ('exam', exam_id),
+        lambda: _load_exam_details(exam_id),
+        current_app.config['EXAM_CACHE_TTL']
+    )
+
+def invalidate_exam_list():
+    """Drop the cached exam list after an exam is created or changed."""
+    exam_payload_cache.invalidate(('list',))
+
+def invalidate_exam(exam_id):
+    """Drop the cached payload of an exam after its questions or options change."""
+    exam_payload_cache.invalidate(('exam', exam_id))
+
+def cached_json_response(body, etag):
+    """JSON response carrying an ETag; answers 304 Not Modified when the client's copy is current."""
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
@@ -0,0 +1,93 @@
+"""
+Frame sampling and face detection for proctoring video.
+
+This module runs inside analysis worker processes, so it only depends on
+OpenCV (opencv-python-headless) and never imports the Flask application.
+"""
+
+# Frames are downscaled to this width before detection
+DETECTION_WIDTH = 320
+
+_detector = None
+
+def load_detector():
+    """Load the Haar cascade face detector once per process."""
+    global _detector
+    if _detector is None:
+        import cv2
+        cv2.setNumThreads(1)  # one worker process per core already
+        _detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return _detector
+
+def probe_duration(path):
+    """Duration of a video in seconds, or None if the container does not say."""
+    import cv2
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError(f'Cannot open video: {path}')
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        # Browser-recorded webm often has no frame count
+        if fps > 0 and frames > 0:
+            return frames / fps
+        return None
+    finally:
+        capture.release()
+
+def count_faces(frame):
+    """Number of faces found in a BGR frame."""
+    import cv2
+    height, width = frame.shape[:2]
+    if width > DETECTION_WIDTH:
+        frame = cv2.resize(frame, (DETECTION_WIDTH, int(height * DETECTION_WIDTH / width)))
+    gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    faces = load_detector().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    return len(faces)
+
+def analyze_segment(task):
+    """
+    Sample one segment of a video and count faces in each sampled frame.
+    `task` is (path, start_seconds, end_seconds or None, sample_fps).
+    Frames between samples are only grabbed, not decoded to images.
+    Returns (samples, seconds_covered) where samples is a list of
+    (offset_seconds, face_count).
+    """
+    import cv2
+    path, start, end, sample_fps = task
+    
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError(f'Cannot open video: {path}')
+        
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        if not fps or fps <= 0 or fps > 240:
+            fps = 30.0
+        step = max(1, int(round(fps / sample_fps)))
+        
+        if start > 0:
+            capture.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+        
+        samples = []
+        position = start
+        index = 0
+        while end is None or position < end:
+            if not capture.grab():
+                break
+            
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    samples.append((position, count_faces(frame)))
+            
+            index += 1
+            position = start + index / fps
+        
+        return samples, position - start
+    finally:
+        capture.release()
+
+def init_worker():
+    """Process pool initializer: load the detector before the first segment."""
+    load_detector()
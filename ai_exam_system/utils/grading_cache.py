@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from ..models import GradingCacheEntry, db
+from .db_utils import upsert
+
+# Keys per IN query when looking up a batch in the persistent tier
+LOOKUP_CHUNK_SIZE = 500
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies share a cache key."""
+    return ' '.join((text or '').split())
+
+def make_cache_key(kind, model_id, reference_answer, essay_text, score=None, variant=''):
+    """
+    Content-addressed key for a grading result. `variant` identifies how the
+    feedback stored with it was produced (algorithm and reference profile
+    version), so changing either never serves old feedback.
+    """
+    digest = hashlib.sha256()
+    for part in (kind, model_id or '', normalize_text(reference_answer),
+                 normalize_text(essay_text), '' if score is None else str(score), variant or ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+class GradingCache:
+    """
+    Two-tier cache of grading results.
+    An in-memory LRU sits in front of the persistent grading_cache table.
+    Lookups and stores take a whole batch, costing at most one query each.
+    """
+    
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+    
+    def get_grades(self, model_id, items):
+        """
+        Cached grades of (reference_answer, essay_text, variant) items.
+        Returns a list with a (score, feedback) tuple or None per item.
+        """
+        return self._get_many([
+            make_cache_key('grade', model_id, reference_answer, essay_text, variant=variant)
+            for reference_answer, essay_text, variant in items
+        ])
+    
+    def set_grades(self, model_id, items):
+        """Store (reference_answer, essay_text, variant, score, feedback) grades."""
+        self._set_many([
+            (make_cache_key('grade', model_id, reference_answer, essay_text, variant=variant), score, feedback)
+            for reference_answer, essay_text, variant, score, feedback in items
+        ])
+    
+    def get_feedbacks(self, items):
+        """
+        Cached feedback of (reference_answer, essay_text, score, variant) items.
+        Returns a list with the feedback text or None per item.
+        """
+        values = self._get_many([
+            make_cache_key('feedback', None, reference_answer, essay_text, score, variant)
+            for reference_answer, essay_text, score, variant in items
+        ])
+        return [value[1] if value is not None else None for value in values]
+    
+    def set_feedbacks(self, items):
+        """Store (reference_answer, essay_text, score, variant, feedback) feedback texts."""
+        self._set_many([
+            (make_cache_key('feedback', None, reference_answer, essay_text, score, variant), score, feedback)
+            for reference_answer, essay_text, score, variant, feedback in items
+        ])
+    
+    def stats(self):
+        """Return hit/miss counters for both tiers."""
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'memory_entries': len(self._entries),
+                'max_memory_entries': self.max_entries,
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.db_hits) / lookups if lookups else 0.0
+            }
+    
+    def clear_memory(self):
+        """Drop the in-memory tier; persisted entries are kept."""
+        with self._lock:
+            self._entries.clear()
+    
+    def _get_many(self, keys):
+        results = [None] * len(keys)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    results[i] = value
+                else:
+                    missing.setdefault(key, []).append(i)
+        
+        if not missing:
+            return results
+        
+        rows = []
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), LOOKUP_CHUNK_SIZE):
+            rows.extend(db.session.query(
+                GradingCacheEntry.key, GradingCacheEntry.score, GradingCacheEntry.feedback
+            ).filter(GradingCacheEntry.key.in_(missing_keys[start:start + LOOKUP_CHUNK_SIZE])).all())
+        
+        with self._lock:
+            for key, score, feedback in rows:
+                value = (score, feedback)
+                self._remember(key, value)
+                for i in missing.pop(key):
+                    results[i] = value
+                    self.db_hits += 1
+            self.misses += sum(len(indices) for indices in missing.values())
+        return results
+    
+    def _set_many(self, entries):
+        if not entries:
+            return
+        
+        rows = {}
+        with self._lock:
+            for key, score, feedback in entries:
+                self._remember(key, (score, feedback))
+                rows[key] = {'key': key, 'score': score, 'feedback': feedback, 'created_at': datetime.utcnow()}
+        
+        # Keys another worker persisted concurrently are left as they are
+        upsert(GradingCacheEntry.__table__, list(rows.values()), index_elements=['key'])
+    
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+# Singleton instance
+grading_cache = None
+
+def get_grading_cache():
+    """Get or create the GradingCache instance."""
+    global grading_cache
+    if grading_cache is None:
+        grading_cache = GradingCache(max_entries=current_app.config['GRADING_CACHE_SIZE'])
+    return grading_cache
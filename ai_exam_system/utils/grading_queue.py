@@ -0,0 +1,158 @@
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from ..models import Answer, GradingJob, Question, db
+from .similarity_grader import grade_answers
+
+def enqueue_grading(session_id):
+    """
+    Queue background grading for the essay answers of a session.
+    The job is added to the current database session; the caller commits it.
+    """
+    job = GradingJob(session_id=session_id, status='pending')
+    db.session.add(job)
+    return job
+
+def notify_workers():
+    """Wake up the local grading workers after a job has been committed."""
+    pool = current_app.extensions.get('grading_pool')
+    if pool is not None:
+        pool.notify()
+
+def claim_next_job():
+    """
+    Claim the oldest pending job for this worker.
+    Jobs become claimable GRADING_START_DELAY seconds after they are queued.
+    Jobs left 'running' longer than GRADING_JOB_TIMEOUT (e.g. by a worker that
+    died during a restart) are claimed again.
+    Returns the claimed job id, or None if the queue is empty.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=current_app.config['GRADING_JOB_TIMEOUT'])
+    # New jobs wait briefly so autosaves buffered by other processes are written first
+    ready_before = now - timedelta(seconds=current_app.config['GRADING_START_DELAY'])
+    claimable = db.or_(
+        db.and_(GradingJob.status == 'pending', GradingJob.created_at <= ready_before),
+        db.and_(GradingJob.status == 'running', GradingJob.started_at < stale_before)
+    )
+    
+    candidates = db.session.query(GradingJob.id).filter(claimable) \
+        .order_by(GradingJob.id).limit(10).all()
+    
+    for (job_id,) in candidates:
+        # Conditional update so that only one worker wins each job
+        claimed = GradingJob.query.filter(GradingJob.id == job_id, claimable).update({
+            'status': 'running',
+            'started_at': now,
+            'attempts': GradingJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return job_id
+    
+    return None
+
+def run_job(job_id):
+    """Grade all ungraded essay answers of the job's session."""
+    job = GradingJob.query.get(job_id)
+    
+    try:
+        rows = db.session.query(
+            Answer, Question.correct_answer, Question.reference_profile, Question.similarity_thresholds
+        ).join(Question, Answer.question_id == Question.id) \
+            .filter(
+                Answer.session_id == job.session_id,
+                Answer.score.is_(None),
+                Question.question_type == 'essay'
+            ).all()
+        
+        if rows:
+            results = grade_answers(
+                [(answer.answer_text, reference_answer or '') for answer, reference_answer, _, _ in rows],
+                profiles=[profile for _, _, profile, _ in rows],
+                thresholds=[thresholds for _, _, _, thresholds in rows],
+                batch_size=current_app.config['GRADING_BATCH_SIZE']
+            )
+            for (answer, _, _, _), (score, feedback) in zip(rows, results):
+                answer.score = score
+                answer.feedback = feedback
+        
+        job.status = 'completed'
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    
+    except Exception as e:
+        db.session.rollback()
+        job = GradingJob.query.get(job_id)
+        job.error = str(e)
+        if job.attempts >= current_app.config['GRADING_MAX_ATTEMPTS']:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'pending'
+        db.session.commit()
+        current_app.logger.error(f"Error running grading job {job_id}: {str(e)}")
+
+class GradingWorkerPool:
+    """Pool of local worker threads draining the grading job table."""
+    
+    def __init__(self, app, num_workers, poll_interval):
+        self.app = app
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+    
+    def start(self):
+        """Start the worker threads."""
+        for i in range(self.num_workers):
+            thread = threading.Thread(
+                target=self._run,
+                name=f'grading-worker-{i}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self, timeout=None):
+        """Signal the workers to exit and wait for them."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+    
+    def notify(self):
+        """Wake idle workers so new jobs are picked up without waiting for the next poll."""
+        self._wakeup.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    job_id = claim_next_job()
+                    if job_id is not None:
+                        run_job(job_id)
+                except Exception as e:
+                    db.session.rollback()
+                    job_id = None
+                    self.app.logger.error(f"Grading worker error: {str(e)}")
+                finally:
+                    db.session.remove()
+            
+            if job_id is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+def init_app(app):
+    """Start the local grading worker pool if GRADING_WORKERS is set."""
+    num_workers = app.config.get('GRADING_WORKERS', 0)
+    if num_workers <= 0:
+        return None
+    
+    pool = GradingWorkerPool(app, num_workers, app.config['GRADING_POLL_INTERVAL'])
+    pool.start()
+    app.extensions['grading_pool'] = pool
+    return pool
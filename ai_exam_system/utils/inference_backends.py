@@ -0,0 +1,146 @@
+import hashlib
+import os
+import tempfile
+from flask import current_app
+
+# Inference backends for the essay grading model. Each backend takes a batch
+# of tokenizer outputs (a dict of int64 tensors) and returns the logits as a
+# NumPy array, so EssayGrader does not depend on how the forward pass is run.
+
+class TorchBackend:
+    """Eager fp32 PyTorch inference."""
+    name = 'torch'
+    
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+    
+    def logits(self, batch):
+        """Return the logits for a tokenized batch."""
+        import torch
+        
+        inputs = {key: value.to(self.device) for key, value in batch.items()}
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+        return outputs.logits.float().cpu().numpy()
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    PyTorch inference with int8 dynamic quantization of the Linear layers (CPU only).
+    The model is quantized in place, so its fp32 Linear weights are released.
+    """
+    name = 'torch-int8'
+    
+    def __init__(self, model, device):
+        import torch
+        
+        quantized = torch.quantization.quantize_dynamic(
+            model.to('cpu'),
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+            inplace=True
+        )
+        quantized.eval()
+        super().__init__(quantized, torch.device('cpu'))
+
+class OnnxBackend:
+    """
+    ONNX Runtime inference of an exported graph of the model (CPU only).
+    The PyTorch model is only used to export a missing graph and is not kept.
+    """
+    name = 'onnx'
+    
+    def __init__(self, model, tokenizer, onnx_path):
+        import onnxruntime as ort
+        
+        if not os.path.exists(onnx_path):
+            export_onnx(model, tokenizer, onnx_path)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            onnx_path,
+            options,
+            providers=['CPUExecutionProvider']
+        )
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+    
+    def logits(self, batch):
+        """Return the logits for a tokenized batch."""
+        import numpy as np
+        
+        arrays = {key: value.cpu().numpy().astype(np.int64) for key, value in batch.items()}
+        if 'token_type_ids' in self.input_names and 'token_type_ids' not in arrays:
+            arrays['token_type_ids'] = np.zeros_like(arrays['input_ids'])
+        
+        feed = {name: arrays[name] for name in self.input_names}
+        return self.session.run(['logits'], feed)[0]
+
+def export_onnx(model, tokenizer, onnx_path):
+    """
+    Export the classification model (moved to the CPU) to ONNX with dynamic
+    batch and sequence axes. The graph is written to a temporary file next to
+    `onnx_path` and renamed into place, so processes exporting concurrently
+    never load a partly written graph.
+    """
+    import torch
+    
+    directory = os.path.dirname(onnx_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    sample = tokenizer("export", "export", return_tensors='pt')
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'}
+                    for name in ('input_ids', 'attention_mask', 'token_type_ids')}
+    dynamic_axes['logits'] = {0: 'batch'}
+    
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(onnx_path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                model.to('cpu'),
+                (sample['input_ids'], sample['attention_mask'], sample['token_type_ids']),
+                tmp_path,
+                input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+                output_names=['logits'],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        os.replace(tmp_path, onnx_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def weights_fingerprint(model_path, model):
+    """
+    Identify the weights a model was loaded from: size and mtime of the weight
+    and config files of a local model directory, else the hub revision.
+    """
+    if os.path.isdir(model_path):
+        parts = []
+        for name in sorted(os.listdir(model_path)):
+            if name == 'config.json' or name.endswith(('.safetensors', '.bin')):
+                stat = os.stat(os.path.join(model_path, name))
+                parts.append(f'{name}:{stat.st_size}:{stat.st_mtime_ns}')
+        return ';'.join(parts)
+    return getattr(model.config, '_commit_hash', None) or ''
+
+def default_onnx_path(model_path, model):
+    """
+    Location of the exported graph for a model, one file per BERT_MODEL_PATH
+    and version of its weights, so replaced weights are exported again.
+    """
+    identity = f'{model_path}\x00{weights_fingerprint(model_path, model)}'
+    digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(current_app.config['ONNX_MODEL_DIR'], f'essay_grader-{digest}.onnx')
+
+BACKENDS = ('torch', 'torch-int8', 'onnx')
+
+def create_backend(name, model, tokenizer, device):
+    """Create the inference backend selected by Config.GRADING_BACKEND."""
+    if name == 'torch':
+        return TorchBackend(model, device)
+    if name == 'torch-int8':
+        return QuantizedTorchBackend(model, device)
+    if name == 'onnx':
+        return OnnxBackend(model, tokenizer, default_onnx_path(current_app.config['BERT_MODEL_PATH'], model))
+    raise ValueError(f"Unknown grading backend '{name}', expected one of: {', '.join(BACKENDS)}")
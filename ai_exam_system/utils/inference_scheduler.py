@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from .metrics import inference_batch_size, inference_queue_wait
+
+class InferenceScheduler:
+    """
+    Dynamic micro-batching in front of a model.
+    Callers on any thread submit single items and get futures back; one
+    inference thread gathers queued items into batches of at most
+    `max_batch_size`, waiting at most `max_wait` seconds after the first item
+    for more to arrive, and runs `predict` once per batch.
+    `predict` takes a list of items and returns one result per item.
+    `map` waits at most `timeout` seconds for its results.
+    """
+    
+    # Seconds the idle inference thread waits before checking for stop
+    POLL_INTERVAL = 0.5
+    
+    def __init__(self, predict, max_batch_size=32, max_wait=0.01, torch_threads=0, timeout=None, name='inference'):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.torch_threads = torch_threads
+        self.timeout = timeout
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()  # orders submit against stop
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the inference thread."""
+        self._thread = threading.Thread(target=self._run, name=f'{self.name}-scheduler', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        """
+        Finish the batches already queued and stop the inference thread.
+        Items it did not get to within `timeout` fail with RuntimeError.
+        """
+        with self._lock:
+            self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._fail_pending(RuntimeError(f'{self.name} scheduler is stopped'))
+    
+    def submit(self, item):
+        """Queue one item; returns a Future of its result."""
+        future = Future()
+        with self._lock:
+            if self._stop.is_set():
+                raise RuntimeError(f'{self.name} scheduler is stopped')
+            self._queue.put((item, future, time.perf_counter()))
+        return future
+    
+    def map(self, items, timeout=None):
+        """
+        Queue several items and wait for their results, in order.
+        Raises TimeoutError after `timeout` seconds (default: the scheduler's
+        timeout); items not yet started are then cancelled.
+        """
+        futures = [self.submit(item) for item in items]
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            return [
+                future.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                for future in futures
+            ]
+        except TimeoutError:
+            for future in futures:
+                future.cancel()
+            raise TimeoutError(f'{self.name} inference did not finish within {timeout}s')
+    
+    def _configure_torch(self):
+        import torch
+        
+        # One thread runs every forward pass, so it gets all intra-op threads
+        if self.torch_threads > 0:
+            torch.set_num_threads(self.torch_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # only settable before the first parallel work in the process
+    
+    def _next_batch(self):
+        """
+        Wait up to POLL_INTERVAL for the first item, then gather more until the
+        batch is full or max_wait has passed. Returns [] if nothing arrived.
+        """
+        try:
+            first = self._queue.get(timeout=self.POLL_INTERVAL)
+        except queue.Empty:
+            return []
+        
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(entry)
+        return batch
+    
+    def _fail_pending(self, error):
+        """Fail every item still queued."""
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+    
+    def _run(self):
+        self._configure_torch()
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                # No submit can follow stop, so an empty queue stays empty
+                if self._stop.is_set():
+                    break
+                continue
+            
+            # Skip items whose caller gave up waiting
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            
+            now = time.perf_counter()
+            for _, _, queued_at in batch:
+                inference_queue_wait.observe(now - queued_at, self.name)
+            inference_batch_size.observe(len(batch), self.name)
+            
+            try:
+                results = self.predict([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f'{self.name} predict returned {len(results)} results for {len(batch)} items')
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,219 @@
+import ipaddress
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import Response, abort, g, has_request_context, request
+
+# Instrumentation of requests, SQL and model inference.
+# Metrics live in process memory, so each web worker exposes its own values
+# on /metrics and Prometheus aggregates across workers.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with labels."""
+    kind = 'counter'
+    
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+    
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+    
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name + _format_labels(self.labels, label_values), value
+
+class Histogram:
+    """Cumulative histogram with labels, in the Prometheus bucket layout."""
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def samples(self):
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield self.name + '_bucket' + _format_labels(self.labels, label_values, [('le', bound)]), bucket_count
+            yield self.name + '_bucket' + _format_labels(self.labels, label_values, [('le', '+Inf')]), count
+            yield self.name + '_sum' + _format_labels(self.labels, label_values), total
+            yield self.name + '_count' + _format_labels(self.labels, label_values), count
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text format."""
+    
+    def __init__(self):
+        self.metrics = []
+    
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name} {_format_value(value)}' for name, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.',
+    labels=('method', 'endpoint', 'status')
+))
+request_db_queries = registry.register(Histogram(
+    'http_request_db_queries', 'SQL statements executed per request.',
+    labels=('endpoint',), buckets=COUNT_BUCKETS
+))
+request_db_duration = registry.register(Histogram(
+    'http_request_db_duration_seconds', 'Time spent in SQL statements per request.',
+    labels=('endpoint',)
+))
+db_queries = registry.register(Counter(
+    'db_queries_total', 'SQL statements executed, in and outside requests.'
+))
+stage_duration = registry.register(Histogram(
+    'stage_duration_seconds', 'Time spent in instrumented stages (auth, model preprocess/forward/feedback).',
+    labels=('component', 'stage')
+))
+inference_batch_size = registry.register(Histogram(
+    'inference_batch_size', 'Items per forward pass run by an inference scheduler.',
+    labels=('model',), buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+))
+inference_queue_wait = registry.register(Histogram(
+    'inference_queue_wait_seconds', 'Time items wait in an inference scheduler queue.',
+    labels=('model',)
+))
+
+def _breakdown():
+    """Per-request time breakdown, or None outside a request."""
+    if has_request_context():
+        return g.get('metrics_breakdown')
+    return None
+
+@contextmanager
+def timed(component, stage):
+    """Time a block as `stage` of `component`, e.g. timed('essay_grader', 'forward')."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, component, stage)
+        breakdown = _breakdown()
+        if breakdown is not None:
+            breakdown[f'{component}.{stage}'] += elapsed
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+    db_queries.inc()
+    breakdown = _breakdown()
+    if breakdown is not None:
+        breakdown['db'] += elapsed
+        g.metrics_db_queries += 1
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    starts = context.connection.info.get('metrics_query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_breakdown = defaultdict(float)
+    g.metrics_db_queries = 0
+
+def _after_request(app, response):
+    start = g.get('metrics_start')
+    if start is None:
+        return response
+    
+    elapsed = time.perf_counter() - start
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    breakdown = g.metrics_breakdown
+    
+    request_duration.observe(elapsed, request.method, endpoint, str(response.status_code))
+    request_db_queries.observe(g.metrics_db_queries, endpoint)
+    request_db_duration.observe(breakdown['db'], endpoint)
+    
+    if app.config['SLOW_REQUEST_LOG'] and elapsed >= app.config['SLOW_REQUEST_THRESHOLD']:
+        parts = ', '.join(f'{name}={seconds * 1000:.1f}ms' for name, seconds in sorted(breakdown.items()))
+        app.logger.warning(
+            f"Slow request {request.method} {request.path} -> {response.status_code} "
+            f"in {elapsed * 1000:.1f}ms ({g.metrics_db_queries} queries; {parts})"
+        )
+    return response
+
+def metrics_view(allowed_networks):
+    """Prometheus scrape endpoint; 404 for clients outside `allowed_networks`."""
+    # remote_addr is the direct peer, so scrape workers directly, not through a proxy
+    try:
+        client = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        abort(404)
+    if not any(client in network for network in allowed_networks):
+        abort(404)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def init_app(app):
+    """Instrument requests and SQL of the application and serve /metrics to METRICS_ALLOWED_NETWORKS."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    
+    # Listening on Engine covers every engine the app creates
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    
+    app.before_request(_before_request)
+    app.after_request(lambda response: _after_request(app, response))
+    allowed_networks = [ipaddress.ip_network(network) for network in app.config['METRICS_ALLOWED_NETWORKS']]
+    app.add_url_rule('/metrics', 'metrics', lambda: metrics_view(allowed_networks))
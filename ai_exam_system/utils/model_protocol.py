@@ -0,0 +1,196 @@
+import json
+import struct
+
+# Wire format between web workers and the model server (utils/model_server.py).
+# Every message is one frame: a 4-byte big-endian length of the rest of the
+# frame, a 1-byte opcode and the payload. Payload integers are big-endian;
+# strings are a u32 byte length followed by UTF-8, with length 0xFFFFFFFF
+# meaning None.
+
+OP_OK = 0
+OP_PING = 1
+OP_GRADE = 2
+OP_GENERATE = 3
+OP_ERROR = 255
+
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+_NONE = 0xFFFFFFFF
+
+class ProtocolError(Exception):
+    """Malformed or oversized frame."""
+
+class Writer:
+    """Builds a payload."""
+    
+    def __init__(self):
+        self.buffer = bytearray()
+    
+    def u8(self, value):
+        self.buffer += struct.pack('>B', value)
+    
+    def u16(self, value):
+        self.buffer += struct.pack('>H', value)
+    
+    def u32(self, value):
+        self.buffer += struct.pack('>I', value)
+    
+    def text(self, value):
+        if value is None:
+            self.u32(_NONE)
+            return
+        data = value.encode('utf-8')
+        self.u32(len(data))
+        self.buffer += data
+    
+    def json(self, value):
+        self.text(None if value is None else json.dumps(value, separators=(',', ':')))
+    
+    def getvalue(self):
+        return bytes(self.buffer)
+
+class Reader:
+    """Reads a payload written by Writer."""
+    
+    def __init__(self, payload):
+        self.payload = memoryview(payload)
+        self.offset = 0
+    
+    def _take(self, size):
+        if self.offset + size > len(self.payload):
+            raise ProtocolError('Truncated payload')
+        data = self.payload[self.offset:self.offset + size]
+        self.offset += size
+        return data
+    
+    def u8(self):
+        return struct.unpack('>B', self._take(1))[0]
+    
+    def u16(self):
+        return struct.unpack('>H', self._take(2))[0]
+    
+    def u32(self):
+        return struct.unpack('>I', self._take(4))[0]
+    
+    def text(self):
+        size = self.u32()
+        if size == _NONE:
+            return None
+        return str(self._take(size), 'utf-8')
+    
+    def json(self):
+        value = self.text()
+        return None if value is None else json.loads(value)
+
+def _recv_exactly(sock, size):
+    """Read `size` bytes; None if the peer closed the connection before the first byte."""
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(min(size - len(chunks), 1024 * 1024))
+        if not chunk:
+            if not chunks:
+                return None
+            raise ProtocolError('Connection closed mid-frame')
+        chunks += chunk
+    return bytes(chunks)
+
+def send_frame(sock, op, payload=b''):
+    sock.sendall(struct.pack('>IB', len(payload) + 1, op) + payload)
+
+def recv_frame(sock):
+    """Return (op, payload), or None when the peer closed the connection between frames."""
+    header = _recv_exactly(sock, 5)
+    if header is None:
+        return None
+    length, op = struct.unpack('>IB', header)
+    if length < 1 or length > MAX_FRAME_SIZE:
+        raise ProtocolError(f'Invalid frame length {length}')
+    payload = _recv_exactly(sock, length - 1) if length > 1 else b''
+    if payload is None:
+        raise ProtocolError('Connection closed mid-frame')
+    return op, payload
+
+def encode_grade_request(pairs, batch_size=8, profiles=None):
+    writer = Writer()
+    writer.u16(batch_size)
+    writer.u32(len(pairs))
+    for i, (essay_text, reference_answer) in enumerate(pairs):
+        writer.text(essay_text)
+        writer.text(reference_answer)
+        writer.json(profiles[i] if profiles else None)
+    return writer.getvalue()
+
+def decode_grade_request(payload):
+    """Return (pairs, batch_size, profiles)."""
+    reader = Reader(payload)
+    batch_size = reader.u16()
+    pairs, profiles = [], []
+    for _ in range(reader.u32()):
+        pairs.append((reader.text(), reader.text()))
+        profiles.append(reader.json())
+    return pairs, batch_size, profiles
+
+def encode_grade_response(results):
+    writer = Writer()
+    writer.u32(len(results))
+    for score, feedback in results:
+        writer.u8(score)
+        writer.text(feedback)
+    return writer.getvalue()
+
+def decode_grade_response(payload):
+    reader = Reader(payload)
+    return [(reader.u8(), reader.text()) for _ in range(reader.u32())]
+
+def encode_generate_request(topics, count, question_type='multiple_choice', batch_size=16):
+    writer = Writer()
+    writer.text(question_type)
+    writer.u32(count)
+    writer.u16(batch_size)
+    writer.u32(len(topics))
+    for topic in topics:
+        writer.text(topic)
+    return writer.getvalue()
+
+def decode_generate_request(payload):
+    """Return (topics, count, question_type, batch_size)."""
+    reader = Reader(payload)
+    question_type = reader.text()
+    count = reader.u32()
+    batch_size = reader.u16()
+    topics = [reader.text() for _ in range(reader.u32())]
+    return topics, count, question_type, batch_size
+
+def encode_questions(questions):
+    writer = Writer()
+    writer.u32(len(questions))
+    for question in questions:
+        writer.text(question['question_text'])
+        writer.text(question['question_type'])
+        writer.text(question.get('correct_answer'))
+        writer.text(question.get('reference_answer'))
+        options = question.get('options')
+        if options is None:
+            writer.u8(0)
+        else:
+            writer.u8(1)
+            writer.u16(len(options))
+            for option in options:
+                writer.text(option)
+    return writer.getvalue()
+
+def decode_questions(payload):
+    """Inverse of encode_questions; keys absent from the generator's output stay absent."""
+    reader = Reader(payload)
+    questions = []
+    for _ in range(reader.u32()):
+        question = {'question_text': reader.text(), 'question_type': reader.text()}
+        correct_answer = reader.text()
+        reference_answer = reader.text()
+        if reader.u8():
+            question['options'] = [reader.text() for _ in range(reader.u16())]
+        if question['question_type'] == 'multiple_choice':
+            question['correct_answer'] = correct_answer
+        if reference_answer is not None:
+            question['reference_answer'] = reference_answer
+        questions.append(question)
+    return questions
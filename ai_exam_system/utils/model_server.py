@@ -0,0 +1,114 @@
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..models import db
+from . import model_protocol as protocol
+from .ai_models import get_essay_grader, get_question_generator
+from .metrics import registry
+
+class ModelRequestHandler(socketserver.BaseRequestHandler):
+    """Serves the frames of one client connection until it disconnects."""
+    
+    def handle(self):
+        app = self.server.app
+        while True:
+            try:
+                frame = protocol.recv_frame(self.request)
+            except (OSError, protocol.ProtocolError) as e:
+                app.logger.warning(f"Model server connection dropped: {str(e)}")
+                return
+            if frame is None:
+                return
+            
+            op, payload = frame
+            with app.app_context():
+                try:
+                    response = self.server.dispatch(op, payload)
+                    # Grading writes new results to the persistent grading cache
+                    db.session.commit()
+                    status = protocol.OP_OK
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Model server error: {str(e)}")
+                    status, response = protocol.OP_ERROR, str(e).encode('utf-8')
+                finally:
+                    db.session.remove()
+            
+            try:
+                protocol.send_frame(self.request, status, response)
+            except OSError:
+                return
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Owns the EssayGrader and QuestionGenerator of a node and serves grade and
+    generate calls to the web workers over a Unix domain socket, one thread
+    per connection. Grading calls of all connections share the grader's
+    inference scheduler, so they are batched together.
+    """
+    daemon_threads = True
+    # Every web worker thread keeps a connection; connects beyond the backlog fail with EAGAIN
+    request_queue_size = 128
+    
+    def __init__(self, app, socket_path):
+        self.app = app
+        self.socket_path = socket_path
+        # A socket file left by a previous server would make bind fail
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, ModelRequestHandler)
+        os.chmod(socket_path, 0o660)
+    
+    def dispatch(self, op, payload):
+        """Run one request and return the response payload."""
+        if op == protocol.OP_PING:
+            return b''
+        
+        if op == protocol.OP_GRADE:
+            pairs, batch_size, profiles = protocol.decode_grade_request(payload)
+            results = get_essay_grader().grade_essays(pairs, batch_size=batch_size, profiles=profiles)
+            return protocol.encode_grade_response(results)
+        
+        if op == protocol.OP_GENERATE:
+            topics, count, question_type, batch_size = protocol.decode_generate_request(payload)
+            questions = get_question_generator().generate_questions(
+                topics, count, question_type, batch_size=batch_size
+            )
+            return protocol.encode_questions(questions)
+        
+        raise protocol.ProtocolError(f'Unknown opcode {op}')
+    
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the model server's metrics registry on GET /metrics."""
+    
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass  # scrapes would flood the log
+
+def start_metrics_server(address):
+    """
+    Serve /metrics on `address` ('host:port', host defaults to 127.0.0.1) from a
+    daemon thread. Inference histograms are recorded in this process, which
+    serves no Flask requests, so Prometheus scrapes them here.
+    """
+    host, _, port = address.rpartition(':')
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='model-server-metrics', daemon=True).start()
+    return server
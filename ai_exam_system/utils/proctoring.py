@@ -0,0 +1,383 @@
+import json
+import threading
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import case, func
+from sqlalchemy.exc import DataError, IntegrityError
+from ..models import (
+    ExamSession, ProctoringEventCount, ProctoringLog, ProctoringMinuteBucket, db
+)
+from .db_utils import upsert
+
+SEVERITIES = ('info', 'warning', 'critical')
+
+def parse_event(session_id, event):
+    """
+    Validate one client event and turn it into a proctoring_logs row.
+    Raises ValueError for malformed events.
+    """
+    if not isinstance(event, dict):
+        raise ValueError('Event must be an object')
+    
+    event_type = event.get('event_type')
+    if not isinstance(event_type, str) or not event_type or len(event_type) > 50:
+        raise ValueError('Invalid event_type')
+    
+    severity = event.get('severity', 'info')
+    if severity not in SEVERITIES:
+        raise ValueError(f'Invalid severity: {severity}')
+    
+    timestamp = event.get('timestamp')
+    try:
+        if timestamp is None:
+            timestamp = datetime.utcnow()
+        elif isinstance(timestamp, (int, float)):
+            timestamp = datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+        else:
+            timestamp = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00'))
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    except (ValueError, OverflowError, OSError):
+        # Out-of-range epochs raise OverflowError or OSError rather than ValueError
+        raise ValueError(f'Invalid timestamp: {str(timestamp)[:50]}')
+    
+    return {
+        'session_id': session_id,
+        'event_type': event_type,
+        'timestamp': timestamp,
+        'details': event.get('details'),
+        'severity': severity
+    }
+
+def parse_event_batch(body, content_type):
+    """Decode a JSON array or NDJSON request body into a list of event dicts."""
+    if content_type and 'ndjson' in content_type:
+        return [json.loads(line) for line in body.decode('utf-8').splitlines() if line.strip()]
+    
+    events = json.loads(body or b'[]')
+    if isinstance(events, dict):
+        events = events.get('events', [])
+    if not isinstance(events, list):
+        raise ValueError('Expected a JSON array of events')
+    return events
+
+def bulk_insert_logs(rows):
+    """
+    Insert proctoring log rows with one executemany and update the rollups
+    in the same transaction; the caller commits.
+    """
+    if rows:
+        db.session.execute(ProctoringLog.__table__.insert(), rows)
+        update_rollups(rows)
+
+def _earliest(current, incoming):
+    return case((current.is_(None), incoming), (incoming < current, incoming), else_=current)
+
+def _latest(current, incoming):
+    return case((current.is_(None), incoming), (incoming > current, incoming), else_=current)
+
+def update_rollups(rows):
+    """
+    Fold a batch of log rows into the per-session rollups: counts by event type
+    and severity, and per-minute counts by severity. The batch is aggregated in
+    memory first, so each rollup row is upserted once per batch.
+    """
+    counts = {}
+    buckets = {}
+    for row in rows:
+        severity = row.get('severity') or 'info'
+        timestamp = row.get('timestamp') or datetime.utcnow()
+        
+        key = (row['session_id'], row['event_type'], severity)
+        entry = counts.get(key)
+        if entry is None:
+            counts[key] = [1, timestamp, timestamp]
+        else:
+            entry[0] += 1
+            entry[1] = min(entry[1], timestamp)
+            entry[2] = max(entry[2], timestamp)
+        
+        minute = (row['session_id'], timestamp.replace(second=0, microsecond=0))
+        bucket = buckets.setdefault(minute, {'info_count': 0, 'warning_count': 0, 'critical_count': 0})
+        bucket[f'{severity}_count' if severity in SEVERITIES else 'info_count'] += 1
+    
+    table = ProctoringEventCount.__table__
+    upsert(
+        table,
+        [{
+            'session_id': session_id,
+            'event_type': event_type,
+            'severity': severity,
+            'event_count': count,
+            'first_at': first_at,
+            'last_at': last_at
+        } for (session_id, event_type, severity), (count, first_at, last_at) in counts.items()],
+        index_elements=['session_id', 'event_type', 'severity'],
+        update_values=lambda excluded: {
+            'event_count': table.c.event_count + excluded.event_count,
+            'first_at': _earliest(table.c.first_at, excluded.first_at),
+            'last_at': _latest(table.c.last_at, excluded.last_at)
+        }
+    )
+    
+    table = ProctoringMinuteBucket.__table__
+    upsert(
+        table,
+        [dict(session_id=session_id, minute=minute, **bucket)
+         for (session_id, minute), bucket in buckets.items()],
+        index_elements=['session_id', 'minute'],
+        update_values=lambda excluded: {
+            column: table.c[column] + excluded[column]
+            for column in ('info_count', 'warning_count', 'critical_count')
+        }
+    )
+
+def _risk_expression(severity, count):
+    """SQL expression weighting `count` events of `severity` by PROCTORING_RISK_WEIGHTS."""
+    weights = current_app.config['PROCTORING_RISK_WEIGHTS']
+    return case(*[(severity == name, count * weight) for name, weight in weights.items()], else_=0)
+
+def rank_sessions_by_risk(exam_id, limit):
+    """
+    Sessions of an exam ordered by risk score, highest first. Reads only the
+    rollup tables: a few rows per session instead of its raw logs.
+    """
+    weights = current_app.config['PROCTORING_RISK_WEIGHTS']
+    
+    risk_score = func.sum(_risk_expression(ProctoringEventCount.severity, ProctoringEventCount.event_count))
+    critical_count = func.sum(case((ProctoringEventCount.severity == 'critical', ProctoringEventCount.event_count), else_=0))
+    ranked = db.session.query(
+        ProctoringEventCount.session_id,
+        ExamSession.student_id,
+        ExamSession.status,
+        risk_score.label('risk_score'),
+        critical_count.label('critical_count'),
+        func.sum(ProctoringEventCount.event_count).label('event_count'),
+        func.min(ProctoringEventCount.first_at).label('first_event_at'),
+        func.max(ProctoringEventCount.last_at).label('last_event_at')
+    ).join(ExamSession, ExamSession.id == ProctoringEventCount.session_id) \
+        .filter(ExamSession.exam_id == exam_id) \
+        .group_by(ProctoringEventCount.session_id, ExamSession.student_id, ExamSession.status) \
+        .order_by(risk_score.desc(), critical_count.desc(), ProctoringEventCount.session_id) \
+        .limit(limit).all()
+    
+    # Worst minute of each ranked session, to show where events clustered
+    minute_score = (
+        ProctoringMinuteBucket.info_count * weights.get('info', 0)
+        + ProctoringMinuteBucket.warning_count * weights.get('warning', 0)
+        + ProctoringMinuteBucket.critical_count * weights.get('critical', 0)
+    )
+    session_ids = [row.session_id for row in ranked]
+    peaks = dict(db.session.query(ProctoringMinuteBucket.session_id, func.max(minute_score))
+                 .filter(ProctoringMinuteBucket.session_id.in_(session_ids))
+                 .group_by(ProctoringMinuteBucket.session_id).all()) if session_ids else {}
+    
+    return [{
+        'session_id': row.session_id,
+        'student_id': row.student_id,
+        'status': row.status,
+        'risk_score': int(row.risk_score or 0),
+        'critical_count': int(row.critical_count or 0),
+        'event_count': int(row.event_count or 0),
+        'peak_minute_score': int(peaks.get(row.session_id) or 0),
+        'first_event_at': row.first_event_at.isoformat() if row.first_event_at else None,
+        'last_event_at': row.last_event_at.isoformat() if row.last_event_at else None
+    } for row in ranked]
+
+def session_rollup(session_id):
+    """Event counts and the per-minute timeline of one session."""
+    counts = ProctoringEventCount.query.filter_by(session_id=session_id) \
+        .order_by(ProctoringEventCount.event_type, ProctoringEventCount.severity).all()
+    buckets = ProctoringMinuteBucket.query.filter_by(session_id=session_id) \
+        .order_by(ProctoringMinuteBucket.minute).all()
+    
+    return {
+        'session_id': session_id,
+        'counts': [{
+            'event_type': c.event_type,
+            'severity': c.severity,
+            'count': c.event_count,
+            'first_at': c.first_at.isoformat() if c.first_at else None,
+            'last_at': c.last_at.isoformat() if c.last_at else None
+        } for c in counts],
+        'minutes': [{
+            'minute': b.minute.isoformat(),
+            'info': b.info_count,
+            'warning': b.warning_count,
+            'critical': b.critical_count
+        } for b in buckets]
+    }
+
+def rebuild_rollups(chunk_size=5000):
+    """
+    Recompute all rollups from the raw proctoring logs, e.g. for logs written
+    before the rollup tables existed. Returns the number of logs read.
+    """
+    ProctoringEventCount.query.delete(synchronize_session=False)
+    ProctoringMinuteBucket.query.delete(synchronize_session=False)
+    
+    columns = (ProctoringLog.id, ProctoringLog.session_id, ProctoringLog.event_type,
+               ProctoringLog.timestamp, ProctoringLog.severity)
+    total = 0
+    last_id = 0
+    while True:
+        chunk = db.session.query(*columns).filter(ProctoringLog.id > last_id) \
+            .order_by(ProctoringLog.id).limit(chunk_size).all()
+        if not chunk:
+            break
+        update_rollups([row._asdict() for row in chunk])
+        last_id = chunk[-1].id
+        total += len(chunk)
+    
+    db.session.commit()
+    return total
+
+class ProctoringBuffer:
+    """
+    Bounded in-process buffer of proctoring events.
+    Events are written in bulk when PROCTORING_FLUSH_SIZE events are waiting
+    or every PROCTORING_FLUSH_INTERVAL seconds. When PROCTORING_BUFFER_MAX_EVENTS
+    are already waiting, offer() refuses new events so callers can apply
+    backpressure instead of growing memory.
+    """
+    
+    def __init__(self, app, max_events, flush_size, flush_interval):
+        self.app = app
+        self.max_events = max_events
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+    
+    def offer(self, rows):
+        """Buffer a batch of rows. Returns False, buffering nothing, if the buffer is full."""
+        with self._lock:
+            if len(self._rows) + len(rows) > self.max_events:
+                self.rejected += len(rows)
+                return False
+            self._rows.extend(rows)
+            self.accepted += len(rows)
+            ready = len(self._rows) >= self.flush_size
+        if ready:
+            self._wakeup.set()
+        return True
+    
+    def flush(self):
+        """Write everything buffered. Must run inside an application context."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        
+        written = 0
+        done = 0  # rows written or dropped
+        try:
+            while done < len(rows):
+                chunk = rows[done:done + self.flush_size]
+                try:
+                    bulk_insert_logs(chunk)
+                    db.session.commit()
+                    written += len(chunk)
+                    done += len(chunk)
+                except (IntegrityError, DataError):
+                    db.session.rollback()
+                    # Write the chunk row by row so the events the database rejects
+                    # are dropped instead of failing the same batch on every flush
+                    for row in chunk:
+                        try:
+                            bulk_insert_logs([row])
+                            db.session.commit()
+                            written += 1
+                        except (IntegrityError, DataError) as e:
+                            db.session.rollback()
+                            self.app.logger.error(
+                                f"Dropped proctoring event {row['event_type']} "
+                                f"of session {row['session_id']}: {str(e)}"
+                            )
+                        done += 1
+        except Exception:
+            db.session.rollback()
+            # Requeue what was not written, as far as capacity allows
+            remaining = rows[done:]
+            with self._lock:
+                room = max(0, self.max_events - len(self._rows))
+                self._rows[:0] = remaining[:room]
+                dropped = len(remaining) - room
+            if dropped > 0:
+                self.app.logger.error(f"Dropped {dropped} proctoring events after a failed flush")
+            raise
+        finally:
+            with self._lock:
+                self.written += written
+        
+        return written
+    
+    def stats(self):
+        """Buffer depth and event counters."""
+        with self._lock:
+            return {
+                'buffered': len(self._rows),
+                'capacity': self.max_events,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'written': self.written
+            }
+    
+    def start(self):
+        """Start the background flusher."""
+        self._thread = threading.Thread(target=self._run, name='proctoring-flusher', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        """Stop the flusher after writing everything still buffered."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    self.app.logger.error(f"Proctoring flush error: {str(e)}")
+                finally:
+                    db.session.remove()
+            if self._stop.is_set():
+                break
+
+class DirectProctoring:
+    """Ingestion without a buffer: each batch is written and committed in the request."""
+    
+    def offer(self, rows):
+        """Write the batch now. Always accepts it."""
+        bulk_insert_logs(rows)
+        db.session.commit()
+        return True
+
+def get_proctoring_buffer():
+    """
+    Return the proctoring buffer of the current application, or a
+    DirectProctoring if it runs without background services.
+    """
+    buffer = current_app.extensions.get('proctoring_buffer')
+    return buffer if buffer is not None else DirectProctoring()
+
+def init_app(app):
+    """Create the proctoring event buffer and start its flusher thread."""
+    buffer = ProctoringBuffer(
+        app,
+        app.config['PROCTORING_BUFFER_MAX_EVENTS'],
+        app.config['PROCTORING_FLUSH_SIZE'],
+        app.config['PROCTORING_FLUSH_INTERVAL']
+    )
+    buffer.start()
+    app.extensions['proctoring_buffer'] = buffer
+    return buffer
@@ -0,0 +1,250 @@
+import string
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from ..models import PooledQuestion, QuestionPoolTopic, db
+from .ai_models import get_question_generator
+
+QUESTION_TYPES = ('multiple_choice', 'essay')
+
+# Length of QuestionPoolTopic.topic
+MAX_TOPIC_LENGTH = 200
+
+def normalize_topic(topic):
+    """
+    Canonical form of a topic, so spellings that differ only in case, Unicode
+    form, invisible characters, whitespace or surrounding punctuation share
+    one pool.
+    Raises ValueError for empty or overlong topics.
+    """
+    if not isinstance(topic, str):
+        raise ValueError('Topic must be a string')
+    # Invisible format characters (soft hyphens, zero-width spaces) are dropped
+    topic = ''.join(ch for ch in unicodedata.normalize('NFKC', topic) if unicodedata.category(ch) != 'Cf')
+    topic = ' '.join(topic.casefold().split()).strip(string.punctuation + ' ')
+    if not topic:
+        raise ValueError('Topic must not be empty')
+    if len(topic) > MAX_TOPIC_LENGTH:
+        raise ValueError(f'Topic must be at most {MAX_TOPIC_LENGTH} characters')
+    return topic
+
+def register_topic(topic, question_type):
+    """
+    Return the pool topic row, creating it so the filler starts keeping it
+    stocked until the topic goes unrequested for QUESTION_POOL_TOPIC_TTL.
+    """
+    if question_type not in QUESTION_TYPES:
+        raise ValueError(f'Invalid question type: {question_type}')
+    topic = normalize_topic(topic)
+    pool_topic = QuestionPoolTopic.query.filter_by(topic=topic, question_type=question_type).first()
+    if pool_topic is None:
+        try:
+            with db.session.begin_nested():
+                pool_topic = QuestionPoolTopic(topic=topic, question_type=question_type)
+                db.session.add(pool_topic)
+        except IntegrityError:
+            # Registered concurrently by another process
+            pool_topic = QuestionPoolTopic.query.filter_by(topic=topic, question_type=question_type).first()
+    return pool_topic
+
+def take_question(topic, question_type, filler=None):
+    """
+    Take a ready question from the pool.
+    Returns the generated question dict, or None on a pool miss. The removal
+    is part of the caller's transaction, so it is undone if the caller rolls back.
+    On a miss the topic registration and counters are committed here, so no
+    write lock is held while the caller generates a question live.
+    """
+    pool_topic = register_topic(topic, question_type)
+    
+    candidates = PooledQuestion.query.filter_by(
+        topic=pool_topic.topic,
+        question_type=question_type
+    ).order_by(PooledQuestion.id).limit(3).all()
+    
+    payload = None
+    for candidate in candidates:
+        # Only the request that deletes the row gets the question
+        if PooledQuestion.query.filter_by(id=candidate.id).delete(synchronize_session=False):
+            payload = candidate.payload
+            break
+    
+    counter = 'hits' if payload is not None else 'misses'
+    QuestionPoolTopic.query.filter_by(id=pool_topic.id).update({
+        counter: getattr(QuestionPoolTopic, counter) + 1,
+        'last_requested_at': datetime.utcnow()
+    }, synchronize_session=False)
+    if payload is None:
+        db.session.commit()
+    
+    if filler is not None:
+        filler.notify()
+    return payload
+
+def refill_topic(pool_topic, target_depth, batch_size):
+    """Top one topic up to `target_depth` with a single batched generation call."""
+    depth = PooledQuestion.query.filter_by(
+        topic=pool_topic.topic,
+        question_type=pool_topic.question_type
+    ).count()
+    needed = target_depth - depth
+    if needed <= 0:
+        return 0
+    
+    start = time.perf_counter()
+    generated = get_question_generator().generate_questions(
+        topics=[pool_topic.topic],
+        count=needed,
+        question_type=pool_topic.question_type,
+        batch_size=batch_size
+    )
+    elapsed = time.perf_counter() - start
+    
+    db.session.execute(PooledQuestion.__table__.insert(), [{
+        'topic': pool_topic.topic,
+        'question_type': pool_topic.question_type,
+        'payload': item,
+        'created_at': datetime.utcnow()
+    } for item in generated])
+    
+    QuestionPoolTopic.query.filter_by(id=pool_topic.id).update({
+        'generated_total': QuestionPoolTopic.generated_total + len(generated),
+        'last_refill_count': len(generated),
+        'last_refill_seconds': elapsed,
+        'last_refill_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return len(generated)
+
+def expire_topics(ttl_seconds, keep=()):
+    """
+    Unregister topics not requested within `ttl_seconds` (counted from their
+    registration if never requested) and delete their pooled questions.
+    Topics in `keep`, the configured QUESTION_POOL_TOPICS, never expire.
+    Returns the number of topics removed; the caller commits.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl_seconds)
+    last_used = db.func.coalesce(QuestionPoolTopic.last_requested_at, QuestionPoolTopic.created_at)
+    keep = {normalize_topic(topic) for topic in keep}
+    
+    stale = db.session.query(QuestionPoolTopic.id, QuestionPoolTopic.topic, QuestionPoolTopic.question_type) \
+        .filter(last_used < cutoff).all()
+    
+    removed = 0
+    for topic_id, topic, question_type in stale:
+        if topic in keep:
+            continue
+        # Conditional, in case the topic was requested since it was read
+        if QuestionPoolTopic.query.filter(QuestionPoolTopic.id == topic_id, last_used < cutoff) \
+                .delete(synchronize_session=False):
+            PooledQuestion.query.filter_by(topic=topic, question_type=question_type) \
+                .delete(synchronize_session=False)
+            removed += 1
+    return removed
+
+def pool_stats():
+    """Per-topic depth, hit/miss and refill-rate statistics."""
+    depths = dict(
+        ((topic, question_type), depth) for topic, question_type, depth in
+        db.session.query(
+            PooledQuestion.topic,
+            PooledQuestion.question_type,
+            db.func.count(PooledQuestion.id)
+        ).group_by(PooledQuestion.topic, PooledQuestion.question_type).all()
+    )
+    
+    stats = []
+    for pool_topic in QuestionPoolTopic.query.order_by(QuestionPoolTopic.topic).all():
+        stats.append({
+            'topic': pool_topic.topic,
+            'question_type': pool_topic.question_type,
+            'depth': depths.get((pool_topic.topic, pool_topic.question_type), 0),
+            'hits': pool_topic.hits,
+            'misses': pool_topic.misses,
+            'generated_total': pool_topic.generated_total,
+            'refill_rate_per_sec': (
+                pool_topic.last_refill_count / pool_topic.last_refill_seconds
+                if pool_topic.last_refill_seconds else None
+            ),
+            'last_refill_at': pool_topic.last_refill_at.isoformat() if pool_topic.last_refill_at else None,
+            'last_requested_at': pool_topic.last_requested_at.isoformat() if pool_topic.last_requested_at else None
+        })
+    return stats
+
+class QuestionPoolFiller:
+    """Background thread that keeps every registered topic stocked with generated questions."""
+    
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the filler thread."""
+        self._thread = threading.Thread(target=self._run, name='question-pool-filler', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        """Signal the filler to exit and wait for it."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def notify(self):
+        """Check the pool depths now instead of at the next interval."""
+        self._wakeup.set()
+    
+    def run_once(self):
+        """Refill every topic whose depth has dropped below the low watermark."""
+        config = self.app.config
+        with self.app.app_context():
+            try:
+                for topic in config['QUESTION_POOL_TOPICS']:
+                    for question_type in QUESTION_TYPES:
+                        register_topic(topic, question_type)
+                
+                # Topics requested once by an admin are not kept stocked forever
+                if config['QUESTION_POOL_TOPIC_TTL'] > 0:
+                    expired = expire_topics(config['QUESTION_POOL_TOPIC_TTL'], keep=config['QUESTION_POOL_TOPICS'])
+                    if expired:
+                        self.app.logger.info(f"Question pool stopped stocking {expired} unrequested topics")
+                db.session.commit()
+                
+                low_watermark = config['QUESTION_POOL_LOW_WATERMARK']
+                for pool_topic in QuestionPoolTopic.query.all():
+                    depth = PooledQuestion.query.filter_by(
+                        topic=pool_topic.topic,
+                        question_type=pool_topic.question_type
+                    ).count()
+                    if depth < low_watermark:
+                        refill_topic(
+                            pool_topic,
+                            config['QUESTION_POOL_TARGET_DEPTH'],
+                            config['GENERATION_BATCH_SIZE']
+                        )
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Question pool refill error: {str(e)}")
+            finally:
+                db.session.remove()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+def init_app(app):
+    """Start the question pool filler if QUESTION_POOL_FILLER is enabled."""
+    if not app.config.get('QUESTION_POOL_FILLER', False):
+        return None
+    
+    filler = QuestionPoolFiller(app, app.config['QUESTION_POOL_REFILL_INTERVAL'])
+    filler.start()
+    app.extensions['question_pool_filler'] = filler
+    return filler
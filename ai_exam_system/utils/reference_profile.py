@@ -0,0 +1,111 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+PROFILE_VERSION = 1
+
+# Key terms kept per reference answer
+MAX_KEY_TERMS = 20
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either else etc even ever
+every few for from further had has have having he her here hers herself him himself his how however
+i if in into is it its itself just least less let like made make many may me might more most much
+must my myself neither no nor not now of off often on once one only or other others otherwise our
+ours ourselves out over own per rather same shall she should since so some such than that the their
+theirs them themselves then there these they this those through thus to too under until up upon us
+used using very via was we well were what when where whether which while who whom whose why will
+with within without would yet you your yours yourself yourselves
+""".split())
+
+def tokenize(text):
+    """Lower-cased word tokens with punctuation stripped."""
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+def content_terms(tokens):
+    """Tokens that can be key terms: no stopwords, numbers or single letters."""
+    return [t for t in tokens if t not in STOPWORDS and len(t) > 1 and not t.isdigit()]
+
+def compile_reference(reference_answer, document_frequencies=None, document_count=0):
+    """
+    Compile a reference answer into the profile used for feedback.
+    Key terms are weighted by term frequency times smoothed inverse document
+    frequency over `document_count` references (the essay questions of the
+    same exam); without them every term has the same IDF.
+    """
+    tokens = tokenize(reference_answer)
+    frequencies = Counter(content_terms(tokens))
+    document_frequencies = document_frequencies or {}
+    
+    weights = {
+        term: count * (math.log((1 + document_count) / (1 + document_frequencies.get(term, 0))) + 1)
+        for term, count in frequencies.items()
+    }
+    # Heaviest first; ties keep the order in which terms appear in the reference
+    first_seen = {term: i for i, term in reversed(list(enumerate(tokens)))}
+    key_terms = sorted(weights, key=lambda term: (-weights[term], first_seen[term]))[:MAX_KEY_TERMS]
+    
+    return {
+        'version': PROFILE_VERSION,
+        'word_count': len((reference_answer or '').split()),
+        'key_terms': [[term, round(weights[term], 4)] for term in key_terms]
+    }
+
+def compile_references(reference_answers):
+    """Compile the references of one exam together, sharing their IDF statistics."""
+    document_frequencies = Counter()
+    for reference_answer in reference_answers:
+        document_frequencies.update(set(content_terms(tokenize(reference_answer))))
+    
+    return [
+        compile_reference(reference_answer, document_frequencies, len(reference_answers))
+        for reference_answer in reference_answers
+    ]
+
+def compile_exam_references(exam_id):
+    """
+    (Re)compile the reference profiles of all essay questions of an exam.
+    Called whenever essay questions are stored, since a new reference changes
+    the IDF of the others. New questions must be flushed; the caller commits.
+    """
+    from ..models import Question
+    
+    questions = Question.query.filter_by(exam_id=exam_id, question_type='essay') \
+        .order_by(Question.id).all()
+    profiles = compile_references([q.correct_answer or '' for q in questions])
+    for question, profile in zip(questions, profiles):
+        question.reference_profile = profile
+
+class ReferenceProfileCache:
+    """LRU of profiles compiled on demand for references without a stored profile."""
+    
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, reference_answer):
+        with self._lock:
+            profile = self._entries.get(reference_answer)
+            if profile is not None:
+                self._entries.move_to_end(reference_answer)
+                return profile
+        
+        profile = compile_reference(reference_answer)
+        with self._lock:
+            self._entries[reference_answer] = profile
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile
+
+_profile_cache = ReferenceProfileCache()
+
+def get_reference_profile(reference_answer, stored_profile=None):
+    """The stored profile of a question if it is current, else a cached compiled one."""
+    if stored_profile and stored_profile.get('version') == PROFILE_VERSION:
+        return stored_profile
+    return _profile_cache.get(reference_answer or '')
@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from flask import current_app
+from ..models import Answer, ExamSession, Question, RegradeRun, db
+
+# Per-process state of the re-grade workers
+_worker_app = None
+_worker_grader = None
+_worker_batch_size = 8
+
+def init_worker(batch_size):
+    """
+    Process pool initializer: build an app without background services and
+    load the grading model once for every chunk this process will grade.
+    """
+    global _worker_app, _worker_grader, _worker_batch_size
+    # No flushers, pool filler, reaper or grading pool, and only the model this worker uses
+    os.environ['BACKGROUND_SERVICES'] = 'false'
+    os.environ['PRELOAD_MODELS'] = 'false'
+    
+    from ..app import create_app
+    from .ai_models import EssayGrader
+    
+    _worker_app = create_app()
+    # Workers only compute; every write goes through the parent process
+    _worker_app.config['GRADING_CACHE_ENABLED'] = False
+    with _worker_app.app_context():
+        _worker_grader = EssayGrader()
+    _worker_batch_size = batch_size
+
+def grade_chunk(items):
+    """Grade (answer_id, essay_text, reference_answer, profile) items; returns (answer_id, score, feedback)."""
+    with _worker_app.app_context():
+        results = _worker_grader.grade_essays(
+            [(essay_text, reference_answer) for _, essay_text, reference_answer, _ in items],
+            batch_size=_worker_batch_size,
+            profiles=[profile for _, _, _, profile in items]
+        )
+    return [(item[0], score, feedback) for item, (score, feedback) in zip(items, results)]
+
+def answers_query(run):
+    """Essay answers covered by a re-grade run, in id order."""
+    query = db.session.query(
+        Answer.id, Answer.answer_text, Question.correct_answer, Question.reference_profile
+    ).join(Question, Answer.question_id == Question.id) \
+        .join(ExamSession, Answer.session_id == ExamSession.id) \
+        .filter(Question.question_type == 'essay')
+    
+    if run.exam_id is not None:
+        query = query.filter(ExamSession.exam_id == run.exam_id)
+    if run.since is not None:
+        query = query.filter(ExamSession.start_time >= run.since)
+    if run.until is not None:
+        query = query.filter(ExamSession.start_time < run.until)
+    return query
+
+def start_run(exam_id=None, since=None, until=None, restart=False):
+    """
+    Return the unfinished run for the same model and selection, or a new one.
+    With `restart`, unfinished runs are abandoned and a new run starts at the
+    first answer.
+    """
+    model_id = current_app.config['BERT_MODEL_PATH']
+    run = RegradeRun.query.filter_by(
+        model_id=model_id, exam_id=exam_id, since=since, until=until, status='running'
+    ).order_by(RegradeRun.id.desc()).first()
+    
+    if run is not None and restart:
+        run.status = 'abandoned'
+        run = None
+    
+    if run is None:
+        run = RegradeRun(model_id=model_id, exam_id=exam_id, since=since, until=until, status='running')
+        run.total = answers_query(run).count()
+        db.session.add(run)
+    else:
+        # Chunks written past the checkpoint before the interruption are graded again
+        run.processed = answers_query(run).filter(Answer.id <= run.last_answer_id).count()
+    db.session.commit()
+    return run
+
+def regrade(run, workers=None, batch_size=None, chunk_size=None, report=None):
+    """
+    Re-grade the answers of `run` from its checkpoint across a process pool.
+    Chunks are read in answer id order and graded in parallel; each finished
+    chunk is written with one bulk update. The checkpoint only advances over
+    chunks that are all written, so an interrupted run resumes without
+    skipping answers (at worst a few chunks are graded twice).
+    `report` is called with a progress dict after every chunk.
+    """
+    config = current_app.config
+    workers = workers or config['REGRADE_WORKERS']
+    batch_size = batch_size or config['GRADING_BATCH_SIZE']
+    chunk_size = chunk_size or config['REGRADE_CHUNK_SIZE']
+    
+    query = answers_query(run)
+    last_read_id = run.last_answer_id
+    in_flight = {}     # future -> last answer id of its chunk
+    pending_ids = []   # last answer ids of unwritten chunks, in read order
+    written_ids = set()
+    exhausted = False
+    graded = 0
+    start = time.perf_counter()
+    
+    def read_chunk():
+        nonlocal last_read_id, exhausted
+        rows = query.filter(Answer.id > last_read_id).order_by(Answer.id).limit(chunk_size).all()
+        if not rows:
+            exhausted = True
+            return None
+        last_read_id = rows[-1].id
+        return [(row.id, row.answer_text or '', row.correct_answer or '', row.reference_profile) for row in rows]
+    
+    # Spawned workers do not inherit the app's background threads or DB connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(batch_size,)) as executor:
+        while True:
+            # Keep every worker busy with one chunk queued behind it
+            while not exhausted and len(in_flight) < workers * 2:
+                items = read_chunk()
+                if items is None:
+                    break
+                in_flight[executor.submit(grade_chunk, items)] = last_read_id
+                pending_ids.append(last_read_id)
+            
+            if not in_flight:
+                break
+            
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_last_id = in_flight.pop(future)
+                results = future.result()
+                
+                db.session.bulk_update_mappings(Answer, [
+                    {'id': answer_id, 'score': score, 'feedback': feedback}
+                    for answer_id, score, feedback in results
+                ])
+                written_ids.add(chunk_last_id)
+                graded += len(results)
+                
+                # Advance the checkpoint over the contiguous run of written chunks
+                while pending_ids and pending_ids[0] in written_ids:
+                    written_ids.discard(pending_ids[0])
+                    run.last_answer_id = pending_ids.pop(0)
+                
+                run.processed += len(results)
+                run.updated_at = datetime.utcnow()
+                db.session.commit()
+                
+                if report is not None:
+                    elapsed = time.perf_counter() - start
+                    rate = graded / elapsed if elapsed > 0 else 0.0
+                    remaining = max(0, run.total - run.processed)
+                    report({
+                        'processed': run.processed,
+                        'total': run.total,
+                        'essays_per_second': rate,
+                        'eta_seconds': remaining / rate if rate > 0 else None
+                    })
+    
+    run.status = 'completed'
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    
+    elapsed = time.perf_counter() - start
+    return {
+        'run_id': run.id,
+        'graded': graded,
+        'processed': run.processed,
+        'total': run.total,
+        'wall_seconds': elapsed,
+        'essays_per_second': graded / elapsed if elapsed > 0 else 0.0,
+        'workers': workers
+    }
@@ -0,0 +1,223 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from ..models import Exam, ExamSession, GradingJob, db
+from .autosave import get_autosave_buffer
+from .grading_queue import notify_workers
+
+def session_deadline(start_time, duration_minutes):
+    """When a session started at `start_time` runs out of time."""
+    return start_time + timedelta(minutes=duration_minutes)
+
+def time_is_up(session, now=None):
+    """
+    Return the deadline of an exam session if it has passed, counting
+    SESSION_EXPIRY_GRACE for requests sent just before it, otherwise None.
+    """
+    deadline = session_deadline(session.start_time, session.exam.duration_minutes)
+    grace = timedelta(seconds=current_app.config['SESSION_EXPIRY_GRACE'])
+    return deadline if (now or datetime.utcnow()) > deadline + grace else None
+
+def expire_sessions(deadlines):
+    """
+    Finalize timed-out sessions like a submission without new answers:
+    buffered autosaves are written, the session is completed at its deadline
+    and its essays are queued for grading.
+    `deadlines` maps session id to deadline. Sessions submitted in the
+    meantime, or finalized by another process, are skipped.
+    Returns the ids of the sessions finalized here.
+    """
+    if not deadlines:
+        return []
+    
+    get_autosave_buffer().flush(session_ids=set(deadlines))
+    
+    # One conditional UPDATE for the batch; RETURNING tells which sessions this
+    # process won against a concurrent submit or another process's reaper
+    table = ExamSession.__table__
+    expired = [session_id for (session_id,) in db.session.execute(
+        table.update()
+        .where(table.c.id.in_(list(deadlines)), table.c.status == 'in_progress')
+        .values(status='completed', end_time=db.case(deadlines, value=table.c.id))
+        .returning(table.c.id)
+    )]
+    
+    if expired:
+        db.session.bulk_insert_mappings(GradingJob, [
+            {'session_id': session_id, 'status': 'pending'} for session_id in expired
+        ])
+    db.session.commit()
+    
+    if expired:
+        notify_workers()
+    return expired
+
+class SessionReaper:
+    """
+    Background thread that finalizes exam sessions once their time is up.
+    Deadlines of in-progress sessions are kept in a min-heap, so each start
+    and expiry costs O(log n) and the thread sleeps until the earliest
+    deadline. The heap is rebuilt from the database at startup; afterwards
+    only sessions with an id above the highest one seen are read, which also
+    picks up sessions started by other processes. Ids can commit out of
+    order, so in-progress sessions started within `rescan_seconds` are read
+    again as well.
+    """
+    
+    def __init__(self, app, grace_seconds, poll_interval, batch_size, rescan_seconds=300):
+        self.app = app
+        self.grace = timedelta(seconds=grace_seconds)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.rescan = timedelta(seconds=rescan_seconds)
+        self._heap = []         # (deadline, session_id)
+        self._scheduled = set()
+        self._last_session_id = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def schedule(self, session_id, deadline):
+        """Track a session that runs out of time at `deadline`."""
+        with self._lock:
+            if session_id in self._scheduled:
+                return
+            self._scheduled.add(session_id)
+            heapq.heappush(self._heap, (deadline + self.grace, session_id))
+            earliest = self._heap[0][1] == session_id
+        if earliest:
+            self._wakeup.set()
+    
+    def pending_count(self):
+        """Number of sessions waiting for their deadline."""
+        with self._lock:
+            return len(self._heap)
+    
+    def rebuild(self):
+        """Replace the heap with the deadlines of all in-progress sessions. Must run inside an application context."""
+        last_session_id = db.session.query(db.func.max(ExamSession.id)).scalar() or 0
+        rows = db.session.query(ExamSession.id, ExamSession.start_time, Exam.duration_minutes) \
+            .join(Exam, ExamSession.exam_id == Exam.id) \
+            .filter(ExamSession.status == 'in_progress', ExamSession.id <= last_session_id).all()
+        
+        heap = [
+            (session_deadline(start_time, duration_minutes) + self.grace, session_id)
+            for session_id, start_time, duration_minutes in rows
+        ]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap = heap
+            self._scheduled = {session_id for _, session_id in heap}
+            self._last_session_id = last_session_id
+        return len(heap)
+    
+    def poll_new_sessions(self, now=None):
+        """
+        Schedule sessions started since the last look: those above the highest
+        id seen, and in-progress ones started within the rescan window, which
+        catches a lower id committed after a higher one. Sessions already
+        tracked are skipped. Must run inside an application context.
+        """
+        rescan_after = (now or datetime.utcnow()) - self.rescan
+        # No ORDER BY, so each branch of the OR is served by its own index
+        rows = db.session.query(ExamSession.id, ExamSession.start_time, ExamSession.status, Exam.duration_minutes) \
+            .join(Exam, ExamSession.exam_id == Exam.id) \
+            .filter(db.or_(
+                ExamSession.id > self._last_session_id,
+                db.and_(ExamSession.status == 'in_progress', ExamSession.start_time >= rescan_after)
+            )).all()
+        
+        for session_id, start_time, status, duration_minutes in rows:
+            if status == 'in_progress':
+                self.schedule(session_id, session_deadline(start_time, duration_minutes))
+        if rows:
+            self._last_session_id = max(self._last_session_id, max(row[0] for row in rows))
+    
+    def pop_expired(self, now):
+        """Remove and return up to batch_size {session_id: deadline} whose deadline has passed."""
+        expired = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(expired) < self.batch_size:
+                deadline, session_id = heapq.heappop(self._heap)
+                self._scheduled.discard(session_id)
+                expired[session_id] = deadline - self.grace
+        return expired
+    
+    def seconds_until_next(self, now):
+        """Seconds until the earliest deadline, or None if no session is tracked."""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, (self._heap[0][0] - now).total_seconds())
+    
+    def start(self):
+        """Start the reaper thread."""
+        self._thread = threading.Thread(target=self._run, name='session-reaper', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        """Signal the reaper to exit and wait for it."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _run_once(self):
+        with self.app.app_context():
+            try:
+                if self._last_session_id is None:
+                    count = self.rebuild()
+                    self.app.logger.info(f"Session reaper tracking {count} in-progress sessions")
+                else:
+                    self.poll_new_sessions()
+                
+                while not self._stop.is_set():
+                    expired = self.pop_expired(datetime.utcnow())
+                    if not expired:
+                        break
+                    try:
+                        finalized = expire_sessions(expired)
+                    except Exception:
+                        db.session.rollback()
+                        # Retry these sessions on the next pass
+                        for session_id, deadline in expired.items():
+                            self.schedule(session_id, deadline)
+                        raise
+                    if finalized:
+                        self.app.logger.info(f"Session reaper finalized {len(finalized)} timed-out sessions")
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Session reaper error: {str(e)}")
+            finally:
+                db.session.remove()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._run_once()
+            wait = self.seconds_until_next(datetime.utcnow())
+            self._wakeup.wait(self.poll_interval if wait is None else min(wait, self.poll_interval))
+            self._wakeup.clear()
+
+def schedule_session(session, duration_minutes):
+    """Hand a newly started session to this process's reaper without waiting for its next poll."""
+    reaper = current_app.extensions.get('session_reaper')
+    if reaper is not None:
+        reaper.schedule(session.id, session_deadline(session.start_time, duration_minutes))
+
+def init_app(app):
+    """Start the session reaper if SESSION_REAPER is enabled, which it should be in one process only."""
+    if not app.config.get('SESSION_REAPER', False):
+        return None
+    
+    reaper = SessionReaper(
+        app,
+        app.config['SESSION_EXPIRY_GRACE'],
+        app.config['SESSION_REAPER_POLL_INTERVAL'],
+        app.config['SESSION_REAPER_BATCH_SIZE'],
+        app.config['SESSION_REAPER_RESCAN_SECONDS']
+    )
+    reaper.start()
+    app.extensions['session_reaper'] = reaper
+    return reaper
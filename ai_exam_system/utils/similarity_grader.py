@@ -0,0 +1,202 @@
+import threading
+from collections import OrderedDict
+from flask import current_app
+from .ai_models import FeedbackGenerator, get_essay_grader
+from .grading_cache import get_grading_cache, normalize_text
+from .metrics import timed
+
+# Grading modes (Config.GRADING_MODE):
+#   'model'      - every essay goes through the EssayGrader cross-encoder
+#   'similarity' - scores come from embedding similarity to the reference
+#   'triage'     - similarity first; essays close to a score boundary are
+#                  re-graded by the EssayGrader
+GRADING_MODES = ('model', 'similarity', 'triage')
+
+class SimilarityGrader(FeedbackGenerator):
+    """
+    Fast essay grading by cosine similarity between sentence embeddings of the
+    essay and of the question's reference answer. Reference embeddings are
+    computed once and kept in an LRU.
+    """
+    
+    def __init__(self):
+        """Initialize the sentence embedding model and tokenizer."""
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+            
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            self.tokenizer = AutoTokenizer.from_pretrained(current_app.config['SIMILARITY_MODEL_PATH'])
+            self.model = AutoModel.from_pretrained(current_app.config['SIMILARITY_MODEL_PATH']).to(self.device)
+            self.model.eval()
+            
+            self.max_references = current_app.config['SIMILARITY_REFERENCE_CACHE_SIZE']
+            self._references = OrderedDict()
+            self._lock = threading.Lock()
+            self.cache = get_grading_cache() if current_app.config['GRADING_CACHE_ENABLED'] else None
+        except Exception as e:
+            raise Exception(f"Error initializing similarity model: {str(e)}")
+    
+    def embed(self, texts, batch_size=32):
+        """Mean-pooled, L2-normalized embeddings as a NumPy array of shape (len(texts), dim)."""
+        try:
+            import numpy as np
+            import torch
+            
+            # Sort by length so similar-sized texts share a batch
+            order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+            embeddings = None
+            for start in range(0, len(order), batch_size):
+                batch_indices = order[start:start + batch_size]
+                with timed('similarity_grader', 'preprocess'):
+                    encoded = self.tokenizer(
+                        [texts[i] for i in batch_indices],
+                        max_length=512,
+                        padding='longest',
+                        truncation=True,
+                        return_tensors='pt'
+                    ).to(self.device)
+                
+                with timed('similarity_grader', 'forward'), torch.no_grad():
+                    hidden = self.model(**encoded).last_hidden_state
+                    mask = encoded['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                    pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                    pooled = torch.nn.functional.normalize(pooled, dim=1).float().cpu().numpy()
+                
+                if embeddings is None:
+                    embeddings = np.zeros((len(texts), pooled.shape[1]), dtype=np.float32)
+                embeddings[batch_indices] = pooled
+            
+            return embeddings
+        
+        except Exception as e:
+            raise Exception(f"Error embedding texts: {str(e)}")
+    
+    def reference_embeddings(self, reference_answers):
+        """Embeddings of reference answers; only references not seen before are embedded."""
+        import numpy as np
+        
+        keys = [normalize_text(reference_answer) for reference_answer in reference_answers]
+        with self._lock:
+            known = {key: self._references[key] for key in set(keys) if key in self._references}
+            for key in known:
+                self._references.move_to_end(key)
+        
+        missing = sorted(set(keys) - set(known))
+        if missing:
+            for key, vector in zip(missing, self.embed(missing)):
+                known[key] = vector
+            with self._lock:
+                for key in missing:
+                    self._references[key] = known[key]
+                while len(self._references) > self.max_references:
+                    self._references.popitem(last=False)
+        
+        return np.stack([known[key] for key in keys])
+    
+    def similarities(self, pairs, batch_size=32):
+        """Cosine similarity of each (essay_text, reference_answer) pair."""
+        import numpy as np
+        
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        
+        essays = self.embed([essay_text for essay_text, _ in pairs], batch_size=batch_size)
+        references = self.reference_embeddings([reference_answer for _, reference_answer in pairs])
+        # Both sides are normalized, so the row-wise dot product is the cosine
+        return np.einsum('ij,ij->i', essays, references)
+    
+    def grade_essays(self, pairs, batch_size=32, profiles=None, thresholds=None):
+        """
+        Grade essays from their similarity to the reference answer.
+        `thresholds` optionally gives each question's four ascending similarity
+        cut-offs for scores 2-5 (default SIMILARITY_THRESHOLDS).
+        Returns a list of (score, feedback, similarity) tuples in the order of `pairs`.
+        """
+        try:
+            similarities = self.similarities(pairs, batch_size=batch_size)
+            scores = similarity_scores(similarities, resolve_thresholds(thresholds, len(pairs)))
+            
+            scores = scores.tolist()
+            with timed('similarity_grader', 'feedback'):
+                feedbacks = self.generate_feedbacks([
+                    (score, essay_text, reference_answer, profiles[i] if profiles else None)
+                    for i, (score, (essay_text, reference_answer)) in enumerate(zip(scores, pairs))
+                ])
+            return list(zip(scores, feedbacks, similarities.tolist()))
+        
+        except Exception as e:
+            raise Exception(f"Error grading essays by similarity: {str(e)}")
+
+def resolve_thresholds(thresholds, count):
+    """(count, 4) array of cut-offs, using SIMILARITY_THRESHOLDS where a question has none."""
+    import numpy as np
+    
+    default = current_app.config['SIMILARITY_THRESHOLDS']
+    thresholds = thresholds or [None] * count
+    return np.array([t or default for t in thresholds], dtype=np.float32).reshape(count, 4)
+
+def similarity_scores(similarities, thresholds):
+    """Map similarities onto the 1-5 scale: one point per cut-off reached."""
+    return 1 + (similarities[:, None] >= thresholds).sum(axis=1)
+
+def validate_thresholds(thresholds):
+    """Return thresholds as four ascending floats in [-1, 1] or raise ValueError."""
+    if not isinstance(thresholds, list) or len(thresholds) != 4:
+        raise ValueError('similarity_thresholds must be a list of 4 numbers')
+    thresholds = [float(t) for t in thresholds]
+    if any(t < -1 or t > 1 for t in thresholds) or thresholds != sorted(thresholds):
+        raise ValueError('similarity_thresholds must be ascending values between -1 and 1')
+    return thresholds
+
+def grade_answers(pairs, profiles=None, thresholds=None, batch_size=8):
+    """
+    Grade (essay_text, reference_answer) pairs with the configured GRADING_MODE.
+    In 'triage' mode only essays whose similarity lies within
+    SIMILARITY_TRIAGE_MARGIN of a score boundary are sent to the EssayGrader.
+    Returns a list of (score, feedback) tuples in the order of `pairs`.
+    """
+    import numpy as np
+    
+    mode = current_app.config['GRADING_MODE']
+    if mode not in GRADING_MODES:
+        raise ValueError(f"Unknown grading mode '{mode}', expected one of: {', '.join(GRADING_MODES)}")
+    
+    if mode == 'model' or not pairs:
+        return get_essay_grader().grade_essays(pairs, batch_size=batch_size, profiles=profiles)
+    
+    grader = get_similarity_grader()
+    graded = grader.grade_essays(pairs, profiles=profiles, thresholds=thresholds)
+    results = [(score, feedback) for score, feedback, _ in graded]
+    
+    if mode == 'triage':
+        similarities = np.array([similarity for _, _, similarity in graded], dtype=np.float32)
+        cutoffs = resolve_thresholds(thresholds, len(pairs))
+        distance = np.abs(similarities[:, None] - cutoffs).min(axis=1)
+        borderline = np.flatnonzero(distance < current_app.config['SIMILARITY_TRIAGE_MARGIN']).tolist()
+        
+        if borderline:
+            regraded = get_essay_grader().grade_essays(
+                [pairs[i] for i in borderline],
+                batch_size=batch_size,
+                profiles=[profiles[i] for i in borderline] if profiles else None
+            )
+            for i, result in zip(borderline, regraded):
+                results[i] = result
+        
+        current_app.logger.info(f"Triage graded {len(pairs)} essays, {len(borderline)} sent to the full model")
+    
+    return results
+
+# Singleton instance
+similarity_grader = None
+_similarity_lock = threading.Lock()
+
+def get_similarity_grader():
+    """Get or create the SimilarityGrader instance."""
+    global similarity_grader
+    if similarity_grader is None:
+        with _similarity_lock:
+            if similarity_grader is None:
+                similarity_grader = SimilarityGrader()
+    return similarity_grader
@@ -0,0 +1,152 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from ..models import ExamSession, ProctoringVideo, db
+from .face_detection import analyze_segment, init_worker, probe_duration
+from .proctoring import bulk_insert_logs
+
+# Event and severity recorded for a stretch of frames with this many faces
+FACE_EVENTS = {
+    0: ('no_face', 'warning'),
+    1: ('face_detected', 'info'),
+    2: ('multiple_faces', 'critical')
+}
+
+def pending_videos(session_id=None, video_id=None):
+    """Completed uploads that have not been analysed yet."""
+    query = ProctoringVideo.query.filter(
+        ProctoringVideo.status == 'completed',
+        ProctoringVideo.analyzed_at.is_(None)
+    )
+    if session_id is not None:
+        query = query.filter(ProctoringVideo.session_id == session_id)
+    if video_id is not None:
+        query = query.filter(ProctoringVideo.id == video_id)
+    return query.order_by(ProctoringVideo.id).all()
+
+def split_segments(path, segment_seconds, sample_fps):
+    """Analysis tasks for one video, one per segment of `segment_seconds`."""
+    duration = probe_duration(path)
+    if duration is None:
+        # Unknown length: a single worker reads the whole file
+        return [(path, 0.0, None, sample_fps)]
+    
+    tasks = []
+    start = 0.0
+    while start < duration:
+        end = min(start + segment_seconds, duration)
+        tasks.append((path, start, end, sample_fps))
+        start = end
+    return tasks
+
+def samples_to_logs(video, started_at, samples, sample_fps):
+    """
+    Collapse per-frame face counts into proctoring log rows.
+    Consecutive samples with the same outcome become one event whose
+    timestamp is when that stretch began.
+    """
+    rows = []
+    run = None
+    
+    def close(run):
+        event_type, severity = FACE_EVENTS[run['faces']]
+        rows.append({
+            'session_id': video.session_id,
+            'event_type': event_type,
+            'timestamp': started_at + timedelta(seconds=run['start']),
+            'severity': severity,
+            'details': {
+                'source': 'video_analysis',
+                'video_id': video.id,
+                'offset_seconds': round(run['start'], 2),
+                'duration_seconds': round(run['end'] - run['start'] + 1 / sample_fps, 2),
+                'max_faces': run['max_faces'],
+                'samples': run['samples']
+            }
+        })
+    
+    for offset, faces in samples:
+        bucket = min(faces, 2)
+        if run is not None and run['faces'] == bucket:
+            run['end'] = offset
+            run['samples'] += 1
+            run['max_faces'] = max(run['max_faces'], faces)
+            continue
+        if run is not None:
+            close(run)
+        run = {'faces': bucket, 'start': offset, 'end': offset, 'samples': 1, 'max_faces': faces}
+    
+    if run is not None:
+        close(run)
+    return rows
+
+def analyze_videos(videos, workers=None, sample_fps=None, segment_seconds=None):
+    """
+    Sample frames of the given videos and record face detection events.
+    Segments of all videos are spread over a pool of worker processes.
+    Each video's events are written in bulk and committed as soon as all of its
+    segments are done. Returns a summary including video-seconds analysed per
+    wall-second.
+    """
+    config = current_app.config
+    workers = workers or config['VIDEO_ANALYSIS_WORKERS']
+    sample_fps = sample_fps or config['VIDEO_ANALYSIS_SAMPLE_FPS']
+    segment_seconds = segment_seconds or config['VIDEO_ANALYSIS_SEGMENT_SECONDS']
+    
+    start = time.perf_counter()
+    summary = {'videos': 0, 'failed': 0, 'segments': 0, 'events': 0, 'video_seconds': 0.0}
+    
+    plans = []
+    for video in videos:
+        try:
+            tasks = split_segments(video.storage_path, segment_seconds, sample_fps)
+        except Exception as e:
+            current_app.logger.error(f"Cannot analyse video {video.id}: {str(e)}")
+            summary['failed'] += 1
+            continue
+        plans.append((video, tasks))
+    
+    # Spawned workers do not inherit the app's background threads or DB connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as executor:
+        futures = [(video, [executor.submit(analyze_segment, task) for task in tasks])
+                   for video, tasks in plans]
+        
+        for video, segment_futures in futures:
+            try:
+                samples, seconds = [], 0.0
+                for future in segment_futures:
+                    segment_samples, segment_seconds_covered = future.result()
+                    samples.extend(segment_samples)
+                    seconds += segment_seconds_covered
+                
+                session_start = db.session.query(ExamSession.start_time) \
+                    .filter(ExamSession.id == video.session_id).scalar()
+                rows = samples_to_logs(video, session_start or video.created_at, samples, sample_fps)
+                
+                bulk_insert_logs(rows)
+                video.analyzed_at = datetime.utcnow()
+                video.duration_seconds = seconds
+                db.session.commit()
+                
+                summary['videos'] += 1
+                summary['segments'] += len(segment_futures)
+                summary['events'] += len(rows)
+                summary['video_seconds'] += seconds
+            
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Error analysing video {video.id}: {str(e)}")
+                summary['failed'] += 1
+    
+    elapsed = time.perf_counter() - start
+    summary['wall_seconds'] = elapsed
+    summary['workers'] = workers
+    summary['video_seconds_per_second'] = summary['video_seconds'] / elapsed if elapsed > 0 else 0.0
+    current_app.logger.info(
+        f"Analysed {summary['videos']} videos ({summary['video_seconds']:.0f} video-seconds) "
+        f"in {elapsed:.1f}s: {summary['video_seconds_per_second']:.1f} video-s/s with {workers} workers"
+    )
+    return summary
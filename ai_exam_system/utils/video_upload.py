@@ -0,0 +1,158 @@
+import fcntl
+import hashlib
+import os
+from datetime import datetime
+from flask import current_app
+from ..models import ProctoringVideo, VideoChunk, db
+
+READ_SIZE = 64 * 1024
+
+# Leading bytes of the accepted containers
+VIDEO_SIGNATURES = {
+    'webm': lambda head: head[:4] == b'\x1a\x45\xdf\xa3',  # EBML header
+    'mp4': lambda head: head[4:8] == b'ftyp'
+}
+
+class VideoUploadError(Exception):
+    """Upload request rejected; carries the HTTP status to answer with."""
+    
+    def __init__(self, message, status_code=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.extra = extra
+
+def allowed_extension(filename):
+    """Return the lower-cased extension if it is in ALLOWED_EXTENSIONS, else None."""
+    if '.' not in filename:
+        return None
+    extension = filename.rsplit('.', 1)[1].lower()
+    return extension if extension in current_app.config['ALLOWED_EXTENSIONS'] else None
+
+def create_upload(session, filename, total_size):
+    """Register a new resumable upload for an exam session and create its empty file."""
+    extension = allowed_extension(filename)
+    if extension is None:
+        allowed = ', '.join(sorted(current_app.config['ALLOWED_EXTENSIONS']))
+        raise VideoUploadError(f'File type not allowed, expected one of: {allowed}')
+    
+    if not isinstance(total_size, int) or total_size <= 0:
+        raise VideoUploadError('total_size must be a positive integer')
+    
+    if total_size > current_app.config['MAX_VIDEO_SIZE']:
+        raise VideoUploadError('Video exceeds the maximum allowed size', 413)
+    
+    video = ProctoringVideo(
+        session_id=session.id,
+        filename=os.path.basename(filename)[:255],
+        extension=extension,
+        total_size=total_size,
+        received_bytes=0,
+        status='uploading'
+    )
+    db.session.add(video)
+    db.session.flush()
+    
+    directory = os.path.join(current_app.config['VIDEO_UPLOAD_FOLDER'], f'session_{session.id}')
+    os.makedirs(directory, exist_ok=True)
+    video.storage_path = os.path.join(directory, f'{video.id}.{extension}')
+    open(video.storage_path, 'wb').close()
+    
+    return video
+
+def current_offset(video_id):
+    """Bytes received so far, read from the database rather than a loaded object."""
+    return db.session.query(ProctoringVideo.received_bytes).filter_by(id=video_id).scalar()
+
+def write_chunk(video, offset, stream, content_length=None, expected_sha256=None):
+    """
+    Stream one chunk from `stream` straight into the video file at `offset`.
+    The offset must equal the bytes received so far, so a client resumes by
+    asking for the current offset and sending from there. Limits are checked
+    while reading, never after buffering the whole chunk.
+    An exclusive lock on the file is held from before the first byte is
+    written until the new offset is committed, so a concurrent request for
+    the same upload is rejected with 409 instead of overwriting these bytes.
+    Returns the number of bytes written. Commits.
+    """
+    if video.status != 'uploading':
+        raise VideoUploadError('Upload is already complete', 409, offset=video.received_bytes)
+    
+    if offset != video.received_bytes:
+        raise VideoUploadError('Chunk offset does not match the upload', 409, offset=video.received_bytes)
+    
+    max_chunk = current_app.config['VIDEO_CHUNK_MAX_SIZE']
+    remaining = video.total_size - offset
+    limit = min(max_chunk, remaining)
+    if content_length is not None and content_length > limit:
+        raise VideoUploadError('Chunk is larger than allowed', 413, offset=offset)
+    
+    # The lock is released when the file is closed, also if the process dies
+    with open(video.storage_path, 'r+b') as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise VideoUploadError('Another chunk of this upload is being written', 409, offset=offset)
+        
+        # A request holding the lock before us may have committed this offset already
+        received_bytes = current_offset(video.id)
+        if offset != received_bytes:
+            raise VideoUploadError('Chunk offset does not match the upload', 409, offset=received_bytes)
+        
+        check = VIDEO_SIGNATURES.get(video.extension) if offset == 0 else None
+        head = b''
+        digest = hashlib.sha256()
+        size = 0
+        f.seek(offset)
+        while True:
+            data = stream.read(READ_SIZE)
+            if not data:
+                break
+            size += len(data)
+            if size > limit:
+                raise VideoUploadError('Chunk is larger than allowed', 413, offset=offset)
+            
+            # Reads may return fewer than 8 bytes; collect the header across them
+            if check and len(head) < 8:
+                head += data[:8 - len(head)]
+                if len(head) == 8 and not check(head):
+                    raise VideoUploadError('File content does not match its extension', 415, offset=offset)
+            
+            digest.update(data)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        
+        if size == 0:
+            raise VideoUploadError('Empty chunk', 400, offset=offset)
+        
+        if check and len(head) < 8:
+            raise VideoUploadError('First chunk is too short to identify the file type', 415, offset=offset)
+        
+        sha256 = digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise VideoUploadError('Chunk checksum mismatch', 400, offset=offset)
+        
+        # Conditional as well, for writers that do not share this file lock
+        now = datetime.utcnow()
+        new_offset = offset + size
+        values = {'received_bytes': new_offset, 'updated_at': now}
+        if new_offset == video.total_size:
+            values.update(status='completed', completed_at=now)
+        
+        advanced = ProctoringVideo.query.filter_by(id=video.id, received_bytes=offset) \
+            .update(values, synchronize_session=False)
+        if not advanced:
+            db.session.rollback()
+            raise VideoUploadError('Chunk offset does not match the upload', 409,
+                                   offset=current_offset(video.id))
+        
+        db.session.add(VideoChunk(
+            video_id=video.id,
+            offset=offset,
+            size=size,
+            sha256=sha256,
+            received_at=now
+        ))
+        db.session.commit()
+    return size
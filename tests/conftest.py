@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+# Configuration is read from the environment when ai_exam_system is imported.
+# No background services: their queries would run alongside the tests'
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['GRADING_WORKERS'] = '0'
+os.environ['SESSION_REAPER'] = 'false'
+
+import pytest
+from ai_exam_system.app import create_app
+from ai_exam_system.models import db
+from ai_exam_system.utils import auth
+
+@pytest.fixture
+def app():
+    app = create_app()
+    # Each test starts from an empty database, so cached token versions would be stale
+    auth.principal_cache = None
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,53 @@
+import time
+from ai_exam_system.models import User, db
+from ai_exam_system.utils.auth import PrincipalCache, generate_token
+
+def make_user(username, role):
+    user = User(username=username, email=f'{username}@example.com', role=role)
+    user.set_password('Passw0rd!')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_principal_cache_evicts_oldest_entry_when_full():
+    cache = PrincipalCache(ttl=60, max_entries=2)
+    cache.set(1, 5)
+    cache.set(2, 6)
+    cache.set(3, 7)
+    
+    assert cache.get(1) is None
+    assert cache.get(2) == 6
+    assert cache.get(3) == 7
+
+def test_principal_cache_eviction_of_expired_entries_keeps_new_entry_under_its_own_id():
+    cache = PrincipalCache(ttl=0.05, max_entries=2)
+    cache.set(1, 5)
+    cache.set(2, 6)
+    time.sleep(0.1)
+    cache.ttl = 60
+    cache.set(3, 9)
+    
+    assert cache._entries.keys() == {3}
+    assert cache.get(3) == 9
+    assert cache.get(2) is None
+
+def test_role_change_revokes_tokens_issued_before_it(app, client):
+    admin = make_user('admin', 'admin')
+    other = make_user('other', 'admin')
+    admin_headers = {'Authorization': f'Bearer {generate_token(admin)}'}
+    old_headers = {'Authorization': f'Bearer {generate_token(other)}'}
+    
+    # The old token works and its version is now cached
+    assert client.get('/admin/users', headers=old_headers).status_code == 200
+    
+    response = client.put(f'/admin/users/{other.id}/role', json={'role': 'student'}, headers=admin_headers)
+    assert response.status_code == 200
+    
+    response = client.get('/admin/users', headers=old_headers)
+    assert response.status_code == 401
+    assert 'revoked' in response.get_json()['message']
+    
+    # A token issued after the change carries the new role
+    db.session.refresh(other)
+    new_headers = {'Authorization': f'Bearer {generate_token(other)}'}
+    assert client.get('/admin/users', headers=new_headers).status_code == 403
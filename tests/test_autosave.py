@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from ai_exam_system.models import Answer, Exam, ExamSession, GradingJob, Question, User, db
+from ai_exam_system.utils.auth import generate_token
+from ai_exam_system.utils.autosave import AutosaveBuffer
+from ai_exam_system.utils.session_reaper import expire_sessions
+
+def seed(started_minutes_ago=0):
+    """An exam with one essay question and an in-progress session. Returns (headers, session, question)."""
+    student = User(username='student', email='student@example.com', role='student')
+    student.set_password('Passw0rd!')
+    exam = Exam(title='Exam', description='', duration_minutes=60)
+    question = Question(exam=exam, question_text='Q1', question_type='essay', correct_answer='reference')
+    session = ExamSession(
+        student=student, exam=exam,
+        start_time=datetime.utcnow() - timedelta(minutes=started_minutes_ago)
+    )
+    db.session.add_all([student, exam, question, session])
+    db.session.commit()
+    return {'Authorization': f'Bearer {generate_token(student)}'}, session, question
+
+def other_worker_buffer(app):
+    """An autosave buffer standing in for another process's; its flusher is not started."""
+    return AutosaveBuffer(app, flush_interval=60, max_pending=100)
+
+def stored_answer(session, question):
+    db.session.expire_all()
+    return Answer.query.filter_by(session_id=session.id, question_id=question.id).first()
+
+def test_autosave_buffered_elsewhere_during_submit_is_written(app, client):
+    headers, session, question = seed()
+    buffer = other_worker_buffer(app)
+    buffer.save(session.id, question.id, 'last words')
+    
+    response = client.post(f'/exam/{session.id}/submit', json={}, headers=headers)
+    assert response.status_code == 202
+    
+    assert buffer.flush() == 1
+    assert stored_answer(session, question).answer_text == 'last words'
+    # Another job grades the answer even if the submission's job has already run
+    assert GradingJob.query.filter_by(session_id=session.id).count() == 2
+
+def test_autosave_does_not_replace_answer_sent_with_submission(app, client):
+    headers, session, question = seed()
+    buffer = other_worker_buffer(app)
+    buffer.save(session.id, question.id, 'draft')
+    
+    response = client.post(f'/exam/{session.id}/submit', json={
+        'answers': [{'question_id': question.id, 'answer_text': 'final'}]
+    }, headers=headers)
+    assert response.status_code == 202
+    
+    buffer.flush()
+    assert stored_answer(session, question).answer_text == 'final'
+
+def test_autosave_buffered_elsewhere_during_expiry_is_written(app):
+    # Saved within the grace period after the deadline, which the route accepts
+    _, session, question = seed(started_minutes_ago=60.1)
+    buffer = other_worker_buffer(app)
+    deadline = session.start_time + timedelta(minutes=60)
+    buffer.save(session.id, question.id, 'in time')
+    
+    assert expire_sessions({session.id: deadline}) == [session.id]
+    
+    assert buffer.flush() == 1
+    assert stored_answer(session, question).answer_text == 'in time'
+
+def test_autosave_saved_after_session_ended_is_dropped(app):
+    _, session, question = seed(started_minutes_ago=61)
+    buffer = other_worker_buffer(app)
+    deadline = session.start_time + timedelta(minutes=60)
+    buffer.save(session.id, question.id, 'too late')
+    
+    expire_sessions({session.id: deadline})
+    
+    assert buffer.flush() == 0
+    assert stored_answer(session, question) is None
+
+def test_autosave_without_background_services_writes_directly(app, client):
+    app.extensions.pop('autosave_buffer').stop()
+    headers, session, question = seed()
+    
+    response = client.put(f'/exam/{session.id}/answers/{question.id}', json={'answer_text': 'saved'}, headers=headers)
+    assert response.status_code == 202
+    assert stored_answer(session, question).answer_text == 'saved'
+    
+    response = client.post(f'/exam/{session.id}/submit', json={}, headers=headers)
+    assert response.status_code == 202
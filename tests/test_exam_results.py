@@ -0,0 +1,84 @@
+import threading
+from datetime import datetime
+from sqlalchemy import event
+from ai_exam_system.models import Answer, Exam, ExamSession, Question, User, db
+from ai_exam_system.utils.auth import generate_token
+
+SESSIONS = 30
+
+def seed():
+    """An exam with two questions and SESSIONS answered sessions by different students. Returns the admin."""
+    admin = User(username='admin', email='admin@example.com', role='admin')
+    admin.set_password('Passw0rd!')
+    exam = Exam(title='Exam', description='', duration_minutes=60)
+    questions = [
+        Question(exam=exam, question_text='Q1', question_type='essay', correct_answer='reference'),
+        Question(exam=exam, question_text='Q2', question_type='essay', correct_answer='reference')
+    ]
+    db.session.add_all([admin, exam] + questions)
+    db.session.flush()
+    
+    for i in range(SESSIONS):
+        student = User(username=f'student{i}', email=f'student{i}@example.com', role='student')
+        student.set_password('Passw0rd!')
+        session = ExamSession(student=student, exam_id=exam.id, status='completed', end_time=datetime.utcnow())
+        session.answers = [Answer(question_id=q.id, answer_text=f'answer {i}', score=3) for q in questions]
+        db.session.add(session)
+    db.session.commit()
+    return admin, exam
+
+def count_queries(client, url, headers):
+    """Status, JSON body and number of SQL statements of one request."""
+    count = [0]
+    request_thread = threading.get_ident()
+    
+    def count_query(*args):
+        # Background flushers run on their own threads; the test client serves on this one
+        if threading.get_ident() == request_thread:
+            count[0] += 1
+    
+    event.listen(db.engine, 'after_cursor_execute', count_query)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', count_query)
+    return response.status_code, response.get_json(), count[0]
+
+def test_results_page_query_count_does_not_grow_with_page_size(app, client):
+    admin, exam = seed()
+    headers = {'Authorization': f'Bearer {generate_token(admin)}'}
+    url = f'/admin/exams/{exam.id}/results'
+    
+    # The first request fills the principal cache
+    client.get(f'{url}?limit=1', headers=headers)
+    
+    counts = {}
+    for limit in (1, 5, SESSIONS):
+        status, body, counts[limit] = count_queries(client, f'{url}?limit={limit}', headers)
+        assert status == 200
+        assert len(body['results']) == limit
+        assert all(len(result['answers']) == 2 for result in body['results'])
+    
+    assert len(set(counts.values())) == 1, counts
+
+def test_results_pages_cover_every_session_once(app, client):
+    admin, exam = seed()
+    headers = {'Authorization': f'Bearer {generate_token(admin)}'}
+    
+    seen = []
+    after_session_id = 0
+    while True:
+        response = client.get(
+            f'/admin/exams/{exam.id}/results?limit=7&after_session_id={after_session_id}',
+            headers=headers
+        )
+        assert response.status_code == 200
+        body = response.get_json()
+        seen.extend(result['session_id'] for result in body['results'])
+        if not body['has_more']:
+            assert body['next_after_session_id'] is None
+            break
+        after_session_id = body['next_after_session_id']
+    
+    assert len(seen) == SESSIONS
+    assert seen == sorted(set(seen))
@@ -0,0 +1,108 @@
+import io
+import json
+from datetime import datetime
+from ai_exam_system.models import Exam, ExamSession, ProctoringEventCount, ProctoringLog, User, db
+from ai_exam_system.utils.auth import generate_token
+from ai_exam_system.utils.proctoring import ProctoringBuffer
+
+def seed():
+    """An in-progress session. Returns (headers, events url, session)."""
+    student = User(username='student', email='student@example.com', role='student')
+    student.set_password('Passw0rd!')
+    exam = Exam(title='Exam', description='', duration_minutes=60)
+    session = ExamSession(student=student, exam=exam)
+    db.session.add_all([student, exam, session])
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {generate_token(student)}'}
+    return headers, f'/proctoring/sessions/{session.id}/events', session
+
+def use_buffer(app, max_events=100):
+    """Replace the app's buffer with one whose flusher is not started, so tests flush by hand."""
+    app.extensions.pop('proctoring_buffer').stop()
+    buffer = ProctoringBuffer(app, max_events=max_events, flush_size=10, flush_interval=60)
+    app.extensions['proctoring_buffer'] = buffer
+    return buffer
+
+def test_events_are_buffered_and_written(app, client):
+    headers, url, session = seed()
+    buffer = use_buffer(app)
+    
+    response = client.post(url, json=[{'event_type': 'no_face', 'severity': 'warning'}] * 3, headers=headers)
+    assert response.status_code == 202
+    assert response.get_json()['accepted'] == 3
+    
+    assert buffer.flush() == 3
+    assert ProctoringLog.query.filter_by(session_id=session.id).count() == 3
+    assert ProctoringEventCount.query.filter_by(session_id=session.id).one().event_count == 3
+
+def test_body_over_limit_is_rejected(app, client):
+    headers, url, _ = seed()
+    buffer = use_buffer(app)
+    app.config['PROCTORING_MAX_BODY_SIZE'] = 200
+    
+    response = client.post(url, json=[{'event_type': 'no_face'}] * 20, headers=headers)
+    assert response.status_code == 413
+    assert '200 bytes' in response.get_json()['message']
+    assert buffer.stats()['buffered'] == 0
+
+def test_body_over_limit_without_content_length_is_rejected(app, client):
+    headers, url, _ = seed()
+    use_buffer(app)
+    app.config['PROCTORING_MAX_BODY_SIZE'] = 200
+    body = json.dumps([{'event_type': 'no_face'}] * 20).encode()
+    
+    # A chunked body announces no length; the limit applies while reading it
+    response = client.post(
+        url,
+        input_stream=io.BytesIO(body),
+        headers=dict(headers, **{'Content-Type': 'application/json', 'Transfer-Encoding': 'chunked'}),
+        environ_overrides={'wsgi.input_terminated': True, 'CONTENT_LENGTH': ''}
+    )
+    assert response.status_code == 413
+
+def test_out_of_range_timestamps_are_rejected(app, client):
+    headers, url, _ = seed()
+    buffer = use_buffer(app)
+    
+    for timestamp in (1e20, -1e20, '99999-01-01T00:00:00'):
+        response = client.post(url, json=[{'event_type': 'no_face', 'timestamp': timestamp}], headers=headers)
+        assert response.status_code == 400, timestamp
+        assert 'Invalid timestamp' in response.get_json()['message']
+    assert buffer.stats()['buffered'] == 0
+
+def test_full_buffer_answers_429_with_retry_after(app, client):
+    headers, url, _ = seed()
+    buffer = use_buffer(app, max_events=4)
+    
+    assert client.post(url, json=[{'event_type': 'no_face'}] * 3, headers=headers).status_code == 202
+    response = client.post(url, json=[{'event_type': 'no_face'}] * 2, headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert buffer.stats() == {'buffered': 3, 'capacity': 4, 'accepted': 3, 'rejected': 2, 'written': 0}
+    
+    # Space frees up once the buffer is flushed
+    buffer.flush()
+    assert client.post(url, json=[{'event_type': 'no_face'}] * 2, headers=headers).status_code == 202
+
+def test_flush_drops_only_rows_the_database_rejects(app):
+    _, _, session = seed()
+    buffer = use_buffer(app)
+    row = {'session_id': session.id, 'event_type': 'no_face', 'timestamp': datetime.utcnow(),
+           'details': None, 'severity': 'info'}
+    # NOT NULL session_id: the database rejects this one row
+    rejected = dict(row, session_id=None)
+    assert buffer.offer([row, rejected, row])
+    
+    assert buffer.flush() == 2
+    assert ProctoringLog.query.count() == 2
+    assert buffer.stats()['buffered'] == 0
+    # The rejected row is not retried on the next flush
+    assert buffer.flush() == 0
+
+def test_events_without_background_services_are_written_directly(app, client):
+    headers, url, session = seed()
+    app.extensions.pop('proctoring_buffer').stop()
+    
+    response = client.post(url, json=[{'event_type': 'no_face'}], headers=headers)
+    assert response.status_code == 202
+    assert ProctoringLog.query.filter_by(session_id=session.id).count() == 1
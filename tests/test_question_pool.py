@@ -0,0 +1,22 @@
+from ai_exam_system.models import PooledQuestion, QuestionPoolTopic, db
+from ai_exam_system.utils.question_pool import take_question
+
+def test_pool_miss_is_committed_before_live_generation(app):
+    assert take_question('Photosynthesis', 'essay') is None
+    
+    # Nothing is left open for the caller's generation to hold
+    assert not db.session().in_transaction()
+    db.session.rollback()
+    
+    pool_topic = QuestionPoolTopic.query.filter_by(topic='photosynthesis', question_type='essay').one()
+    assert pool_topic.misses == 1
+
+def test_pool_hit_is_undone_when_caller_rolls_back(app):
+    take_question('photosynthesis', 'essay')
+    db.session.add(PooledQuestion(topic='photosynthesis', question_type='essay', payload={'question_text': 'Q'}))
+    db.session.commit()
+    
+    assert take_question('Photosynthesis', 'essay') == {'question_text': 'Q'}
+    db.session.rollback()
+    
+    assert PooledQuestion.query.count() == 1
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+from ai_exam_system.models import Exam, ExamSession, GradingJob, User, db
+from ai_exam_system.utils.auth import generate_token
+from ai_exam_system.utils.session_reaper import SessionReaper, expire_sessions
+
+def seed():
+    """A student and a 60-minute exam. Returns (headers, student, exam)."""
+    student = User(username='student', email='student@example.com', role='student')
+    student.set_password('Passw0rd!')
+    exam = Exam(title='Exam', description='', duration_minutes=60)
+    db.session.add_all([student, exam])
+    db.session.commit()
+    return {'Authorization': f'Bearer {generate_token(student)}'}, student, exam
+
+def start_session(student, exam, minutes_ago=0, **fields):
+    session = ExamSession(
+        student=student, exam=exam,
+        start_time=datetime.utcnow() - timedelta(minutes=minutes_ago), **fields
+    )
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+def make_reaper(app):
+    # Not started; the tests drive it by hand
+    return SessionReaper(app, grace_seconds=30, poll_interval=5, batch_size=100)
+
+def test_reaper_finalizes_session_at_its_deadline(app):
+    _, student, exam = seed()
+    session = start_session(student, exam, minutes_ago=61)
+    reaper = make_reaper(app)
+    assert reaper.rebuild() == 1
+    
+    expired = reaper.pop_expired(datetime.utcnow())
+    assert list(expired) == [session.id]
+    assert expire_sessions(expired) == [session.id]
+    
+    db.session.expire_all()
+    assert session.status == 'completed'
+    assert session.end_time == session.start_time + timedelta(minutes=60)
+    assert GradingJob.query.filter_by(session_id=session.id).count() == 1
+
+def test_reaper_leaves_sessions_with_time_left(app):
+    _, student, exam = seed()
+    start_session(student, exam, minutes_ago=30)
+    reaper = make_reaper(app)
+    reaper.rebuild()
+    
+    assert reaper.pop_expired(datetime.utcnow()) == {}
+    assert reaper.pending_count() == 1
+
+def test_reaper_picks_up_lower_id_committed_after_higher_one(app):
+    _, student, exam = seed()
+    reaper = make_reaper(app)
+    start_session(student, exam, id=2)
+    reaper.rebuild()
+    
+    # Id 1 was allocated first but its transaction committed last
+    start_session(student, exam, id=1)
+    reaper.poll_new_sessions()
+    
+    assert reaper.pending_count() == 2
+    reaper.poll_new_sessions()
+    assert reaper.pending_count() == 2
+
+def test_submit_after_expiry_is_rejected(app, client):
+    headers, student, exam = seed()
+    # Past the deadline but within the grace period, so the route would still accept a submit
+    session = start_session(student, exam, minutes_ago=60.1)
+    deadline = session.start_time + timedelta(minutes=60)
+    
+    assert expire_sessions({session.id: deadline}) == [session.id]
+    
+    response = client.post(f'/exam/{session.id}/submit', json={}, headers=headers)
+    assert response.status_code == 409
+    assert GradingJob.query.filter_by(session_id=session.id).count() == 1
+
+def test_expiry_after_submit_is_skipped(app, client):
+    headers, student, exam = seed()
+    session = start_session(student, exam, minutes_ago=60.1)
+    deadline = session.start_time + timedelta(minutes=60)
+    
+    response = client.post(f'/exam/{session.id}/submit', json={}, headers=headers)
+    assert response.status_code == 202
+    
+    assert expire_sessions({session.id: deadline}) == []
+    db.session.expire_all()
+    assert session.end_time > deadline
+    assert GradingJob.query.filter_by(session_id=session.id).count() == 1
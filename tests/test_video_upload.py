@@ -0,0 +1,115 @@
+import fcntl
+import io
+import pytest
+from ai_exam_system.models import Exam, ExamSession, ProctoringVideo, User, db
+from ai_exam_system.utils.auth import generate_token
+from ai_exam_system.utils.video_upload import VideoUploadError, write_chunk
+
+WEBM_HEADER = b'\x1a\x45\xdf\xa3' + b'\x00' * 4
+
+@pytest.fixture
+def upload(app, client, tmp_path):
+    """A started 64-byte webm upload. Returns (headers, video id)."""
+    app.config['VIDEO_UPLOAD_FOLDER'] = str(tmp_path)
+    student = User(username='student', email='student@example.com', role='student')
+    student.set_password('Passw0rd!')
+    exam = Exam(title='Exam', description='', duration_minutes=60)
+    session = ExamSession(student=student, exam=exam)
+    db.session.add_all([student, exam, session])
+    db.session.commit()
+    
+    headers = {'Authorization': f'Bearer {generate_token(student)}'}
+    response = client.post(f'/proctoring/sessions/{session.id}/videos',
+                           json={'filename': 'exam.webm', 'total_size': 64}, headers=headers)
+    assert response.status_code == 201
+    return headers, response.get_json()['video_id']
+
+class TrickleStream:
+    """A request stream that returns at most `step` bytes per read."""
+    
+    def __init__(self, data, step):
+        self.data = io.BytesIO(data)
+        self.step = step
+    
+    def read(self, size=-1):
+        return self.data.read(self.step)
+
+def put_chunk(client, headers, video_id, offset, data):
+    return client.put(f'/proctoring/videos/{video_id}/chunks?offset={offset}', data=data, headers=headers)
+
+def test_chunked_upload_resumes_from_reported_offset(app, client, upload):
+    headers, video_id = upload
+    content = WEBM_HEADER + bytes(range(56))
+    
+    assert put_chunk(client, headers, video_id, 0, content[:24]).get_json()['offset'] == 24
+    
+    # A client that lost track asks where to resume
+    status = client.get(f'/proctoring/videos/{video_id}', headers=headers).get_json()
+    assert (status['offset'], status['status']) == (24, 'uploading')
+    
+    response = put_chunk(client, headers, video_id, status['offset'], content[24:])
+    assert response.status_code == 200
+    assert (response.get_json()['offset'], response.get_json()['status']) == (64, 'completed')
+    with open(db.session.get(ProctoringVideo, video_id).storage_path, 'rb') as f:
+        assert f.read() == content
+
+def test_duplicate_and_out_of_order_chunks_conflict(app, client, upload):
+    headers, video_id = upload
+    
+    response = put_chunk(client, headers, video_id, 16, b'x' * 16)
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 0
+    
+    assert put_chunk(client, headers, video_id, 0, WEBM_HEADER + b'a' * 8).status_code == 200
+    
+    # A retried chunk that was already written does not overwrite anything
+    response = put_chunk(client, headers, video_id, 0, WEBM_HEADER + b'b' * 8)
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 16
+
+def test_chunk_written_concurrently_conflicts(app, client, upload):
+    headers, video_id = upload
+    
+    with open(db.session.get(ProctoringVideo, video_id).storage_path, 'r+b') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        response = put_chunk(client, headers, video_id, 0, WEBM_HEADER)
+    
+    assert response.status_code == 409
+    assert 'being written' in response.get_json()['message']
+    assert put_chunk(client, headers, video_id, 0, WEBM_HEADER).status_code == 200
+
+def test_chunk_size_limit_is_enforced_while_reading(app, client, upload):
+    headers, video_id = upload
+    app.config['VIDEO_CHUNK_MAX_SIZE'] = 16
+    
+    # No Content-Length, so only counting the bytes as they arrive catches it
+    response = client.put(
+        f'/proctoring/videos/{video_id}/chunks?offset=0',
+        input_stream=io.BytesIO(WEBM_HEADER + b'a' * 24),
+        headers=dict(headers, **{'Transfer-Encoding': 'chunked'}),
+        environ_overrides={'wsgi.input_terminated': True, 'CONTENT_LENGTH': ''}
+    )
+    assert response.status_code == 413
+    assert response.get_json()['offset'] == 0
+    
+    # Chunks past the announced total size are refused as well
+    app.config['VIDEO_CHUNK_MAX_SIZE'] = 1024
+    response = put_chunk(client, headers, video_id, 0, WEBM_HEADER + b'a' * 64)
+    assert response.status_code == 413
+    
+    assert client.get(f'/proctoring/videos/{video_id}', headers=headers).get_json()['offset'] == 0
+
+def test_header_is_checked_across_short_reads(app, upload):
+    _, video_id = upload
+    video = db.session.get(ProctoringVideo, video_id)
+    
+    with pytest.raises(VideoUploadError) as error:
+        write_chunk(video, 0, TrickleStream(b'\x1a\x45\xdf' + b'\x00' * 13, step=3))
+    assert error.value.status_code == 415
+    
+    with pytest.raises(VideoUploadError) as error:
+        write_chunk(video, 0, TrickleStream(WEBM_HEADER[:5], step=3))
+    assert error.value.status_code == 415
+    
+    assert write_chunk(video, 0, TrickleStream(WEBM_HEADER + b'a' * 8, step=3)) == 16
+    assert db.session.get(ProctoringVideo, video_id).received_bytes == 16